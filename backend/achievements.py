@@ -0,0 +1,168 @@
+"""Achievement catalogue and server-side unlock rules.
+
+Each rule is "counter reaches target". Routes describe what an event
+changed -- a catch run, a new level, a prestige, the lure count -- and
+``AchievementRules`` looks up only the rules on those counters (sorted by
+target, so a lookup is a bisect plus the rules actually hit). Catch
+counters live on the user's ``tacklebox_summary`` document, which every
+catch already updates; the summary is read back from that same write, so
+the tacklebox is never re-scanned.
+"""
+import bisect
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from tacklebox import species_key
+
+ACHIEVEMENTS = [
+    {"id": "first_catch", "name": "First Catch", "description": "Catch your first fish", "icon": "🐟"},
+    {"id": "catch_100", "name": "Century Fisher", "description": "Catch 100 fish", "icon": "💯"},
+    {"id": "catch_1000", "name": "Master Angler", "description": "Catch 1000 fish", "icon": "🏆"},
+    {"id": "golden_koi", "name": "Legendary Hunter", "description": "Catch a Golden Koi", "icon": "⭐"},
+    {"id": "level_10", "name": "Rising Star", "description": "Reach level 10", "icon": "🌟"},
+    {"id": "level_50", "name": "Pro Angler", "description": "Reach level 50", "icon": "🎖️"},
+    {"id": "level_100", "name": "Fishing Legend", "description": "Reach level 100", "icon": "👑"},
+    {"id": "prestige_1", "name": "Reborn", "description": "Prestige for the first time", "icon": "♻️"},
+    {"id": "all_lures", "name": "Collector", "description": "Unlock all lures", "icon": "🎣"},
+    {"id": "perfect_10", "name": "Perfectionist", "description": "Get 10 perfect catches in a row", "icon": "✨"},
+    {"id": "whale_watcher", "name": "Whale Watcher", "description": "See the whale 10 times", "icon": "🐋"},
+    {"id": "storm_fisher", "name": "Storm Chaser", "description": "Catch 50 fish during storms", "icon": "⛈️"},
+]
+
+GOLDEN_KOI = "Golden Koi"
+STORM = "storm"
+# len(LURES) in frontend/src/lib/gameData.js
+LURE_COUNT = 3
+
+
+class Rule(NamedTuple):
+    achievement_id: str
+    counter: str
+    target: int
+
+
+# whale_watcher has no server-side event yet and is still unlocked by the client
+RULES = (
+    Rule("first_catch", "catches", 1),
+    Rule("catch_100", "catches", 100),
+    Rule("catch_1000", "catches", 1000),
+    Rule("golden_koi", "golden_koi", 1),
+    Rule("storm_fisher", "storm_catches", 50),
+    Rule("perfect_10", "perfect_streak", 10),
+    Rule("level_10", "level", 10),
+    Rule("level_50", "level", 50),
+    Rule("level_100", "level", 100),
+    Rule("prestige_1", "prestige", 1),
+    Rule("all_lures", "lures", LURE_COUNT),
+)
+
+# Summary fields read back by catch routes to evaluate catch rules
+SUMMARY_COUNTERS = {
+    "catches": "total_fish",
+    "golden_koi": f"species.{species_key(GOLDEN_KOI)}.count",
+    "storm_catches": "storm_catches",
+    "perfect_streak": "perfect_streak",
+}
+SUMMARY_PROJECTION = {"_id": 0, **{path: 1 for path in SUMMARY_COUNTERS.values()}}
+
+
+class AchievementRules:
+    """Rules indexed by counter, targets ascending"""
+
+    def __init__(self, rules: Iterable[Rule] = RULES):
+        by_counter: Dict[str, List[Rule]] = defaultdict(list)
+        for rule in rules:
+            by_counter[rule.counter].append(rule)
+        self._targets = {}
+        self._ids = {}
+        for counter, counter_rules in by_counter.items():
+            counter_rules.sort(key=lambda r: r.target)
+            self._targets[counter] = [r.target for r in counter_rules]
+            self._ids[counter] = [r.achievement_id for r in counter_rules]
+
+    def reached(self, counter: str, value: int, above: Optional[int] = None) -> List[str]:
+        """Achievements whose target is <= ``value`` (and > ``above``, if given)"""
+        targets = self._targets.get(counter)
+        if not targets:
+            return []
+        low = bisect.bisect_right(targets, above) if above is not None else 0
+        return self._ids[counter][low:bisect.bisect_right(targets, value)]
+
+
+def _summary_value(summary: dict, path: str) -> int:
+    for part in path.split("."):
+        summary = summary.get(part) if isinstance(summary, dict) else None
+    return summary or 0
+
+
+class CatchRun:
+    """Achievement counter changes from an ordered run of catches"""
+
+    def __init__(self, fish_docs: List[dict]):
+        self.catches = len(fish_docs)
+        self.golden_koi = sum(1 for doc in fish_docs if doc.get("name") == GOLDEN_KOI)
+        self.storm_catches = sum(1 for doc in fish_docs if doc.get("weather") == STORM)
+        # Perfect streak: the run continuing the stored streak, whether a miss
+        # broke it, the best run after that, and the run still going at the end
+        self.leading, self.broken, self.best_after_break, run = 0, False, 0, 0
+        for doc in fish_docs:
+            if doc.get("perfect"):
+                run += 1
+            else:
+                if not self.broken:
+                    self.leading, self.broken = run, True
+                else:
+                    self.best_after_break = max(self.best_after_break, run)
+                run = 0
+        if self.broken:
+            self.best_after_break = max(self.best_after_break, run)
+        else:
+            self.leading = run
+        self.trailing = run
+
+    def streak_update(self) -> dict:
+        """``perfect_streak`` operator to merge into the summary update"""
+        if self.broken:
+            return {"$set": {"perfect_streak": self.trailing}}
+        return {"$inc": {"perfect_streak": self.leading}}
+
+    def unlocked(self, rules: AchievementRules, before: Optional[dict]) -> List[str]:
+        """Catch achievements first reached by this run, given the summary as it was before it"""
+        before = before or {}
+        unlocked = []
+        for counter in ("catches", "golden_koi", "storm_catches"):
+            start = _summary_value(before, SUMMARY_COUNTERS[counter])
+            unlocked += rules.reached(counter, start + getattr(self, counter), above=start)
+        streak = _summary_value(before, SUMMARY_COUNTERS["perfect_streak"])
+        unlocked += rules.reached("perfect_streak", streak + self.leading, above=streak)
+        if self.broken:
+            unlocked += rules.reached("perfect_streak", self.best_after_break)
+        return list(dict.fromkeys(unlocked))
+
+
+def lure_count(unlocked_lures: List[int]) -> int:
+    """Distinct known lures owned, for the ``lures`` counter"""
+    return len({lure for lure in unlocked_lures if 0 <= lure < LURE_COUNT})
+
+
+def merge_update(update: dict, extra: dict) -> dict:
+    """Fold ``extra``'s operators into a Mongo update document"""
+    for operator, fields in extra.items():
+        update.setdefault(operator, {}).update(fields)
+    return update
+
+
+async def grant(users, user_id: str, achievement_ids: List[str]) -> List[str]:
+    """Add achievements to a user; returns those the user did not have yet"""
+    if not achievement_ids:
+        return []
+    # Matches only if something is missing, so repeats cost a read, not a write
+    before = await users.find_one_and_update(
+        {"id": user_id, "$or": [{"achievements": {"$ne": a}} for a in achievement_ids]},
+        {"$addToSet": {"achievements": {"$each": achievement_ids}}, "$inc": {"rev": 1}},
+        projection={"_id": 0, "achievements": 1},
+    )
+    if before is None:
+        return []
+    have = set(before.get("achievements", []))
+    return [a for a in achievement_ids if a not in have]
@@ -0,0 +1,290 @@
+"""Admission control: per-client rate limits and a global concurrency cap.
+
+Each ``AdmissionRule`` gives one class of write routes a token bucket per
+client, keyed by the ``user_id`` in the path (or, failing that, in the
+JSON body) and falling back to the peer address. A client that runs dry
+gets 429 with the ``Retry-After`` until its next token, before the route
+handler or Mongo sees the request.
+
+Every admitted /api request that is not ``exempt`` then takes a slot of a
+``ConcurrencyLimit``. When all slots are busy, requests wait in FIFO
+order, but at most ``queue`` of them and for at most ``deadline``
+seconds. Past either bound they are shed with 503. A flood therefore
+turns into quick rejections rather than a Mongo backlog that every player
+waits behind.
+"""
+import asyncio
+import math
+import re
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import Dict, Iterable, List, Optional
+
+import orjson
+from starlette.routing import Match
+
+from metrics import Histogram
+
+# Bodies are read this far for a user_id; past it the request is keyed by peer address
+MAX_KEY_BODY = 64 << 10
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RateLimit:
+    """Token bucket parameters: ``rate`` tokens/second, at most ``burst`` saved up"""
+
+    __slots__ = ("rate", "burst")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional["RateLimit"]:
+        """"rate/burst" (e.g. "10/40"); a rate of 0 disables the limit"""
+        rate, _, burst = spec.partition("/")
+        rate = float(rate)
+        if rate <= 0:
+            return None
+        return cls(rate, float(burst) if burst else rate)
+
+    def take(self, bucket: list, now: float) -> float:
+        """Spend one token from ``bucket`` ([tokens, updated]); 0 on success, else seconds until one is due"""
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+
+class AdmissionRule:
+    """Rate limit for one class of routes, matched on method and path"""
+
+    def __init__(self, name: str, path: str, limit: Optional[RateLimit], methods: Iterable[str] = ("POST",),
+                 key_field: str = "user_id"):
+        self.name = name
+        # A (?P<key>...) group keys the bucket from the path; otherwise key_field is read from the JSON body
+        self.pattern = re.compile(path)
+        self.limit = limit
+        self.methods = frozenset(methods)
+        self.key_field = key_field
+
+
+class ConcurrencyLimit:
+    """At most ``limit`` holders; up to ``queue`` FIFO waiters for up to ``deadline`` seconds"""
+
+    def __init__(self, limit: int, queue: int, deadline: float):
+        self.limit = limit
+        self.queue = queue
+        self.deadline = deadline
+        self.active = 0
+        self._waiters: deque = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """None once a slot is held, else why the caller was refused ("queue_full" or "deadline")"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the waiter, so active is not touched here
+            await asyncio.wait_for(waiter, self.deadline)
+            return None
+        except asyncio.TimeoutError:
+            return "deadline"
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+def _route_template(scope) -> str:
+    """Route path the router would pick, for labelling requests rejected before routing"""
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class AdmissionControl:
+    """Token buckets per (rule, client) plus the shared concurrency limit"""
+
+    def __init__(self, rules: List[AdmissionRule], concurrency: int = 64, queue: int = 1024,
+                 deadline: float = 2.0, exempt: Iterable[str] = (), max_clients: int = 100_000,
+                 enabled: bool = True, clock=time.monotonic):
+        self.rules = rules
+        self.concurrency = concurrency
+        self.queue = queue
+        self.deadline = deadline
+        self.exempt = re.compile("|".join(f"(?:{path})" for path in exempt)) if exempt else None
+        self.max_clients = max_clients
+        self.enabled = enabled
+        self.clock = clock
+        self.throttled: Dict[str, int] = defaultdict(int)
+        self.shed: Dict[str, int] = defaultdict(int)
+        self.queue_wait = Histogram(QUEUE_WAIT_BUCKETS)
+        self.reset()
+
+    def reset(self):
+        """Forget every bucket and start a fresh concurrency limit (tests, or a new event loop)"""
+        # LRU, so an evicted bucket is one that has long since refilled
+        self._buckets: "OrderedDict[tuple, list]" = OrderedDict()
+        self.limit = ConcurrencyLimit(self.concurrency, self.queue, self.deadline)
+
+    def match(self, method: str, path: str):
+        for rule in self.rules:
+            if rule.limit is not None and method in rule.methods:
+                match = rule.pattern.match(path)
+                if match:
+                    return rule, match.groupdict().get("key")
+        return None, None
+
+    def check(self, rule: AdmissionRule, client: str) -> float:
+        """Take a token for ``client``; 0 if admitted, else seconds until it may retry"""
+        now = self.clock()
+        key = (rule.name, client)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [rule.limit.burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = rule.limit.take(bucket, now)
+        if wait:
+            self.throttled[rule.name] += 1
+        return wait
+
+    def render(self) -> list:
+        lines = [
+            "# HELP gofish_admission_throttled_total Requests refused by a per-client rate limit",
+            "# TYPE gofish_admission_throttled_total counter",
+        ]
+        for name, count in sorted(self.throttled.items()):
+            lines.append(f'gofish_admission_throttled_total{{rule="{name}"}} {count}')
+        lines += [
+            "# HELP gofish_admission_shed_total Requests refused by the concurrency limit",
+            "# TYPE gofish_admission_shed_total counter",
+        ]
+        for reason, count in sorted(self.shed.items()):
+            lines.append(f'gofish_admission_shed_total{{reason="{reason}"}} {count}')
+        lines += [
+            "# HELP gofish_admission_inflight Requests holding a concurrency slot",
+            "# TYPE gofish_admission_inflight gauge",
+            f"gofish_admission_inflight {self.limit.active}",
+            "# HELP gofish_admission_queued Requests waiting for a concurrency slot",
+            "# TYPE gofish_admission_queued gauge",
+            f"gofish_admission_queued {self.limit.waiting}",
+            "# HELP gofish_admission_clients Rate-limit buckets held in memory",
+            "# TYPE gofish_admission_clients gauge",
+            f"gofish_admission_clients {len(self._buckets)}",
+            "# HELP gofish_admission_queue_wait_seconds Time admitted requests waited for a slot",
+            "# TYPE gofish_admission_queue_wait_seconds histogram",
+        ]
+        lines += self.queue_wait.render("gofish_admission_queue_wait_seconds", 'limit="concurrency"')
+        return lines
+
+
+async def _reject(scope, send, status: int, detail: str, retry_after: float):
+    # Route label for MetricsMiddleware, which only sees routes the router matched
+    scope.setdefault("route_template", _route_template(scope))
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": orjson.dumps({"detail": detail})})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying ``AdmissionControl`` to /api requests"""
+
+    def __init__(self, app, control: AdmissionControl, prefix: str = "/api", max_body: int = MAX_KEY_BODY):
+        self.app = app
+        self.control = control
+        self.prefix = prefix
+        self.max_body = max_body
+
+    async def _body_key(self, receive, field: str):
+        # Read up to max_body bytes to find the client key, then replay what was read to the route
+        chunks, trailing, size, more = [], [], 0, False
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                trailing.append(message)
+                break
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more = message.get("more_body", False)
+            if not more or size > self.max_body:
+                break
+        body = b"".join(chunks)
+        key = None
+        if not more:
+            try:
+                parsed = orjson.loads(body)
+                key = parsed.get(field) if isinstance(parsed, dict) else None
+            except orjson.JSONDecodeError:
+                pass
+        # The rest of an oversized body is left for the route to receive
+        messages = [{"type": "http.request", "body": body, "more_body": more}, *trailing]
+
+        async def replay():
+            return messages.pop(0) if messages else await receive()
+
+        return (key if isinstance(key, str) else None), replay
+
+    async def __call__(self, scope, receive, send):
+        control = self.control
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not control.enabled or not path.startswith(self.prefix):
+            return await self.app(scope, receive, send)
+
+        rule, key = control.match(scope["method"], path)
+        if rule is not None:
+            if key is None:
+                key, receive = await self._body_key(receive, rule.key_field)
+            if key is None:
+                client = scope.get("client")
+                key = f"addr:{client[0]}" if client else "addr:-"
+            wait = control.check(rule, key)
+            if wait:
+                return await _reject(scope, send, 429, "Too many requests", wait)
+
+        if control.exempt is not None and control.exempt.match(path):
+            return await self.app(scope, receive, send)
+        limit = control.limit
+        start = time.perf_counter()
+        refused = await limit.acquire()
+        if refused:
+            control.shed[refused] += 1
+            return await _reject(scope, send, 503, "Server busy", 1)
+        control.queue_wait.observe(time.perf_counter() - start)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
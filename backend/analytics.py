@@ -0,0 +1,161 @@
+"""Analytics event ingestion: a bounded in-process queue drained in bulk.
+
+``POST /api/analytics/ingest`` hands each validated batch to
+``AnalyticsIngest.offer()``, which either queues the whole batch or refuses
+it when fewer than ``len(batch)`` event slots are free. A refused request
+gets 429 with a ``Retry-After`` sized to the current backlog and drain
+rate, so an overloaded pipeline costs gameplay routes nothing beyond a
+cheap rejection. ``workers`` background tasks coalesce queued batches into
+``insert_many`` calls of up to ``batch_size`` events, optionally into one
+collection per UTC day or month.
+
+Analytics is best-effort: events still queued when the process dies, or
+whose write fails, are counted and dropped rather than retried forever.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS = {
+    "none": None,
+    "day": "%Y_%m_%d",
+    "month": "%Y_%m",
+}
+
+
+class AnalyticsIngest:
+    """Bounded queue of analytics events flushed with insert_many"""
+
+    def __init__(self, db, collection: str = "analytics_events", capacity: int = 100_000,
+                 batch_size: int = 1000, workers: int = 2, partition: str = "none"):
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown analytics partition: {partition}")
+        self.db = db
+        self.collection = collection
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.workers = workers
+        self.partition = partition
+        self.pending = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.inserts = 0
+        self._rate = 0.0  # events/second written, smoothed
+        self._queue: Optional[asyncio.Queue] = None
+        self._closing = False
+        self._tasks: List[asyncio.Task] = []
+
+    def collection_for(self, when: datetime) -> str:
+        """Collection an event received at ``when`` is written to"""
+        suffix = PARTITIONS[self.partition]
+        return self.collection if suffix is None else f"{self.collection}_{when.strftime(suffix)}"
+
+    def saturated(self) -> bool:
+        """No room for even one more event; lets the route refuse before parsing the body"""
+        return self._queue is None or self._closing or self.pending >= self.capacity
+
+    def retry_after(self) -> int:
+        """Seconds until the backlog should have drained enough to accept more"""
+        if self._rate <= 0:
+            return 1
+        return max(1, min(30, math.ceil(self.pending / self._rate)))
+
+    def offer(self, docs: List[dict]) -> bool:
+        """Queue all of ``docs`` or none of them"""
+        if self._queue is None or self._closing or self.pending + len(docs) > self.capacity:
+            self.rejected += len(docs)
+            return False
+        self._queue.put_nowait(docs)
+        self.pending += len(docs)
+        self.accepted += len(docs)
+        return True
+
+    def _take(self, first: List[dict]) -> List[dict]:
+        # Coalesce whatever is already queued, up to batch_size events
+        docs = list(first)
+        while len(docs) < self.batch_size and not self._queue.empty():
+            more = self._queue.get_nowait()
+            if more is None:
+                # Put the stop marker back for the next loop iteration
+                self._queue.put_nowait(None)
+                break
+            docs.extend(more)
+        return docs
+
+    async def _write(self, docs: List[dict]):
+        by_collection = defaultdict(list)
+        for doc in docs:
+            by_collection[self.collection_for(doc["received_at"])].append(doc)
+        started = time.perf_counter()
+        for name, group in by_collection.items():
+            try:
+                await self.db[name].insert_many(group, ordered=False)
+                self.written += len(group)
+            except BulkWriteError as e:
+                lost = len(e.details.get("writeErrors", []))
+                self.written += len(group) - lost
+                self.failed += lost
+                logger.error(f"Analytics insert into {name}: {lost} of {len(group)} events failed")
+            except Exception as e:
+                self.failed += len(group)
+                logger.error(f"Analytics insert into {name} failed, dropped {len(group)} events: {e}")
+            self.inserts += 1
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        # Per-worker rate times workers approximates total drain throughput
+        rate = len(docs) / elapsed * self.workers
+        self._rate = rate if self._rate == 0 else 0.8 * self._rate + 0.2 * rate
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            docs = self._take(first)
+            try:
+                await self._write(docs)
+            finally:
+                self.pending -= len(docs)
+
+    def start(self):
+        """Start the insert workers (call from app startup)"""
+        if not self._tasks:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Refuse new events, write everything queued, then stop the workers"""
+        if self._tasks:
+            self._closing = True
+            # Queued after every accepted batch, so workers drain first
+            for _ in self._tasks:
+                self._queue.put_nowait(None)
+            await asyncio.gather(*self._tasks)
+            self._tasks = []
+            self._queue = None
+            self._closing = False
+
+    def render(self) -> list:
+        return [
+            "# HELP gofish_analytics_queue_events Analytics events waiting to be written",
+            "# TYPE gofish_analytics_queue_events gauge",
+            f"gofish_analytics_queue_events {self.pending}",
+            "# HELP gofish_analytics_events_total Analytics events by outcome",
+            "# TYPE gofish_analytics_events_total counter",
+            f'gofish_analytics_events_total{{outcome="accepted"}} {self.accepted}',
+            f'gofish_analytics_events_total{{outcome="rejected"}} {self.rejected}',
+            f'gofish_analytics_events_total{{outcome="written"}} {self.written}',
+            f'gofish_analytics_events_total{{outcome="failed"}} {self.failed}',
+            "# HELP gofish_analytics_inserts_total insert_many calls issued",
+            "# TYPE gofish_analytics_inserts_total counter",
+            f"gofish_analytics_inserts_total {self.inserts}",
+        ]
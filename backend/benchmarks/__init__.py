@@ -0,0 +1,9 @@
+"""Backend benchmarks.
+
+Run from the ``backend`` directory, e.g.::
+
+    python -m benchmarks.leaderboard_bench
+
+Benchmarks that compare against Mongo read ``BENCH_MONGO_URL`` (and
+optionally ``BENCH_DB_NAME``) and skip that half when it is not set.
+"""
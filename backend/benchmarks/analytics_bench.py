@@ -0,0 +1,152 @@
+"""Sustained analytics ingest: events/second through /api/analytics/ingest.
+
+    python -m benchmarks.analytics_bench --in-process-db --duration 20
+    python -m benchmarks.analytics_bench --senders 64 --events-per-batch 200 --output analytics.json
+
+Runs server.app under uvicorn. A gameplay probe (add-fish + leaderboard
+read) runs alone for ``--baseline`` seconds, then alongside ``--senders``
+clients that post analytics batches (as fast as they are accepted, or at a
+combined ``--rate`` events/second), honouring Retry-After on 429. Reports
+accepted/rejected/written events per second from /api/metrics and the
+probe's latency with and without ingest load.
+
+Senders share the server's event loop, and with ``--in-process-db`` so do
+the (synchronous) mongomock inserts, so probe latencies under load are
+pessimistic there; point MONGO_URL at a mongod for representative numbers.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+
+import httpx
+import uvicorn
+
+from benchmarks.common import summarize
+from benchmarks.loadtest import free_port, git_commit, use_in_process_db
+
+
+def analytics_metrics(text):
+    values = {}
+    for line in text.splitlines():
+        if line.startswith("gofish_analytics_events_total"):
+            outcome = line[line.index('"') + 1:line.rindex('"')]
+            values[outcome] = float(line.split()[-1])
+    return values
+
+
+def batch(rng, size, session):
+    return {"user_id": session, "events": [
+        {"name": rng.choice(["page_view", "user_action", "game_event", "performance"]),
+         "data": {"value": rng.random(), "page": "pond"}, "timestamp": int(time.time() * 1000), "sessionId": session}
+        for _ in range(size)
+    ]}
+
+
+async def sender(http, rng, size, deadline, statuses, interval):
+    session = f"bench-{rng.random():.8f}"
+    while time.perf_counter() < deadline:
+        sent = time.perf_counter()
+        response = await http.post("/api/analytics/ingest", json=batch(rng, size, session))
+        statuses[response.status_code] += 1
+        if response.status_code == 429:
+            await asyncio.sleep(min(float(response.headers.get("retry-after", 1)), deadline - time.perf_counter()))
+        elif interval:
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - sent)))
+
+
+async def probe(http, deadline, samples):
+    user = (await http.post("/api/user", json={"device_id": f"probe-{time.time()}"})).json()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await http.post(f"/api/tacklebox/{user['id']}/add-fish", json={"name": "Bass", "size": 10, "points": 5})
+        await http.get("/api/leaderboard", params={"limit": 10})
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.02)
+
+
+async def run(args):
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "gofish_loadtest")
+    os.environ.setdefault("WEATHER_URL", "http://127.0.0.1:9/v1/forecast")
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.in_process_db:
+        use_in_process_db(server)
+    else:
+        await server.client.drop_database(os.environ["DB_NAME"])
+    port = free_port()
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port,
+                                                   log_level="warning", access_log=False))
+    serving = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.05)
+
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.senders + 8)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as http:
+        baseline = []
+        await probe(http, time.perf_counter() + args.baseline, baseline)
+
+        loaded, statuses = [], Counter()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        # Seconds between one sender's posts for the requested combined rate
+        interval = args.senders * args.events_per_batch / args.rate if args.rate else 0
+        await asyncio.gather(
+            probe(http, deadline, loaded),
+            *[sender(http, random.Random(rng.random()), args.events_per_batch, deadline, statuses, interval)
+              for _ in range(args.senders)]
+        )
+        elapsed = time.perf_counter() - start
+        counts = analytics_metrics((await http.get("/api/metrics")).text)
+
+    uvicorn_server.should_exit = True
+    await serving  # shutdown drains the queue
+    written = server.analytics.written
+    return {
+        "elapsed_s": elapsed,
+        "accepted_per_s": counts.get("accepted", 0) / elapsed,
+        "rejected_per_s": counts.get("rejected", 0) / elapsed,
+        "written_per_s": counts.get("written", 0) / elapsed,
+        "written_total": written,
+        "failed_total": server.analytics.failed,
+        "statuses": dict(statuses),
+        "gameplay_baseline": summarize(baseline) if baseline else None,
+        "gameplay_under_ingest": summarize(loaded) if loaded else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--senders", type=int, default=32)
+    parser.add_argument("--events-per-batch", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=0, help="target events/second across senders (0 = unpaced)")
+    parser.add_argument("--duration", type=float, default=15, help="seconds of ingest load")
+    parser.add_argument("--baseline", type=float, default=5, help="seconds of gameplay probe alone")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--in-process-db", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    results.update({"commit": git_commit(), "config": {k: v for k, v in vars(args).items() if k != "output"}})
+    print(f"accepted {results['accepted_per_s']:,.0f} events/s, written {results['written_per_s']:,.0f} events/s, "
+          f"rejected {results['rejected_per_s']:,.0f} events/s  statuses={results['statuses']}")
+    for label in ("gameplay_baseline", "gameplay_under_ingest"):
+        stats = results[label]
+        if stats:
+            print(f"{label:<24} p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+                  f"p99={stats['p99_ms']:.1f}ms (n={stats['n']})")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
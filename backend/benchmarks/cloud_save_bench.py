@@ -0,0 +1,128 @@
+"""Cloud save sync: bytes on the wire and server CPU, full upload vs. delta.
+
+    python -m benchmarks.cloud_save_bench [rounds] [fish]
+
+Simulates ``rounds`` syncs of a save holding ``fish`` tacklebox entries,
+each after a short play session (a few catches and stat changes). Set
+BENCH_MONGO_URL to also time SaveStore.put vs. SaveStore.patch end to end.
+"""
+import asyncio
+import copy
+import random
+import sys
+import time
+import zlib
+
+import orjson
+
+from benchmarks.common import bench_db, report, summarize, timed_async
+from cloud_save import SaveStore, apply_patch, decode_save, inflate, make_patch
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+FISH = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+SPECIES = ["Bass", "Pike", "Trout", "Carp", "Catfish", "Perch", "Walleye", "Salmon"]
+
+
+def synthetic_save(rng, fish):
+    return {
+        "version": 3,
+        "player": {"name": "Angler", "level": 20, "totalExperience": 48_000, "coins": 12_500},
+        "stats": {"fishCaught": fish, "casts": fish * 3, "biggestFish": 88.5, "playTime": 360_000},
+        "tacklebox": [
+            {"id": f"fish-{i}", "name": rng.choice(SPECIES), "size": round(rng.uniform(5, 90), 1),
+             "points": rng.randint(10, 500), "color": "#3a7", "caught_at": f"2026-01-01T00:00:{i % 60:02d}+00:00"}
+            for i in range(fish)
+        ],
+        "achievements": {"unlocked": [f"ach_{i}" for i in range(40)], "progress": {f"ach_{i}": i for i in range(80)}},
+        "inventory": {"lures": list(range(12)), "rods": ["bamboo", "carbon"], "bait": {"worm": 30, "minnow": 8}},
+        "settings": {"music": 0.6, "sfx": 0.8, "haptics": True, "language": "en"},
+        "lastPlayedAt": 0,
+    }
+
+
+def play(save, rng, round_no):
+    """A short session: 1-4 catches, stat and currency changes"""
+    for _ in range(rng.randint(1, 4)):
+        save["tacklebox"].append({
+            "id": f"fish-r{round_no}-{len(save['tacklebox'])}", "name": rng.choice(SPECIES),
+            "size": round(rng.uniform(5, 90), 1), "points": rng.randint(10, 500), "color": "#3a7",
+            "caught_at": f"2026-02-01T00:00:{round_no % 60:02d}+00:00",
+        })
+        save["stats"]["fishCaught"] += 1
+    save["stats"]["casts"] += rng.randint(3, 12)
+    save["player"]["coins"] += rng.randint(10, 200)
+    save["player"]["totalExperience"] += rng.randint(50, 400)
+    save["lastPlayedAt"] = round_no
+
+
+def main():
+    rng = random.Random(7)
+    store = SaveStore(collection=None)
+    save = synthetic_save(rng, FISH)
+    stored = store.encode(save, 1, None)["data"]
+
+    full_raw, full_deflate, delta_bytes = 0, 0, 0
+    full_cpu, delta_cpu, diff_cpu = [], [], []
+    for round_no in range(ROUNDS):
+        before = copy.deepcopy(save)
+        play(save, rng, round_no)
+
+        # Full sync: client sends the whole save, deflated
+        raw = orjson.dumps(save)
+        body = zlib.compress(raw, 6)
+        full_raw += len(raw)
+        full_deflate += len(body)
+        start = time.perf_counter()
+        data = orjson.loads(inflate(body, "deflate", 1 << 24))
+        store.encode(data, round_no + 2, None)
+        full_cpu.append(time.perf_counter() - start)
+
+        # Delta sync: client diffs against the last synced copy
+        start = time.perf_counter()
+        patch = make_patch(before, save)
+        diff_cpu.append(time.perf_counter() - start)
+        body = orjson.dumps({"base_version": round_no + 1, "patch": patch})
+        delta_bytes += len(body)
+        start = time.perf_counter()
+        ops = orjson.loads(body)["patch"]
+        data = apply_patch(decode_save(stored), ops)
+        stored = store.encode(data, round_no + 2, None)["data"]
+        delta_cpu.append(time.perf_counter() - start)
+
+    assert decode_save(stored) == save
+    print(f"{ROUNDS} syncs of a save with {FISH}+ fish ({len(orjson.dumps(save)):,} bytes at the end)")
+    print(f"bytes/sync  full json={full_raw / ROUNDS:,.0f}  full deflate={full_deflate / ROUNDS:,.0f}  "
+          f"delta={delta_bytes / ROUNDS:,.0f}")
+    report("server full upload (inflate+parse+compress)", summarize(full_cpu))
+    report("server delta (decompress+patch+compress)", summarize(delta_cpu))
+    report("client make_patch", summarize(diff_cpu))
+
+    db = bench_db()
+    if db is None:
+        print("BENCH_MONGO_URL not set, skipping Mongo round trips")
+        return
+    asyncio.run(bench_mongo(db, rng))
+
+
+async def bench_mongo(db, rng):
+    await db.saves.drop()
+    store = SaveStore(db.saves)
+    save = synthetic_save(rng, FISH)
+    version = (await store.put("bench", 0, 0, save))["version"]
+
+    async def full():
+        nonlocal version
+        play(save, rng, version)
+        version = (await store.put("bench", 0, version, save))["version"]
+    report("mongo SaveStore.put", await timed_async(full, ROUNDS))
+
+    async def delta():
+        nonlocal version
+        before = copy.deepcopy(save)
+        play(save, rng, version)
+        version = (await store.patch("bench", 0, version, make_patch(before, save)))["version"]
+    report("mongo SaveStore.patch", await timed_async(delta, ROUNDS))
+
+
+if __name__ == "__main__":
+    main()
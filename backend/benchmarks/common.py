@@ -0,0 +1,54 @@
+"""Shared helpers for the backend benchmarks"""
+import os
+import statistics
+import time
+
+
+def bench_db():
+    """Motor database for benchmarks, or None when BENCH_MONGO_URL is unset"""
+    url = os.environ.get('BENCH_MONGO_URL')
+    if not url:
+        return None
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(url)[os.environ.get('BENCH_DB_NAME', 'gofish_bench')]
+
+
+def summarize(samples):
+    """p50/p95/p99/mean of a list of durations in seconds, reported in ms"""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def timed(fn, repeat):
+    """Call ``fn`` ``repeat`` times and summarize the durations"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+async def timed_async(fn, repeat):
+    """Await ``fn()`` ``repeat`` times and summarize the durations"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def report(name, stats):
+    print(f"{name:<40} n={stats['n']:<6} mean={stats['mean_ms']:.3f}ms "
+          f"p50={stats['p50_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms")
@@ -0,0 +1,75 @@
+"""Leaderboard: in-memory top-K index vs. sorting ``scores`` in Mongo.
+
+    python -m benchmarks.leaderboard_bench [rows]
+"""
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+from benchmarks.common import bench_db, report, timed, timed_async
+from leaderboard import LeaderboardIndex, period_filter
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+
+def synthetic_scores(rows):
+    now = datetime.now(timezone.utc)
+    rng = random.Random(42)
+    for i in range(rows):
+        yield {
+            "id": str(i),
+            "user_id": f"user-{i % 50_000}",
+            "username": f"Angler{i % 50_000}",
+            "score": rng.randint(0, 1_000_000),
+            "level": rng.randint(1, 100),
+            "catches": rng.randint(0, 500),
+            "stage": rng.randint(1, 6),
+            "timestamp": (now - timedelta(seconds=rng.randint(0, 60 * 86400))).isoformat(),
+        }
+
+
+async def bench_mongo(db, rows):
+    await db.scores.drop()
+    batch = []
+    for doc in synthetic_scores(rows):
+        batch.append(doc)
+        if len(batch) == 10_000:
+            await db.scores.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.scores.insert_many(batch, ordered=False)
+
+    for period in ("all_time", "weekly", "daily"):
+        async def query():
+            await db.scores.find(period_filter(period), {"_id": 0}).sort("score", -1).limit(100).to_list(100)
+        report(f"mongo find.sort.limit(100) {period}", await timed_async(query, 20))
+
+    index = LeaderboardIndex(capacity=1000)
+    start = time.perf_counter()
+    await index.load(db.scores)
+    print(f"index.load from {rows:,} rows: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+def main():
+    index = LeaderboardIndex(capacity=1000)
+    index.loaded = True
+    start = time.perf_counter()
+    for doc in synthetic_scores(ROWS):
+        index.add(doc)
+    elapsed = time.perf_counter() - start
+    print(f"index.add x {ROWS:,}: {elapsed:.2f}s ({elapsed / ROWS * 1e6:.2f}us/score)")
+
+    for period in ("all_time", "weekly", "daily"):
+        report(f"index.top(100) {period}", timed(lambda: index.top(period, 100), 10_000))
+
+    db = bench_db()
+    if db is None:
+        print("BENCH_MONGO_URL not set, skipping Mongo comparison")
+        return
+    asyncio.run(bench_mongo(db, ROWS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Load test: run server.app under uvicorn and drive concurrent traffic at it.
+
+    python -m benchmarks.loadtest --users 200 --duration 30 --output results.json
+    python -m benchmarks.loadtest --in-process-db          # mongomock-motor instead of MONGO_URL
+    python -m benchmarks.loadtest --abusers 1 --abuser-in-flight 64
+    python -m benchmarks.loadtest --compare before.json after.json
+
+Each virtual user loops over weighted scenarios (user bootstrap, catch
+bursts, batched catches, leaderboard polling). Latency percentiles and
+requests/second are reported per route and written as JSON so runs on
+different commits can be diffed with --compare.
+
+``--abusers`` adds clients that each flood the write routes from a single
+device, keeping ``--abuser-in-flight`` requests open and ignoring
+Retry-After. Each runs in a process of its own, so the flood's client-side
+cost does not land on the server's event loop. Their requests are reported under
+"abuse ..." labels, so the other routes show what regular players saw.
+Run once with ADMISSION_CONTROL=off to compare against no protection.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+import uvicorn
+
+from benchmarks.common import summarize
+
+FISH = [
+    {"name": "Bass", "size": 14, "points": 10, "color": "#4a90d9"},
+    {"name": "Trout", "size": 11, "points": 15, "color": "#7fb069"},
+    {"name": "Golden Koi", "size": 30, "points": 500, "color": "#ffd700"},
+]
+
+
+class Recorder:
+    """Latency samples and status counts per route label"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    async def call(self, http, label, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+        self.samples[label].append(time.perf_counter() - start)
+        self.statuses[label][response.status_code] += 1
+        return response
+
+    def results(self, elapsed):
+        routes = {}
+        for label, samples in sorted(self.samples.items()):
+            routes[label] = {
+                **summarize(samples),
+                "rps": len(samples) / elapsed,
+                "statuses": dict(self.statuses[label]),
+                "errors": self.errors[label],
+            }
+        total = sum(len(s) for s in self.samples.values())
+        return {"elapsed_s": elapsed, "requests": total, "rps": total / elapsed, "routes": routes}
+
+
+class VirtualUser:
+    def __init__(self, http, recorder, rng):
+        self.http = http
+        self.rec = recorder
+        self.rng = rng
+        self.device_id = f"load-{uuid.uuid4()}"
+        self.user_id = None
+        self.etags = {}
+
+    async def bootstrap(self):
+        r = await self.rec.call(self.http, "POST /user", "POST", "/api/user", json={"device_id": self.device_id})
+        if r is not None and r.status_code == 200:
+            self.user_id = r.json()["id"]
+        await asyncio.gather(
+            self.rec.call(self.http, "GET /user/{device_id}", "GET", f"/api/user/{self.device_id}"),
+            self.rec.call(self.http, "GET /achievements", "GET", "/api/achievements"),
+            self.rec.call(self.http, "GET /daily-challenge", "GET", "/api/daily-challenge"),
+            self.rec.call(self.http, "GET /weather", "GET", "/api/weather"),
+            self.rec.call(self.http, "GET /leaderboard", "GET", "/api/leaderboard"),
+            self.rec.call(self.http, "GET /tacklebox/{user_id}", "GET", f"/api/tacklebox/{self.user_id}?limit=100"),
+        )
+
+    async def catch_burst(self):
+        for _ in range(self.rng.randint(3, 10)):
+            await self.rec.call(self.http, "POST /tacklebox/{user_id}/add-fish", "POST",
+                                f"/api/tacklebox/{self.user_id}/add-fish", json=self.rng.choice(FISH))
+            await self.rec.call(self.http, "POST /user/{user_id}/increment-catches", "POST",
+                                f"/api/user/{self.user_id}/increment-catches")
+        await self.rec.call(self.http, "POST /score", "POST", "/api/score", json={
+            "user_id": self.user_id, "username": "Angler", "score": self.rng.randint(0, 100_000),
+            "level": self.rng.randint(1, 50), "catches": 10, "stage": self.rng.randint(1, 6)})
+
+    async def batched_catches(self):
+        events = [{"type": "catch", "fish": self.rng.choice(FISH)} for _ in range(self.rng.randint(3, 10))]
+        events.append({"type": "score", "score": self.rng.randint(0, 100_000), "level": 5, "catches": 10, "stage": 1})
+        await self.rec.call(self.http, "POST /events/batch", "POST", "/api/events/batch",
+                            json={"user_id": self.user_id, "events": events})
+
+    async def poll_leaderboard(self):
+        headers = {"If-None-Match": self.etags["leaderboard"]} if "leaderboard" in self.etags else {}
+        r = await self.rec.call(self.http, "GET /leaderboard", "GET", "/api/leaderboard", headers=headers)
+        if r is not None and "etag" in r.headers:
+            self.etags["leaderboard"] = r.headers["etag"]
+        await self.rec.call(self.http, "GET /leaderboard/rank/{user_id}", "GET",
+                            f"/api/leaderboard/rank/{self.user_id}")
+
+    async def run(self, deadline, mix):
+        await self.bootstrap()
+        scenarios = [getattr(self, name) for name in mix]
+        weights = list(mix.values())
+        while time.perf_counter() < deadline and self.user_id:
+            await self.rng.choices(scenarios, weights)[0]()
+            await asyncio.sleep(self.rng.uniform(0, 0.05))
+
+
+class AbusiveClient:
+    """One device hammering the write routes as fast as the server answers"""
+
+    def __init__(self, http, recorder, rng, in_flight):
+        self.http = http
+        self.rec = recorder
+        self.rng = rng
+        self.in_flight = in_flight
+        self.device_id = f"abuse-{uuid.uuid4()}"
+
+    async def flood(self, user_id, deadline):
+        while time.perf_counter() < deadline:
+            if self.rng.random() < 0.7:
+                await self.rec.call(self.http, "abuse POST /tacklebox/{user_id}/add-fish", "POST",
+                                    f"/api/tacklebox/{user_id}/add-fish", json=self.rng.choice(FISH))
+            else:
+                await self.rec.call(self.http, "abuse POST /score", "POST", "/api/score", json={
+                    "user_id": user_id, "username": "Abuser", "score": self.rng.randint(0, 100_000),
+                    "level": 1, "catches": 1, "stage": 1})
+
+    async def run(self, deadline):
+        r = await self.http.post("/api/user", json={"device_id": self.device_id})
+        user_id = r.json()["id"]
+        await asyncio.gather(*(self.flood(user_id, deadline) for _ in range(self.in_flight)))
+
+
+def abuse_process(port, in_flight, duration, seed, results):
+    """Entry point of one abuser process; puts its Recorder's samples on ``results``"""
+    async def flood():
+        recorder = Recorder()
+        limits = httpx.Limits(max_connections=in_flight)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as http:
+            await AbusiveClient(http, recorder, random.Random(seed), in_flight).run(time.perf_counter() + duration)
+        return recorder
+
+    recorder = asyncio.run(flood())
+    results.put((dict(recorder.samples), {k: dict(v) for k, v in recorder.statuses.items()}, dict(recorder.errors)))
+
+
+MIXES = {
+    "default": {"catch_burst": 4, "batched_catches": 2, "poll_leaderboard": 3, "bootstrap": 1},
+    "catch_burst": {"catch_burst": 1},
+    "leaderboard": {"poll_leaderboard": 1},
+    "bootstrap": {"bootstrap": 1},
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def use_in_process_db(server):
+    """Point the server at mongomock-motor (optional dependency)"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    server.client = AsyncMongoMockClient()
+    server.db = server.client[os.environ["DB_NAME"]]
+    server.weather.collection = server.db.weather
+    server.counters.collection = server.db.users
+    server.compactor.db = server.db
+    server.saves.collection = server.db.saves
+    server.fish_dictionary = server.FishDictionary(server.db.tacklebox_dict)
+    server.analytics.db = server.db
+    server.score_columns.reset(server.db.scores)
+    server.fish_columns.reset(server.db.tacklebox)
+    server.daily_progress.collection = server.db.daily_progress
+    server.daily_progress.users = server.db.users
+
+
+async def run(args):
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "gofish_loadtest")
+    # Keep the run offline: weather falls back to its default when upstream is unreachable
+    os.environ.setdefault("WEATHER_URL", "http://127.0.0.1:9/v1/forecast")
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.in_process_db:
+        use_in_process_db(server)
+    else:
+        await server.client.drop_database(os.environ["DB_NAME"])
+
+    port = free_port()
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    uvicorn_server = uvicorn.Server(config)
+    serving = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.05)
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    rng = random.Random(args.seed)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as http:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        users = [VirtualUser(http, recorder, random.Random(rng.random())) for _ in range(args.users)]
+        spawn = multiprocessing.get_context("spawn")
+        abuse_results = spawn.Queue()
+        abusers = [spawn.Process(target=abuse_process, daemon=True,
+                                 args=(port, args.abuser_in_flight, args.duration, rng.random(), abuse_results))
+                   for _ in range(args.abusers)]
+        for process in abusers:
+            process.start()
+        await asyncio.gather(*(user.run(deadline, MIXES[args.mix]) for user in users))
+        for _ in abusers:
+            samples, statuses, errors = await asyncio.to_thread(abuse_results.get)
+            for label in samples:
+                recorder.samples[label] += samples[label]
+                for status, count in statuses.get(label, {}).items():
+                    recorder.statuses[label][status] += count
+            for label, count in errors.items():
+                recorder.errors[label] += count
+        elapsed = time.perf_counter() - start
+
+    uvicorn_server.should_exit = True
+    await serving
+    return recorder.results(elapsed)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(f"{results['requests']:,} requests in {results['elapsed_s']:.1f}s ({results['rps']:.0f} req/s)")
+    for label, stats in results["routes"].items():
+        print(f"{label:<42} {stats['rps']:>8.1f} req/s  p50={stats['p50_ms']:.1f}ms "
+              f"p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms  {stats['statuses']}")
+
+
+def compare(before_path, after_path):
+    before, after = (json.load(open(p)) for p in (before_path, after_path))
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    for label in sorted(set(before["routes"]) | set(after["routes"])):
+        a, b = before["routes"].get(label), after["routes"].get(label)
+        if not a or not b:
+            print(f"{label:<42} only in {'after' if b else 'before'}")
+            continue
+        print(f"{label:<42} p99 {a['p99_ms']:.1f} -> {b['p99_ms']:.1f}ms ({b['p99_ms'] / a['p99_ms'] - 1:+.0%})  "
+              f"rps {a['rps']:.0f} -> {b['rps']:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of traffic")
+    parser.add_argument("--connections", type=int, default=100, help="HTTP connection pool size")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--abusers", type=int, default=0, help="clients flooding write routes from one device each")
+    parser.add_argument("--abuser-in-flight", type=int, default=32, help="concurrent requests per abuser")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--in-process-db", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = asyncio.run(run(args))
+    results.update({
+        "commit": git_commit(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "python": sys.version.split()[0],
+    })
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
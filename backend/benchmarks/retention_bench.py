@@ -0,0 +1,88 @@
+"""Score retention: leaderboard latency and storage before/after compaction.
+
+    BENCH_MONGO_URL=mongodb://localhost:27017 python -m benchmarks.retention_bench [rows] [retention_days]
+
+Loads ``rows`` synthetic scores (default 10M, spread over 60 days and 50k
+players), then compacts everything older than ``retention_days`` (default 7).
+"""
+import asyncio
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks.common import bench_db, report, timed_async
+from benchmarks.leaderboard_bench import synthetic_scores
+from indexes import ensure_indexes
+from leaderboard import PERIODS
+from retention import compact, top_scores
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+RETENTION_DAYS = float(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+
+async def storage(db):
+    """collStats of the raw and rolled-up score collections, in MB"""
+    totals = {}
+    for name in ("scores", "score_rollups"):
+        stats = await db.command("collStats", name)
+        totals[name] = {
+            "count": stats.get("count", 0),
+            "size_mb": stats.get("size", 0) / 2**20,
+            "storage_mb": stats.get("storageSize", 0) / 2**20,
+            "index_mb": stats.get("totalIndexSize", 0) / 2**20,
+        }
+    return totals
+
+
+def print_storage(label, totals):
+    for name, stats in totals.items():
+        print(f"{label:<8} {name:<14} docs={stats['count']:<10,} data={stats['size_mb']:.1f}MB "
+              f"storage={stats['storage_mb']:.1f}MB indexes={stats['index_mb']:.1f}MB")
+
+
+async def bench_queries(db, label):
+    for period in PERIODS:
+        async def query():
+            await top_scores(db, period, 100)
+        report(f"{label} top_scores(100) {period}", await timed_async(query, 20))
+
+
+async def run(db):
+    await db.scores.drop()
+    await db.score_rollups.drop()
+    await ensure_indexes(db)
+    start = time.perf_counter()
+    batch = []
+    for doc in synthetic_scores(ROWS):
+        batch.append(doc)
+        if len(batch) == 10_000:
+            await db.scores.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.scores.insert_many(batch, ordered=False)
+    print(f"Loaded {ROWS:,} scores in {time.perf_counter() - start:.1f}s")
+
+    print_storage("before", await storage(db))
+    await bench_queries(db, "before")
+
+    start = time.perf_counter()
+    result = await compact(db, timedelta(days=RETENTION_DAYS))
+    print(f"compact: {result['deleted']:,} rows -> {result['user_days']:,} user-days "
+          f"in {time.perf_counter() - start:.1f}s")
+    # Reclaim freed pages so storageSize reflects the smaller collection
+    await db.command("compact", "scores")
+
+    print_storage("after", await storage(db))
+    await bench_queries(db, "after")
+
+
+def main():
+    db = bench_db()
+    if db is None:
+        print("BENCH_MONGO_URL not set; this benchmark needs a Mongo server")
+        return
+    asyncio.run(run(db))
+
+
+if __name__ == "__main__":
+    main()
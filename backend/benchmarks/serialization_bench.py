@@ -0,0 +1,87 @@
+"""Per-route response encoding: default FastAPI path vs. orjson/pre-encoded.
+
+    python -m benchmarks.serialization_bench
+
+"before" reproduces what each route used to do after its Mongo call
+(model round trips, jsonable_encoder, stdlib json); "after" is the
+current code path. No database is needed.
+"""
+import os
+import uuid
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "gofish_bench")
+
+import server  # noqa: E402
+from benchmarks.common import report, timed  # noqa: E402
+from daily import DAILY_CHALLENGES  # noqa: E402
+from responses import json_response  # noqa: E402
+
+REPEAT = 5_000
+
+USER = server.User(device_id="bench-device").model_dump()
+SCORE_INPUT = server.ScoreCreate(user_id="u1", username="Angler", score=4200, level=7, catches=31, stage=2)
+LEADERBOARD = [
+    {"username": f"Angler{i}", "score": 100_000 - i, "level": 50, "catches": 900,
+     "timestamp": datetime.now(timezone.utc).isoformat()}
+    for i in range(100)
+]
+TACKLEBOX = {
+    "fish": [
+        {"id": str(uuid.uuid4()), "user_id": "u1", "name": "Bass", "size": 12.5, "points": 10,
+         "color": "#4a90d9", "caught_at": datetime.now(timezone.utc).isoformat()}
+        for _ in range(1000)
+    ],
+    "count": 1000,
+}
+TODAY = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def default_encode(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def score_before():
+    score = server.Score(**SCORE_INPUT.model_dump())
+    score.model_dump()  # insert_one
+    score.model_dump()  # leaderboard
+    return default_encode(score.model_dump())
+
+
+def score_after():
+    score = server.Score(**SCORE_INPUT.model_dump()).model_dump()
+    dict(score)  # insert_one copy
+    return json_response(score).body
+
+
+def daily_before():
+    challenges = [dict(c) for c in DAILY_CHALLENGES]
+    challenge = challenges[int(TODAY.replace("-", "")) % len(challenges)]
+    challenge["date"] = TODAY
+    return default_encode(challenge)
+
+
+ROUTES = {
+    "POST /user": (lambda: default_encode(USER), lambda: json_response(USER).body),
+    "POST /score": (score_before, score_after),
+    "GET /leaderboard": (lambda: default_encode(LEADERBOARD), lambda: json_response(LEADERBOARD).body),
+    "GET /tacklebox": (lambda: default_encode(TACKLEBOX), lambda: json_response(TACKLEBOX).body),
+    "GET /achievements": (lambda: default_encode({"achievements": server.ACHIEVEMENTS}),
+                          lambda: server.achievements_payload.get()),
+    "GET /daily-challenge": (daily_before, server.schedule.encoded),
+}
+
+
+def main():
+    for route, (before, after) in ROUTES.items():
+        repeat = REPEAT // 10 if route == "GET /tacklebox" else REPEAT
+        report(f"{route} before", timed(before, repeat))
+        report(f"{route} after", timed(after, repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""/api/stats/* computations: Python loops over documents vs. NumPy over cached columns.
+
+    python -m benchmarks.stats_bench [rows]
+
+Builds ``rows`` synthetic score and tacklebox documents (default 500k each)
+and times per-stage score percentiles/histograms and per-lure fish sizes,
+first the way they were answered by hand (a pass over the documents),
+then with ``stats`` over the column arrays ``ColumnCache`` holds. Also
+times turning one 10k-document refresh chunk into columns, the per-document
+cost the cache pays once per new document.
+"""
+import random
+import statistics
+import sys
+from collections import defaultdict
+
+from benchmarks.common import report, timed
+from stats import TABLES, column_array, lure_sizes, score_distribution
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+
+def score_docs(n):
+    rng = random.Random(2)
+    return [{"score": int(rng.lognormvariate(8, 1)), "stage": rng.randint(1, 6),
+             "timestamp": "2026-10-01T12:00:00+00:00"} for _ in range(n)]
+
+
+def fish_docs(n):
+    rng = random.Random(3)
+    return [{"s": rng.randint(1, 12), "z": rng.uniform(5, 80), "p": rng.randint(1, 100), "l": rng.randint(0, 2),
+             "pf": rng.random() < 0.2} for _ in range(n)]
+
+
+def columns(docs, table):
+    return {column.name: column_array(docs, column) for column in TABLES[table] if column.numeric}
+
+
+def loop_scores(docs, bins=20):
+    by_stage = defaultdict(list)
+    for doc in docs:
+        by_stage[doc["stage"]].append(doc["score"])
+    low = min(doc["score"] for doc in docs)
+    width = (max(doc["score"] for doc in docs) - low) / bins or 1
+    result = {}
+    for stage, scores in by_stage.items():
+        scores.sort()
+        histogram = [0] * bins
+        for score in scores:
+            histogram[min(int((score - low) / width), bins - 1)] += 1
+        result[stage] = {"p50": statistics.median(scores), "p99": scores[int(len(scores) * 0.99)],
+                         "histogram": histogram}
+    return result
+
+
+def loop_lures(docs):
+    by_lure = defaultdict(list)
+    for doc in docs:
+        by_lure[doc["l"]].append(doc["z"])
+    return {lure: (statistics.fmean(sizes), statistics.median(sizes)) for lure, sizes in by_lure.items()}
+
+
+def main():
+    scores, fish = score_docs(ROWS), fish_docs(ROWS)
+    score_columns, fish_columns = columns(scores, "scores"), columns(fish, "tacklebox")
+    print(f"{ROWS:,} scores and {ROWS:,} fish")
+    report("scores per stage: loop over docs", timed(lambda: loop_scores(scores), 5))
+    report("scores per stage: numpy columns", timed(lambda: score_distribution(score_columns), 20))
+    report("size per lure: loop over docs", timed(lambda: loop_lures(fish), 5))
+    report("size per lure: numpy columns", timed(lambda: lure_sizes(fish_columns), 20))
+    chunk = fish[:10_000]
+    report("refresh chunk -> columns (10k fish)", timed(lambda: columns(chunk, "tacklebox"), 20))
+
+
+if __name__ == "__main__":
+    main()
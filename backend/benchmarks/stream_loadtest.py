@@ -0,0 +1,196 @@
+"""Load test for /api/leaderboard/stream with thousands of SSE subscribers.
+
+    python -m benchmarks.stream_loadtest --subscribers 2000 --duration 20 --in-process-db
+    python -m benchmarks.stream_loadtest --subscribers 5000 --slow 0.05 --output stream.json
+
+Runs server.app under uvicorn, opens ``--subscribers`` raw HTTP/1.1 SSE
+connections and posts ``--score-rate`` scores per second while they listen.
+``--probes`` of the subscribers parse every event and measure the time from
+a score's POST to its ``diff`` arriving; ``--slow`` of them read only every
+few seconds to exercise the slow-consumer resync path.
+
+Subscribers share this process's event loop with the server unless
+``--url`` points at a separately started one (e.g. ``uvicorn server:app``),
+which gives more realistic latencies.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import time
+from collections import Counter
+
+import httpx
+import orjson
+import uvicorn
+
+from benchmarks.common import summarize
+from benchmarks.loadtest import free_port, git_commit, use_in_process_db
+
+
+class Stats:
+    def __init__(self):
+        self.posted = {}  # username -> POST time
+        self.latency = []
+        self.events = Counter()
+        self.bytes = 0
+        self.connected = 0
+        self.errors = Counter()
+
+
+async def subscribe(host, port, stats, deadline, probe, slow):
+    try:
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    except OSError as e:
+        stats.errors[type(e).__name__] += 1
+        return
+    writer.write(b"GET /api/leaderboard/stream HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+    await writer.drain()
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        stats.connected += 1
+        while time.perf_counter() < deadline:
+            if slow:
+                # Let the server-side queue overflow before reading again
+                await asyncio.sleep(3)
+            try:
+                chunk = await asyncio.wait_for(reader.readuntil(b"\n\n"), deadline - time.perf_counter())
+            except asyncio.TimeoutError:
+                break
+            stats.bytes += len(chunk)
+            # Chunked transfer framing precedes each event; the event name follows "event: "
+            start = chunk.find(b"event: ")
+            if start == -1:
+                continue
+            event = chunk[start + 7:chunk.index(b"\n", start)].decode()
+            stats.events[event] += 1
+            if probe and event == "diff":
+                received = time.perf_counter()
+                data = orjson.loads(chunk[chunk.index(b"data: ") + 6:])
+                for _, entry in data["inserted"]:
+                    posted = stats.posted.get(entry["username"])
+                    if posted is not None:
+                        stats.latency.append(received - posted)
+    except (asyncio.IncompleteReadError, ConnectionError) as e:
+        stats.errors[type(e).__name__] += 1
+    finally:
+        writer.close()
+
+
+async def post_scores(http, stats, rate, deadline, rng):
+    n = 0
+    while time.perf_counter() < deadline:
+        username = f"bench-{n}"
+        n += 1
+        stats.posted[username] = time.perf_counter()
+        # Scores keep rising so every post lands in the top 100
+        await http.post("/api/score", json={"user_id": f"u{n}", "username": username, "score": 1000 + n * 10,
+                                            "level": rng.randint(1, 50), "catches": 5, "stage": 1})
+        await asyncio.sleep(1 / rate)
+
+
+def stream_metrics(text):
+    """gofish_leaderboard_stream_* values from /api/metrics"""
+    values = {}
+    for line in text.splitlines():
+        if line.startswith("gofish_leaderboard_stream_"):
+            name, value = line.split()
+            values[name[len("gofish_leaderboard_stream_"):]] = float(value)
+    return values
+
+
+async def start_server(args):
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "gofish_loadtest")
+    os.environ.setdefault("WEATHER_URL", "http://127.0.0.1:9/v1/forecast")
+    import server
+
+    if args.in_process_db:
+        use_in_process_db(server)
+    else:
+        await server.client.drop_database(os.environ["DB_NAME"])
+    port = free_port()
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning",
+                            access_log=False, backlog=args.subscribers + 128)
+    uvicorn_server = uvicorn.Server(config)
+    serving = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.05)
+    return uvicorn_server, serving, f"http://127.0.0.1:{port}"
+
+
+async def run(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    uvicorn_server, serving, base_url = None, None, args.url
+    if base_url is None:
+        uvicorn_server, serving, base_url = await start_server(args)
+    host, port = httpx.URL(base_url).host, httpx.URL(base_url).port or 80
+
+    stats = Stats()
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.duration
+    listeners = []
+    for i in range(args.subscribers):
+        listeners.append(asyncio.create_task(subscribe(
+            host, port, stats, deadline, probe=rng.random() < args.probes, slow=rng.random() < args.slow)))
+        if i % 200 == 199:
+            await asyncio.sleep(0.05)  # stagger connects so the accept backlog keeps up
+    connect_time = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        await post_scores(http, stats, args.score_rate, deadline, rng)
+        await asyncio.gather(*listeners)
+        server_side = stream_metrics((await http.get("/api/metrics")).text)
+    results = {
+        "subscribers": args.subscribers,
+        "connected": stats.connected,
+        "scores_posted": len(stats.posted),
+        "diffs_published": server_side.get("diffs_total"),
+        "resyncs": server_side.get("resyncs_total"),
+        "events": dict(stats.events),
+        "mb_received": stats.bytes / 2**20,
+        "errors": dict(stats.errors),
+        "score_to_subscriber": summarize(stats.latency) if stats.latency else None,
+        "elapsed_s": time.perf_counter() - connect_time,
+    }
+    if uvicorn_server is not None:
+        uvicorn_server.should_exit = True
+        await serving
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=15, help="seconds of traffic")
+    parser.add_argument("--score-rate", type=float, default=20, help="scores posted per second")
+    parser.add_argument("--probes", type=float, default=0.05, help="fraction of subscribers measuring latency")
+    parser.add_argument("--slow", type=float, default=0.02, help="fraction of slow subscribers")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--in-process-db", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    # Both ends of every connection live in this process
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.subscribers * 2 + 256)), hard))
+
+    results = asyncio.run(run(args))
+    results.update({"commit": git_commit(), "config": {k: v for k, v in vars(args).items() if k != "output"}})
+    latency = results["score_to_subscriber"]
+    print(f"{results['connected']}/{results['subscribers']} subscribers, {results['scores_posted']} scores, "
+          f"{results['diffs_published']:.0f} diffs published, {results['mb_received']:.1f}MB received")
+    print(f"events {results['events']}  resyncs={results['resyncs']:.0f}  errors={results['errors']}")
+    if latency:
+        print(f"score -> subscriber  p50={latency['p50_ms']:.1f}ms p95={latency['p95_ms']:.1f}ms "
+              f"p99={latency['p99_ms']:.1f}ms (n={latency['n']})")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Tacklebox storage: legacy string documents vs. the compact dictionary-encoded format.
+
+    BENCH_MONGO_URL=mongodb://localhost:27017 python -m benchmarks.tacklebox_format_bench [catches] [users]
+
+Loads ``catches`` legacy-format fish (default 500k over 100 users) into
+``tacklebox``, reports collStats, times ``get_tacklebox`` pages the way the
+route used to read them, then runs ``migrate_tacklebox`` in place, swaps
+the index and reports the same numbers for the compact format through the
+current route.
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+import bson
+import orjson
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from benchmarks.common import bench_db, report, timed_async
+from tacklebox import FishDictionary, migrate_tacklebox
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "gofish_bench")
+
+import server  # noqa: E402
+
+CATCHES = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+USERS = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+SPECIES = [("Bass", "#4a90d9"), ("Trout", "#7fb069"), ("Carp", "#c9a227"), ("Catfish", "#6b4f3a"),
+           ("Pike", "#3d7a5a"), ("Golden Koi", "#ffd700")]
+WEATHER = ["sunny", "cloudy", "rain", "storm"]
+LEGACY_INDEX = [("user_id", ASCENDING), ("caught_at", DESCENDING), ("id", DESCENDING)]
+
+
+def legacy_fish(n, users):
+    rng = random.Random(11)
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        name, color = rng.choice(SPECIES)
+        yield {
+            "id": str(uuid.uuid4()),
+            "user_id": user_ids[i % users],
+            "name": name,
+            "size": rng.randint(5, 80),
+            "points": rng.randint(1, 100),
+            "color": color,
+            "perfect": rng.random() < 0.2,
+            "weather": rng.choice(WEATHER),
+            "caught_at": (start + timedelta(seconds=i, microseconds=rng.randint(0, 999) * 1000)).isoformat(),
+        }
+
+
+async def storage(db):
+    stats = await db.command("collStats", "tacklebox")
+    return {
+        "count": stats.get("count", 0),
+        "avg_doc_bytes": stats.get("avgObjSize", 0),
+        "size_mb": stats.get("size", 0) / 2**20,
+        "storage_mb": stats.get("storageSize", 0) / 2**20,
+        "index_mb": stats.get("totalIndexSize", 0) / 2**20,
+    }
+
+
+def print_storage(label, stats):
+    print(f"{label:<8} docs={stats['count']:<9,} avg={stats['avg_doc_bytes']:.0f}B data={stats['size_mb']:.1f}MB "
+          f"storage={stats['storage_mb']:.1f}MB indexes={stats['index_mb']:.1f}MB")
+
+
+async def run(db):
+    await db.tacklebox.drop()
+    await db.tacklebox_dict.drop()
+    await db.tacklebox.create_index(LEGACY_INDEX, name="user_id_caught_at_id")
+    user_ids = []
+    batch = []
+    for doc in legacy_fish(CATCHES, USERS):
+        if len(user_ids) < USERS:
+            user_ids.append(doc["user_id"])
+        batch.append(doc)
+        if len(batch) == 10_000:
+            await db.tacklebox.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.tacklebox.insert_many(batch, ordered=False)
+    print(f"{CATCHES:,} catches over {USERS} users")
+    before = await storage(db)
+    print_storage("legacy", before)
+
+    rng = random.Random(5)
+
+    async def legacy_page():
+        docs = await db.tacklebox.find({"user_id": rng.choice(user_ids)}, {"_id": 0}) \
+            .sort(LEGACY_INDEX[1:]).limit(1001).to_list(1001)
+        orjson.dumps({"fish": docs[:1000], "count": len(docs[:1000])})
+
+    report("legacy get_tacklebox(1000)", await timed_async(legacy_page, 50))
+
+    start = time.perf_counter()
+    converted = await migrate_tacklebox(db, FishDictionary(db.tacklebox_dict), batch=5_000)
+    print(f"migrated {converted:,} documents in {time.perf_counter() - start:.1f}s")
+    await db.tacklebox.drop_index("user_id_caught_at_id")
+    await db.tacklebox.create_index([("u", ASCENDING), ("t", DESCENDING), ("_id", DESCENDING)], name="u_t_id")
+    # Reclaim the space freed by the rewrite so storageSize is comparable
+    await db.command("compact", "tacklebox")
+    after = await storage(db)
+    print_storage("compact", after)
+
+    server.db = db
+    server.fish_dictionary = FishDictionary(db.tacklebox_dict)
+    await server.fish_dictionary.load()
+
+    async def compact_page():
+        await server.get_tacklebox(rng.choice(user_ids), limit=1000)
+
+    report("compact get_tacklebox(1000)", await timed_async(compact_page, 50))
+    # Migrated rows keep their old id in "i"; fish written by the current code are smaller still
+    legacy = next(legacy_fish(1, 1))
+    fresh = await server.fish_dictionary.pack({**legacy, "id": None})
+    print(f"one new fish: {len(bson.encode({'_id': ObjectId(), **legacy}))}B legacy BSON, "
+          f"{len(bson.encode(fresh))}B compact BSON")
+
+
+if __name__ == "__main__":
+    db = bench_db()
+    if db is None:
+        print("BENCH_MONGO_URL not set; this benchmark needs a mongod")
+        sys.exit(1)
+    asyncio.run(run(db))
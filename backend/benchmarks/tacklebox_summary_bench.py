@@ -0,0 +1,73 @@
+"""Tacklebox summary: maintained document vs. on-the-fly $group aggregation.
+
+    BENCH_MONGO_URL=mongodb://localhost:27017 python -m benchmarks.tacklebox_summary_bench [catches]
+"""
+import asyncio
+import random
+import sys
+from datetime import datetime, timezone, timedelta
+
+from benchmarks.common import bench_db, report, timed_async
+from tacklebox import (FishDictionary, migrate_tacklebox, rebuild_summaries, summary_pipeline, summary_update,
+                       summary_view)
+
+CATCHES = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+SPECIES = ["Bass", "Trout", "Carp", "Catfish", "Pike", "Golden Koi"]
+USER_ID = "bench-heavy-user"
+
+
+def synthetic_fish(n):
+    rng = random.Random(7)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        yield {
+            "id": f"fish-{i}",
+            "user_id": USER_ID,
+            "name": rng.choice(SPECIES),
+            "size": rng.randint(5, 80),
+            "points": rng.randint(1, 100),
+            "color": "#4a90d9",
+            "caught_at": (start + timedelta(seconds=i)).isoformat(),
+        }
+
+
+async def main(db):
+    await db.tacklebox.drop()
+    await db.tacklebox_dict.drop()
+    await db.tacklebox_summary.drop()
+    await db.tacklebox.create_index([("u", 1), ("t", -1)])
+    await db.tacklebox_summary.create_index("user_id", unique=True)
+
+    batch = []
+    for doc in synthetic_fish(CATCHES):
+        batch.append(doc)
+        if len(batch) == 5_000:
+            await db.tacklebox.insert_many(batch)
+            batch = []
+    if batch:
+        await db.tacklebox.insert_many(batch)
+    await migrate_tacklebox(db, FishDictionary(db.tacklebox_dict))
+    await rebuild_summaries(db, USER_ID)
+    print(f"{CATCHES:,} catches for one user")
+
+    async def read_summary():
+        summary_view(USER_ID, await db.tacklebox_summary.find_one({"user_id": USER_ID}, {"_id": 0}))
+
+    async def aggregate():
+        await db.tacklebox.aggregate(summary_pipeline(USER_ID)).to_list(None)
+
+    async def incremental_insert():
+        doc = next(synthetic_fish(1))
+        await db.tacklebox_summary.update_one({"user_id": USER_ID}, summary_update([doc]), upsert=True)
+
+    report("summary document read", await timed_async(read_summary, 200))
+    report("$group aggregation", await timed_async(aggregate, 20))
+    report("summary update per insert", await timed_async(incremental_insert, 200))
+
+
+if __name__ == "__main__":
+    db = bench_db()
+    if db is None:
+        print("BENCH_MONGO_URL not set; this benchmark needs a mongod")
+        sys.exit(1)
+    asyncio.run(main(db))
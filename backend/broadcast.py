@@ -0,0 +1,271 @@
+"""Live leaderboard push over Server-Sent Events.
+
+Score routes call ``LeaderboardBroadcaster.notify()`` after updating the
+in-memory ``LeaderboardIndex``. At most every ``interval`` seconds the
+broadcaster diffs each watched period's top ``limit`` against what it last
+published and fans one pre-encoded ``diff`` event out to every subscriber
+of that period. A subscriber whose queue fills up (a slow consumer) has
+its backlog replaced by a single ``snapshot`` event, so memory per client
+stays bounded and the client resynchronises instead of stalling everyone.
+When a watched daily or weekly window rolls over at UTC midnight, its
+subscribers get a fresh ``snapshot`` (the broadcaster also wakes at
+midnight, so this does not wait for the next score).
+
+Like the index it reads, the broadcaster is process-local.
+"""
+import asyncio
+import bisect
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set
+
+import orjson
+
+from leaderboard import period_start
+
+logger = logging.getLogger(__name__)
+
+
+def entry_key(entry: dict) -> str:
+    """Stable identity of a leaderboard row (scores are immutable once submitted)"""
+    return f"{entry['timestamp']}|{entry['username']}|{entry['score']}"
+
+
+def _stable(ranks: List[int]) -> Set[int]:
+    """Positions in ``ranks`` forming a longest increasing subsequence"""
+    tails, tail_at, parent = [], [], [-1] * len(ranks)
+    for i, rank in enumerate(ranks):
+        j = bisect.bisect_left(tails, rank)
+        if j == len(tails):
+            tails.append(rank)
+            tail_at.append(i)
+        else:
+            tails[j] = rank
+            tail_at[j] = i
+        parent[i] = tail_at[j - 1] if j else -1
+    keep, i = set(), tail_at[-1] if tail_at else -1
+    while i != -1:
+        keep.add(i)
+        i = parent[i]
+    return keep
+
+
+def diff_entries(old: List[dict], new: List[dict]) -> dict:
+    """Changes turning ranked list ``old`` into ``new``.
+
+    Clients apply a diff by removing the ``dropped`` and ``moved`` keys, then
+    inserting ``inserted`` entries and ``moved`` keys at their (0-based) new
+    ranks in ascending rank order. Entries that only shift because others
+    were inserted or dropped above them are not listed.
+    """
+    old_keys = [entry_key(e) for e in old]
+    new_rank = {entry_key(e): rank for rank, e in enumerate(new)}
+    old_set = set(old_keys)
+    dropped = [key for key in old_keys if key not in new_rank]
+    kept = [key for key in old_keys if key in new_rank]
+    stable = _stable([new_rank[key] for key in kept])
+    moved = [[key, new_rank[key]] for i, key in enumerate(kept) if i not in stable]
+    inserted = [[rank, {"key": entry_key(e), **e}] for rank, e in enumerate(new) if entry_key(e) not in old_set]
+    return {"inserted": inserted, "moved": sorted(moved, key=lambda m: m[1]), "dropped": dropped}
+
+
+def sse_event(event: str, seq: int, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\nid: " + str(seq).encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+class Subscription:
+    """One client's bounded queue of encoded events"""
+
+    __slots__ = ("period", "queue", "resyncs")
+
+    def __init__(self, period: str, queue_size: int):
+        self.period = period
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+    def offer(self, message: bytes, snapshot) -> bool:
+        """Queue ``message``; on overflow replace the backlog with ``snapshot()``"""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(snapshot())
+            self.resyncs += 1
+            return False
+
+    def close(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class LeaderboardBroadcaster:
+    """Coalesced diff fan-out from a ``LeaderboardIndex`` to SSE subscribers"""
+
+    def __init__(self, index, limit: int = 100, interval: float = 0.25, queue_size: int = 16,
+                 heartbeat: float = 15.0, now: Callable[[], datetime] = lambda: datetime.now(timezone.utc)):
+        self.index = index
+        self.now = now
+        self.limit = limit
+        self.interval = interval
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._last: Dict[str, List[dict]] = {}
+        # Window start each watched period was last published for
+        self._starts: Dict[str, Optional[datetime]] = {}
+        self._seq: Dict[str, int] = defaultdict(int)
+        self._dirty: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def snapshot(self, period: str) -> bytes:
+        """Snapshot event of the last published state of ``period``"""
+        entries = [{"key": entry_key(e), **e} for e in self._last[period]]
+        return sse_event("snapshot", self._seq[period], {"period": period, "entries": entries})
+
+    def subscribe(self, period: str) -> Subscription:
+        if period not in self._last:
+            now = self.now()
+            self._last[period] = list(self.index.top(period, self.limit, now=now))
+            self._starts[period] = period_start(period, now)
+        subscription = Subscription(period, self.queue_size)
+        subscription.queue.put_nowait(self.snapshot(period))
+        self._subscribers[period].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.period)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                # Nobody watching: stop diffing this period
+                del self._subscribers[subscription.period]
+                self._last.pop(subscription.period, None)
+                self._starts.pop(subscription.period, None)
+
+    def notify(self):
+        """Leaderboard changed; publish on the next tick"""
+        if self._dirty is not None:
+            self._dirty.set()
+
+    def publish(self, now: Optional[datetime] = None) -> int:
+        """Diff every watched period and fan changes out; returns events queued
+
+        A period whose window rolled over since the last publish gets a snapshot instead of a diff.
+        """
+        now = now or self.now()
+        queued = 0
+        for period, subscribers in list(self._subscribers.items()):
+            current = list(self.index.top(period, self.limit, now=now))
+            start = period_start(period, now)
+            rolled = start != self._starts[period]
+            if current == self._last[period] and not rolled:
+                continue
+            changes = None if rolled else diff_entries(self._last[period], current)
+            self._last[period] = current
+            self._starts[period] = start
+            self._seq[period] += 1
+            if rolled:
+                message = self.snapshot(period)
+            else:
+                message = sse_event("diff", self._seq[period], {"period": period, **changes})
+            snapshot = None
+
+            def resync(period=period):
+                nonlocal snapshot
+                if snapshot is None:
+                    snapshot = self.snapshot(period)
+                return snapshot
+
+            for subscription in subscribers:
+                if not subscription.offer(message, resync):
+                    self.resyncs += 1
+            self.published += 1
+            queued += len(subscribers)
+        return queued
+
+    def _until_rollover(self) -> float:
+        now = self.now()
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        # A little past midnight, so the index rolls its windows when read
+        return (midnight - now).total_seconds() + 0.1
+
+    async def _run(self):
+        # Wakes on notify() or at UTC midnight, then waits out the interval so bursts coalesce
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._dirty.wait(), timeout=self._until_rollover())
+            except asyncio.TimeoutError:
+                pass
+            self._dirty.clear()
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"Leaderboard publish failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Begin publishing (call from app startup)"""
+        if self._task is None:
+            self._dirty = asyncio.Event()
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop publishing and end every open stream"""
+        if self._task is not None:
+            self._stopping.set()
+            self._dirty.set()
+            await self._task
+            self._task = None
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.close()
+
+    async def stream(self, period: str):
+        """SSE body for one subscriber; ends when the client disconnects"""
+        # Subscribing on first iteration means an abandoned response never leaks a subscription
+        subscription = self.subscribe(period)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                self.delivered += 1
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+    def render(self) -> list:
+        return [
+            "# HELP gofish_leaderboard_stream_subscribers Open leaderboard stream connections",
+            "# TYPE gofish_leaderboard_stream_subscribers gauge",
+            f"gofish_leaderboard_stream_subscribers {len(self)}",
+            "# HELP gofish_leaderboard_stream_diffs_total Leaderboard diffs published",
+            "# TYPE gofish_leaderboard_stream_diffs_total counter",
+            f"gofish_leaderboard_stream_diffs_total {self.published}",
+            "# HELP gofish_leaderboard_stream_events_total Events written to subscribers",
+            "# TYPE gofish_leaderboard_stream_events_total counter",
+            f"gofish_leaderboard_stream_events_total {self.delivered}",
+            "# HELP gofish_leaderboard_stream_resyncs_total Slow subscribers reset to a snapshot",
+            "# TYPE gofish_leaderboard_stream_resyncs_total counter",
+            f"gofish_leaderboard_stream_resyncs_total {self.resyncs}",
+        ]
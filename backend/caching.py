@@ -0,0 +1,99 @@
+"""HTTP conditional caching for read endpoints.
+
+Each ``CacheRule`` maps a GET path to a cheap version lookup (a
+leaderboard generation, a user revision, ...). The version becomes a
+strong ETag; a matching ``If-None-Match`` is answered with 304 before the
+route handler runs, so unchanged polls never reach Mongo.
+"""
+import inspect
+import re
+from typing import Awaitable, Callable, List, Optional, Union
+from urllib.parse import parse_qsl
+
+Version = Optional[str]
+VersionFn = Callable[[dict, dict], Union[Version, Awaitable[Version]]]
+
+
+class CacheRule:
+    """ETag source and Cache-Control policy for one GET route"""
+
+    def __init__(self, name: str, route: str, path: str, version: VersionFn,
+                 cache_control: Union[str, Callable[[], str]]):
+        self.name = name
+        # Route template, reported for requests answered without reaching the router
+        self.route = route
+        self.pattern = re.compile(path)
+        self.version = version
+        self.cache_control = cache_control
+
+    def header(self) -> str:
+        return self.cache_control() if callable(self.cache_control) else self.cache_control
+
+
+def parse_query(query_string: bytes) -> dict:
+    return dict(parse_qsl(query_string.decode("latin-1")))
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as RFC 9110 prescribes for If-None-Match"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ConditionalCacheMiddleware:
+    """ASGI middleware adding ETag/Cache-Control and answering 304s"""
+
+    def __init__(self, app, rules: List[CacheRule]):
+        self.app = app
+        self.rules = rules
+        self.not_modified = 0
+
+    def _match(self, path: str):
+        for rule in self.rules:
+            match = rule.pattern.match(path)
+            if match:
+                return rule, match.groupdict()
+        return None, None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        rule, params = self._match(scope["path"])
+        if rule is None:
+            return await self.app(scope, receive, send)
+        scope["route_template"] = rule.route
+
+        version = rule.version(params, parse_query(scope.get("query_string", b"")))
+        if inspect.isawaitable(version):
+            version = await version
+        if version is None:
+            return await self.app(scope, receive, send)
+
+        etag = f'"{rule.name}-{version}"'
+        cache_control = rule.header()
+        headers = dict(scope["headers"])
+        if_none_match = headers.get(b"if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match.decode("latin-1"), etag):
+            self.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": [
+                (b"etag", etag.encode()), (b"cache-control", cache_control.encode()),
+            ]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"etag", etag.encode()), (b"cache-control", cache_control.encode()),
+                ]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
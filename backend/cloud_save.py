@@ -0,0 +1,333 @@
+"""Versioned cloud save slots with compressed storage and delta sync.
+
+Each (user_id, slot) document holds the save as zlib-compressed JSON plus
+a ``version`` that every write bumps. Writers name the version they
+started from (optimistic concurrency): a full upload from a stale version
+is a conflict, while a JSON Patch (RFC 6902) from a stale version is
+rebased onto the current save when none of the changes it missed touch
+the same paths. The last ``history`` patches are kept so devices can pull
+just the changes since their version; a patch whose ops encode to more than
+``max_ops_bytes`` is recorded like a full upload (``ops`` None), so devices
+behind it fetch the whole save instead.
+"""
+import zlib
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import orjson
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+
+ENCODING = "zlib"
+PATCH_OPS = ("add", "remove", "replace", "move", "copy", "test")
+
+
+class PatchError(ValueError):
+    """A patch that is malformed or does not apply to the save"""
+
+
+class SaveConflict(Exception):
+    """The write's base version is not (and cannot be rebased onto) the stored one"""
+
+    def __init__(self, version: int):
+        super().__init__(f"Save is at version {version}")
+        self.version = version
+
+
+class SaveTooLarge(ValueError):
+    pass
+
+
+# ========== JSON PATCH ==========
+
+def parse_pointer(pointer: str) -> List[str]:
+    """RFC 6901 JSON pointer to its reference tokens"""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {pointer}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _child(container, token: str, path: str):
+    if isinstance(container, dict):
+        if token not in container:
+            raise PatchError(f"Path not found: {path}")
+        return container[token]
+    if isinstance(container, list):
+        return container[_index(container, token, path)]
+    raise PatchError(f"Path not found: {path}")
+
+
+def _index(array: list, token: str, path: str, insert: bool = False) -> int:
+    if insert and token == "-":
+        return len(array)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise PatchError(f"Invalid array index in {path}")
+    index = int(token)
+    if index > len(array) or (index == len(array) and not insert):
+        raise PatchError(f"Array index out of range: {path}")
+    return index
+
+
+def _parent(doc, path: str):
+    tokens = parse_pointer(path)
+    if not tokens:
+        raise PatchError("Operations on the whole document are not supported")
+    target = doc
+    for token in tokens[:-1]:
+        target = _child(target, token, path)
+    if not isinstance(target, (dict, list)):
+        raise PatchError(f"Path not found: {path}")
+    return target, tokens[-1]
+
+
+def _get(doc, path: str):
+    target = doc
+    for token in parse_pointer(path):
+        target = _child(target, token, path)
+    return target
+
+
+def _add(doc, path: str, value):
+    parent, token = _parent(doc, path)
+    if isinstance(parent, dict):
+        parent[token] = value
+    else:
+        parent.insert(_index(parent, token, path, insert=True), value)
+
+
+def _remove(doc, path: str):
+    parent, token = _parent(doc, path)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise PatchError(f"Path not found: {path}")
+        return parent.pop(token)
+    return parent.pop(_index(parent, token, path))
+
+
+def apply_patch(doc: dict, ops: List[dict]) -> dict:
+    """Apply JSON Patch operations to ``doc`` in place and return it"""
+    for op in ops:
+        kind, path = op.get("op"), op.get("path")
+        if kind not in PATCH_OPS or not isinstance(path, str) or (
+                kind in ("move", "copy") and not isinstance(op.get("from"), str)):
+            raise PatchError(f"Invalid patch operation: {op}")
+        if kind == "add":
+            _add(doc, path, op.get("value"))
+        elif kind == "remove":
+            _remove(doc, path)
+        elif kind == "replace":
+            _remove(doc, path)
+            _add(doc, path, op.get("value"))
+        elif kind == "move":
+            _add(doc, path, _remove(doc, op["from"]))
+        elif kind == "copy":
+            _add(doc, path, orjson.loads(orjson.dumps(_get(doc, op["from"]))))
+        elif _get(doc, path) != op.get("value"):
+            raise PatchError(f"Test failed at {path}")
+    return doc
+
+
+def _escape(token) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def make_patch(old, new, path: str = "") -> List[dict]:
+    """JSON Patch turning ``old`` into ``new`` (objects are diffed key by key)"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops += make_patch(old[key], value, child)
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) >= len(old) and new[:len(old)] == old:
+        # Append-only growth (catch logs, unlocked items) is the common case
+        return [{"op": "add", "path": f"{path}/-", "value": value} for value in new[len(old):]]
+    if old == new and type(old) is type(new):
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _scope(pointer: str) -> tuple:
+    # Array positions shift under inserts and removals, so any index (or
+    # "-") stands for the whole array when checking patches for overlap.
+    tokens = []
+    for token in parse_pointer(pointer):
+        if token == "-" or token.isdigit():
+            break
+        tokens.append(token)
+    return tuple(tokens)
+
+
+def touched(ops: List[dict]) -> List[tuple]:
+    scopes = []
+    for op in ops:
+        scopes.append(_scope(op["path"]))
+        if "from" in op:
+            scopes.append(_scope(op["from"]))
+    return scopes
+
+
+def overlaps(ours: List[dict], theirs: List[dict]) -> bool:
+    """Whether two patches touch the same (or nested) paths"""
+    for a in touched(ours):
+        for b in touched(theirs):
+            shorter = min(len(a), len(b))
+            if a[:shorter] == b[:shorter]:
+                return True
+    return False
+
+
+# ========== STORAGE ==========
+
+def decode_save(blob: bytes) -> dict:
+    return orjson.loads(zlib.decompress(blob))
+
+
+def inflate(body: bytes, encoding: Optional[str], limit: int) -> bytes:
+    """Decode a request body sent with Content-Encoding gzip/deflate, capped at ``limit`` bytes"""
+    if not encoding or encoding == "identity":
+        raw = body
+    elif encoding in ("gzip", "deflate"):
+        # wbits: 16+ = gzip container, 15 = zlib (HTTP "deflate")
+        decoder = zlib.decompressobj(31 if encoding == "gzip" else 15)
+        try:
+            raw = decoder.decompress(body, limit + 1)
+        except zlib.error as e:
+            raise ValueError(f"Invalid {encoding} body: {e}")
+    else:
+        raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+    if len(raw) > limit:
+        raise SaveTooLarge(f"Save exceeds {limit} bytes")
+    return raw
+
+
+async def read_limited(stream: AsyncIterator[bytes], limit: int) -> bytes:
+    """Request body from ``stream`` (``Request.stream()``), refused once it passes ``limit`` bytes"""
+    chunks, size = [], 0
+    async for chunk in stream:
+        size += len(chunk)
+        if size > limit:
+            raise SaveTooLarge(f"Request body exceeds {limit} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class SaveStore:
+    """Save slots in a ``saves`` collection keyed by (user_id, slot)"""
+
+    def __init__(self, collection, history: int = 20, max_bytes: int = 1 << 20, max_ops_bytes: int = 64 << 10,
+                 retries: int = 3):
+        self.collection = collection
+        self.history = history
+        self.max_bytes = max_bytes
+        self.max_ops_bytes = max_ops_bytes
+        self.retries = retries
+
+    @staticmethod
+    def _key(user_id: str, slot: int) -> dict:
+        return {"user_id": user_id, "slot": slot}
+
+    async def slots(self, user_id: str) -> List[dict]:
+        """Version metadata of every slot a user has saved"""
+        cursor = self.collection.find({"user_id": user_id}, {
+            "_id": 0, "slot": 1, "version": 1, "updated_at": 1, "device_id": 1, "size": 1, "raw_size": 1,
+        })
+        return await cursor.sort("slot", 1).to_list(None)
+
+    async def load(self, user_id: str, slot: int) -> Optional[dict]:
+        """Stored document (compressed ``data``, no history) or None"""
+        return await self.collection.find_one(self._key(user_id, slot), {"_id": 0, "history": 0})
+
+    async def changes(self, user_id: str, slot: int, since: int) -> Optional[dict]:
+        """Patch from ``since`` to the current version, or None if history no longer covers it"""
+        doc = await self.collection.find_one(self._key(user_id, slot), {"_id": 0, "version": 1, "history": 1})
+        if doc is None:
+            return None
+        missed = self._missed(doc, since)
+        if missed is None:
+            return None
+        return {"version": doc["version"], "patch": [op for entry in missed for op in entry["ops"]]}
+
+    @staticmethod
+    def _missed(doc: dict, since: int) -> Optional[List[dict]]:
+        if since > doc["version"]:
+            return None
+        missed = [entry for entry in doc.get("history", []) if entry["version"] > since]
+        # Truncated history, or a full upload in between, can't be replayed
+        if len(missed) != doc["version"] - since or any(entry["ops"] is None for entry in missed):
+            return None
+        return missed
+
+    def encode(self, data: dict, version: int, device_id: Optional[str]) -> Dict[str, Any]:
+        """Stored fields (compressed blob, sizes) for ``data`` at ``version``"""
+        raw = orjson.dumps(data)
+        if len(raw) > self.max_bytes:
+            raise SaveTooLarge(f"Save exceeds {self.max_bytes} bytes")
+        blob = zlib.compress(raw, 6)
+        return {
+            "data": Binary(blob), "encoding": ENCODING, "version": version, "device_id": device_id,
+            "size": len(blob), "raw_size": len(raw), "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    async def _write(self, user_id: str, slot: int, base: int, fields: dict, ops) -> bool:
+        """Compare-and-set on ``version``; False if another writer got there first"""
+        result = await self.collection.update_one({**self._key(user_id, slot), "version": base}, {
+            "$set": fields,
+            "$push": {"history": {"$each": [{"version": fields["version"], "ops": ops}],
+                                  "$slice": -self.history}},
+        })
+        return result.matched_count == 1
+
+    async def put(self, user_id: str, slot: int, base_version: int, data: dict,
+                  device_id: Optional[str] = None) -> dict:
+        """Replace the whole save; ``base_version`` 0 creates the slot"""
+        fields = self.encode(data, base_version + 1, device_id)
+        if base_version == 0:
+            try:
+                await self.collection.insert_one({**self._key(user_id, slot), **fields,
+                                                  "history": [{"version": 1, "ops": None}]})
+            except DuplicateKeyError:
+                raise SaveConflict(await self._version(user_id, slot))
+        elif not await self._write(user_id, slot, base_version, fields, None):
+            raise SaveConflict(await self._version(user_id, slot))
+        return {"version": fields["version"], "size": fields["size"], "raw_size": fields["raw_size"]}
+
+    async def patch(self, user_id: str, slot: int, base_version: int, ops: List[dict],
+                    device_id: Optional[str] = None) -> Optional[dict]:
+        """Apply a patch made against ``base_version``, rebasing it if it doesn't overlap newer changes.
+
+        Returns None when the slot does not exist. A rebased result carries the
+        missed changes as ``patch`` so the caller can bring its copy up to date.
+        """
+        for _ in range(self.retries):
+            doc = await self.collection.find_one(self._key(user_id, slot), {"_id": 0})
+            if doc is None:
+                return None
+            current = doc["version"]
+            missed = []
+            if base_version != current:
+                missed = self._missed(doc, base_version)
+                if missed is None or any(overlaps(ops, entry["ops"]) for entry in missed):
+                    raise SaveConflict(current)
+            data = apply_patch(decode_save(doc["data"]), ops)
+            fields = self.encode(data, current + 1, device_id)
+            # History holds the last ``history`` entries in the slot document; keep each one small
+            kept = ops if len(orjson.dumps(ops)) <= self.max_ops_bytes else None
+            if await self._write(user_id, slot, current, fields, kept):
+                result = {"version": current + 1, "size": fields["size"], "raw_size": fields["raw_size"]}
+                if missed:
+                    result["patch"] = [op for entry in missed for op in entry["ops"]]
+                return result
+        raise SaveConflict(await self._version(user_id, slot))
+
+    async def _version(self, user_id: str, slot: int) -> int:
+        doc = await self.collection.find_one(self._key(user_id, slot), {"_id": 0, "version": 1})
+        return doc["version"] if doc else 0
@@ -0,0 +1,174 @@
+"""Daily challenges: a precomputed UTC schedule and per-user progress.
+
+``DailySchedule`` holds today's challenge plus the next few days, already
+JSON-encoded. Every read compares only today's date with the cached one,
+and the first read after UTC midnight rolls the window forward, so a
+restart is never needed.
+
+``DailyProgress`` keeps one ``daily_progress`` document per user and day.
+Catch, score and level routes report what happened to ``record()``; an
+event that does not count towards today's challenge costs nothing, and
+one that does is a single ``$inc`` upsert (``$max`` for challenges met by
+one run, such as a score). The first update that reaches
+the target also stamps ``completed_at`` with a conditional write, so
+completion is decided by the server exactly once, however often it is
+checked.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+import orjson
+from pymongo import ReturnDocument
+
+from achievements import GOLDEN_KOI
+
+DAILY_CHALLENGES = (
+    {"type": "catch_count", "target": 50, "description": "Catch 50 fish today", "reward": 500},
+    {"type": "catch_legendary", "target": 1, "description": "Catch a Golden Koi", "reward": 1000},
+    {"type": "level_up", "target": 5, "description": "Level up 5 times", "reward": 750},
+    {"type": "score", "target": 5000, "description": "Score 5000 points in one run", "reward": 600},
+    {"type": "perfect_catches", "target": 10, "description": "Get 10 perfect catches", "reward": 800},
+)
+
+# Progress on these is the best single run, not a running total
+BEST_RUN_CHALLENGES = frozenset({"score"})
+
+
+def build_daily_challenge(date: str) -> dict:
+    """Challenge for a YYYY-MM-DD date"""
+    seed = int(date.replace("-", ""))
+    return {**DAILY_CHALLENGES[seed % len(DAILY_CHALLENGES)], "date": date}
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class DailySchedule:
+    """Today's and the next ``days`` challenges, rebuilt at UTC rollover"""
+
+    def __init__(self, days: int = 7, now: Callable[[], datetime] = utcnow):
+        self.days = days
+        self.now = now
+        self._date = None
+        self._challenges: List[dict] = []
+        self._encoded = b""
+        self._encoded_schedule = b""
+
+    def _roll(self):
+        today = self.now().date()
+        if today != self._date:
+            self._challenges = [build_daily_challenge((today + timedelta(days=i)).isoformat())
+                                for i in range(self.days + 1)]
+            self._encoded = orjson.dumps(self._challenges[0])
+            self._encoded_schedule = orjson.dumps({"challenges": self._challenges})
+            self._date = today
+
+    @property
+    def date(self) -> str:
+        """Today's UTC date, YYYY-MM-DD"""
+        self._roll()
+        return self._challenges[0]["date"]
+
+    def today(self) -> dict:
+        self._roll()
+        return self._challenges[0]
+
+    def encoded(self) -> bytes:
+        """Today's challenge as JSON"""
+        self._roll()
+        return self._encoded
+
+    def encoded_schedule(self) -> bytes:
+        """Today's and upcoming challenges as JSON"""
+        self._roll()
+        return self._encoded_schedule
+
+    def seconds_left(self) -> int:
+        """Seconds until the next rollover"""
+        now = self.now()
+        return 86400 - (now.hour * 3600 + now.minute * 60 + now.second)
+
+
+def progress_amount(challenge: dict, fish_docs: List[dict] = (), scores: List[int] = (), level_ups: int = 0) -> int:
+    """How much an event moves ``challenge`` forward"""
+    kind = challenge["type"]
+    if kind == "catch_count":
+        return len(fish_docs)
+    if kind == "catch_legendary":
+        return sum(1 for doc in fish_docs if doc.get("name") == GOLDEN_KOI)
+    if kind == "perfect_catches":
+        return sum(1 for doc in fish_docs if doc.get("perfect"))
+    if kind == "level_up":
+        return level_ups
+    if kind == "score":
+        return max(scores, default=0)
+    return 0
+
+
+def progress_view(challenge: dict, doc: Optional[dict], completed_now: bool = False) -> dict:
+    doc = doc or {}
+    return {
+        "date": challenge["date"],
+        "type": challenge["type"],
+        "target": challenge["target"],
+        "progress": doc.get("progress", 0),
+        "completed": doc.get("completed_at") is not None or completed_now,
+        "completed_now": completed_now,
+    }
+
+
+class DailyProgress:
+    """Per-user, per-day challenge counters in ``collection``"""
+
+    def __init__(self, collection, users, now: Callable[[], datetime] = utcnow):
+        self.collection = collection
+        self.users = users
+        self.now = now
+
+    async def get(self, user_id: str, challenge: dict) -> dict:
+        doc = await self.collection.find_one({"user_id": user_id, "date": challenge["date"]}, {"_id": 0})
+        return progress_view(challenge, doc)
+
+    async def record(self, user_id: str, challenge: dict, amount: int) -> Optional[dict]:
+        """Add ``amount`` to today's progress (or keep the best run); None if the event did not count"""
+        if amount <= 0:
+            return None
+        operator = "$max" if challenge["type"] in BEST_RUN_CHALLENGES else "$inc"
+        doc = await self.collection.find_one_and_update(
+            {"user_id": user_id, "date": challenge["date"]},
+            {operator: {"progress": amount},
+             "$setOnInsert": {"type": challenge["type"], "target": challenge["target"],
+                              "completed_at": None, "created_at": self.now()}},
+            projection={"_id": 0, "progress": 1, "completed_at": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        completed_now = False
+        if doc["completed_at"] is None and doc["progress"] >= challenge["target"]:
+            completed_now = await self._complete(user_id, challenge)
+        return progress_view(challenge, doc, completed_now)
+
+    async def complete(self, user_id: str, challenge: dict) -> dict:
+        """Mark today's challenge complete if its target was reached; idempotent"""
+        view = await self.get(user_id, challenge)
+        if not view["completed"] and view["progress"] >= challenge["target"]:
+            completed_now = await self._complete(user_id, challenge)
+            view.update(completed=True, completed_now=completed_now)
+        return view
+
+    async def _complete(self, user_id: str, challenge: dict) -> bool:
+        # Only the first caller to match completed_at=None wins
+        result = await self.collection.update_one(
+            {"user_id": user_id, "date": challenge["date"], "completed_at": None,
+             "progress": {"$gte": challenge["target"]}},
+            {"$set": {"completed_at": self.now()}}
+        )
+        if not result.modified_count:
+            return False
+        await self.users.update_one(
+            {"id": user_id},
+            {"$set": {"daily_challenge_completed": True, "daily_challenge_date": challenge["date"]},
+             "$inc": {"rev": 1}}
+        )
+        return True
@@ -0,0 +1,131 @@
+"""Index registry and query-plan checks.
+
+``INDEXES`` declares every index the routes rely on; ``ensure_indexes``
+creates them idempotently at startup. ``ROUTE_QUERIES`` lists the hot
+query of each route so ``verify_query_plans`` can ``explain()`` them and
+report any that would fall back to a collection scan.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("device_id", ASCENDING)], unique=True, name="device_id_unique"),
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("high_score", DESCENDING)], name="high_score"),
+    ],
+    "scores": [
+        IndexModel([("score", DESCENDING)], name="score"),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("timestamp", ASCENDING)], name="timestamp"),
+    ],
+    "score_rollups": [
+        IndexModel([("period", ASCENDING), ("bucket", ASCENDING), ("user_id", ASCENDING)],
+                   unique=True, name="period_bucket_user_unique"),
+        IndexModel([("period", ASCENDING), ("bucket", ASCENDING), ("score", DESCENDING)],
+                   name="period_bucket_score"),
+    ],
+    "tacklebox": [
+        IndexModel([("u", ASCENDING), ("t", DESCENDING), ("_id", DESCENDING)], name="u_t_id"),
+    ],
+    "saves": [
+        IndexModel([("user_id", ASCENDING), ("slot", ASCENDING)], unique=True, name="user_id_slot_unique"),
+    ],
+    # created_at is a BSON date so old days expire on their own
+    "daily_progress": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], unique=True, name="user_id_date_unique"),
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=8 * 86400, name="created_at_ttl"),
+    ],
+    "tacklebox_summary": [
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+    ],
+}
+
+# Representative query per route: filter, optional sort/limit. Collections
+# that only ever hold a handful of documents may opt out of the scan check.
+ROUTE_QUERIES = [
+    {"route": "create_or_get_user", "collection": "users", "filter": {"device_id": "probe"}},
+    {"route": "get_user", "collection": "users", "filter": {"device_id": "probe"}},
+    {"route": "user mutations", "collection": "users", "filter": {"id": "probe"}},
+    {"route": "rank_index.load", "collection": "users", "filter": {"high_score": {"$gt": 0}}},
+    {"route": "get_leaderboard", "collection": "scores", "filter": {},
+     "sort": {"score": -1}, "limit": 100},
+    {"route": "get_leaderboard (period)", "collection": "scores",
+     "filter": {"timestamp": {"$gte": "2026-01-01T00:00:00+00:00"}}, "sort": {"score": -1}, "limit": 100},
+    {"route": "get_leaderboard (rollups)", "collection": "score_rollups",
+     "filter": {"period": "weekly", "bucket": "2026-01-05"}, "sort": {"score": -1}, "limit": 100},
+    {"route": "compactor", "collection": "scores",
+     "filter": {"timestamp": {"$lt": "2026-01-01T00:00:00+00:00"}}},
+    {"route": "get_tacklebox", "collection": "tacklebox", "filter": {"u": "probe"},
+     "sort": {"t": -1, "_id": -1}, "limit": 1001},
+    {"route": "get_tacklebox (cursor)", "collection": "tacklebox",
+     "filter": {"u": "probe", "$or": [
+         {"t": {"$lt": datetime(2026, 1, 1, tzinfo=timezone.utc)}},
+         {"t": datetime(2026, 1, 1, tzinfo=timezone.utc), "_id": {"$lt": ObjectId("0" * 24)}},
+     ]},
+     "sort": {"t": -1, "_id": -1}, "limit": 1001},
+    {"route": "get_tacklebox_summary", "collection": "tacklebox_summary", "filter": {"user_id": "probe"}},
+    {"route": "stats refresh, export", "collection": "scores",
+     "filter": {"_id": {"$gt": ObjectId("0" * 24), "$lt": ObjectId("f" * 24)}}, "sort": {"_id": 1}},
+    {"route": "stats refresh, export", "collection": "tacklebox",
+     "filter": {"_id": {"$gt": ObjectId("0" * 24), "$lt": ObjectId("f" * 24)}}, "sort": {"_id": 1}},
+    {"route": "daily progress", "collection": "daily_progress", "filter": {"user_id": "probe", "date": "2026-01-01"}},
+    {"route": "get_save", "collection": "saves", "filter": {"user_id": "probe", "slot": 0}},
+    {"route": "list_saves", "collection": "saves", "filter": {"user_id": "probe"}, "sort": {"slot": 1}},
+    {"route": "fish_dictionary.load", "collection": "tacklebox_dict", "filter": {"kind": {"$exists": True}},
+     "allow_collscan": True},
+    {"route": "get_weather", "collection": "weather", "filter": {}, "allow_collscan": True},
+    {"route": "get_status_checks", "collection": "status_checks", "filter": {}, "allow_collscan": True},
+]
+
+
+async def ensure_indexes(db):
+    """Create every registered index; safe to run on every startup"""
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            # e.g. duplicate device_ids predating the unique index; keep serving
+            logger.error(f"Could not ensure indexes on {collection}: {e}")
+    logger.info("Indexes ensured")
+
+
+def plan_stages(plan: dict) -> List[str]:
+    """Every stage name in an explain() plan tree"""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan", "innerStage", "outerStage", "thenStage", "elseStage"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+async def explain(db, query: dict) -> List[str]:
+    """Stages of the winning plan for a registered route query"""
+    command = {"find": query["collection"], "filter": query["filter"]}
+    if "sort" in query:
+        command["sort"] = query["sort"]
+    if "limit" in query:
+        command["limit"] = query["limit"]
+    result = await db.command({"explain": command, "verbosity": "queryPlanner"})
+    return plan_stages(result["queryPlanner"]["winningPlan"])
+
+
+async def verify_query_plans(db) -> List[dict]:
+    """Registered route queries whose winning plan is a COLLSCAN"""
+    failures = []
+    for query in ROUTE_QUERIES:
+        if query.get("allow_collscan"):
+            continue
+        stages = await explain(db, query)
+        if "COLLSCAN" in stages:
+            failures.append({"route": query["route"], "collection": query["collection"], "stages": stages})
+    return failures
@@ -0,0 +1,318 @@
+"""In-memory leaderboard indexes backing the /api/leaderboard routes.
+
+The indexes are process-local: they are loaded from Mongo once at startup
+and then kept current by the write routes, so reads never touch Mongo.
+"""
+import bisect
+import random
+import secrets
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional, Tuple
+
+PERIODS = ("daily", "weekly", "all_time")
+
+ENTRY_FIELDS = ("username", "score", "level", "catches", "timestamp")
+
+
+def period_start(period: str, now: datetime) -> Optional[datetime]:
+    """Start of the window containing ``now`` (None for all-time)"""
+    if period == "all_time":
+        return None
+    day = now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "daily":
+        return day
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown leaderboard period: {period}")
+
+
+def bucket(period: str, when: datetime) -> str:
+    """Rollup bucket of a timestamp: its UTC day, its week's Monday, or "all\""""
+    start = period_start(period, when)
+    return "all" if start is None else start.strftime("%Y-%m-%d")
+
+
+def period_filter(period: str, now: Optional[datetime] = None) -> dict:
+    """Mongo filter selecting the ``scores`` rows inside a period"""
+    start = period_start(period, now or datetime.now(timezone.utc))
+    if start is None:
+        return {}
+    # Score timestamps are UTC isoformat strings, so they compare lexically
+    return {"timestamp": {"$gte": start.isoformat()}}
+
+
+def to_entry(doc: dict) -> dict:
+    """Public leaderboard row for a ``scores`` document"""
+    return {field: doc[field] for field in ENTRY_FIELDS}
+
+
+class TopK:
+    """Bounded list of the best ``capacity`` entries, best first"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._keys: List[tuple] = []
+        self._entries: List[dict] = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def offer(self, entry: dict) -> bool:
+        """Insert ``entry`` if it ranks inside the top K; returns whether it did"""
+        # Higher score first, earlier timestamp wins ties
+        key = (-entry["score"], entry["timestamp"])
+        if len(self._keys) >= self.capacity and key >= self._keys[-1]:
+            return False
+        i = bisect.bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self._entries.insert(i, entry)
+        if len(self._entries) > self.capacity:
+            self._keys.pop()
+            self._entries.pop()
+        return True
+
+    def top(self, limit: int) -> List[dict]:
+        return self._entries[:limit]
+
+    def clear(self):
+        self._keys.clear()
+        self._entries.clear()
+
+
+class LeaderboardIndex:
+    """Daily, weekly and all-time top-K windows over submitted scores"""
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.loaded = False
+        # Bumped whenever any window's contents change; used for ETags
+        self.generation = 0
+        # Generations restart at 0 in every process, so ETags also carry this instance's nonce
+        self.nonce = secrets.token_hex(4)
+        self._windows: Dict[str, TopK] = {period: TopK(capacity) for period in PERIODS}
+        self._starts: Dict[str, Optional[datetime]] = {period: None for period in PERIODS}
+
+    def _roll(self, now: datetime):
+        """Empty any window whose period ended since the last call"""
+        for period in PERIODS:
+            start = period_start(period, now)
+            if start != self._starts[period]:
+                self._windows[period].clear()
+                self._starts[period] = start
+                self.generation += 1
+
+    async def load(self, scores, now: Optional[datetime] = None, rollups=None):
+        """Fill every window from ``scores`` and, if given, the current ``score_rollups`` buckets"""
+        now = now or datetime.now(timezone.utc)
+        self._roll(now)
+        projection = {"_id": 0, **{field: 1 for field in ENTRY_FIELDS}}
+        for period in PERIODS:
+            window = self._windows[period]
+            window.clear()
+            cursor = scores.find(period_filter(period, now), projection)
+            async for doc in cursor.sort("score", -1).limit(self.capacity):
+                window.offer(to_entry(doc))
+            if rollups is not None:
+                cursor = rollups.find({"period": period, "bucket": bucket(period, now)}, projection)
+                async for doc in cursor.sort("score", -1).limit(self.capacity):
+                    window.offer(to_entry(doc))
+        self.loaded = True
+        self.generation += 1
+
+    def add(self, doc: dict, now: Optional[datetime] = None):
+        """Record a newly inserted ``scores`` document"""
+        self._roll(now or datetime.now(timezone.utc))
+        entry = to_entry(doc)
+        submitted = datetime.fromisoformat(entry["timestamp"])
+        for period in PERIODS:
+            start = self._starts[period]
+            if start is None or submitted >= start:
+                if self._windows[period].offer(entry):
+                    self.generation += 1
+
+    def covers(self, limit: int) -> bool:
+        """Whether a request for ``limit`` rows can be answered from memory"""
+        return self.loaded and 1 <= limit <= self.capacity
+
+    def version(self, now: Optional[datetime] = None) -> int:
+        """Generation after rolling expired windows"""
+        self._roll(now or datetime.now(timezone.utc))
+        return self.generation
+
+    def etag(self, now: Optional[datetime] = None) -> str:
+        """Version that never repeats across processes or restarts"""
+        return f"{self.nonce}.{self.version(now)}"
+
+    def top(self, period: str = "all_time", limit: int = 100,
+            now: Optional[datetime] = None) -> List[dict]:
+        self._roll(now or datetime.now(timezone.utc))
+        return self._windows[period].top(limit)
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * level
+        # width[l] = number of level-0 steps to next[l] (or past the last node)
+        self.width: List[int] = [1] * level
+
+
+class IndexableSkipList:
+    """Sorted keys with O(log n) insert, remove, rank and select"""
+
+    MAX_LEVEL = 32
+
+    def __init__(self, seed: Optional[int] = None):
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._rng = random.Random(seed)
+
+    def __len__(self):
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and self._rng.random() < 0.5:
+            level += 1
+        return level
+
+    def _path(self, key) -> Tuple[List[_Node], List[int]]:
+        """Last node before ``key`` on every level, with its position"""
+        chain = [self._head] * self.MAX_LEVEL
+        steps = [0] * self.MAX_LEVEL
+        node, pos = self._head, 0
+        for level in reversed(range(self._level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                pos += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            steps[level] = pos
+        return chain, steps
+
+    def rank(self, key) -> int:
+        """Number of keys strictly less than ``key``"""
+        _, steps = self._path(key)
+        return steps[0]
+
+    def insert(self, key):
+        chain, steps = self._path(key)
+        new_level = self._random_level()
+        for level in range(self._level, new_level):
+            self._head.width[level] = self._size + 1
+        self._level = max(self._level, new_level)
+
+        node = _Node(key, new_level)
+        position = steps[0] + 1
+        for level in range(new_level):
+            prev = chain[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            node.width[level] = steps[level] + prev.width[level] + 1 - position
+            prev.width[level] = position - steps[level]
+        for level in range(new_level, self._level):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain, _ = self._path(key)
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(self._level):
+            prev = chain[level]
+            if prev.next[level] is target:
+                prev.width[level] += target.width[level] - 1
+                prev.next[level] = target.next[level]
+            else:
+                prev.width[level] -= 1
+        self._size -= 1
+
+    def slice(self, start: int, stop: int) -> list:
+        """Keys at positions [start, stop)"""
+        start, stop = max(start, 0), min(stop, self._size)
+        if start >= stop:
+            return []
+        node, remaining = self._head, start + 1
+        for level in reversed(range(self._level)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        keys = []
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class RankIndex:
+    """Order-statistic index over each user's best score"""
+
+    def __init__(self, seed: Optional[int] = None):
+        self._best: Dict[str, Tuple[int, str]] = {}
+        self._order = IndexableSkipList(seed)
+
+    def __len__(self):
+        return len(self._best)
+
+    def __contains__(self, user_id: str):
+        return user_id in self._best
+
+    async def load(self, users):
+        """Fill the index from ``users.high_score``"""
+        projection = {"_id": 0, "id": 1, "username": 1, "high_score": 1}
+        async for user in users.find({"high_score": {"$gt": 0}}, projection):
+            self.set(user["id"], user.get("username", "Angler"), user["high_score"])
+
+    def set(self, user_id: str, username: Optional[str], score: int):
+        """Replace a user's best score; a None username keeps the known one"""
+        current = self._best.get(user_id)
+        if current is not None:
+            self._order.remove((-current[0], user_id))
+            username = username or current[1]
+        self._best[user_id] = (score, username or "Angler")
+        self._order.insert((-score, user_id))
+
+    def offer(self, user_id: str, username: Optional[str], score: int) -> bool:
+        """Record a score if it beats the user's best; returns whether it did"""
+        current = self._best.get(user_id)
+        if current is not None and current[0] >= score:
+            return False
+        self.set(user_id, username, score)
+        return True
+
+    def _entry(self, user_id: str, rank: int) -> dict:
+        score, username = self._best[user_id]
+        return {"rank": rank, "user_id": user_id, "username": username, "score": score}
+
+    def rank(self, user_id: str) -> Optional[dict]:
+        """Competition rank (ties share a rank) and percentile of a user"""
+        if user_id not in self._best:
+            return None
+        score = self._best[user_id][0]
+        total = len(self._order)
+        above = self._order.rank((-score,))
+        at_or_above = self._order.rank((-score + 1,))
+        entry = self._entry(user_id, above + 1)
+        entry["total"] = total
+        entry["percentile"] = round(100 * (total - at_or_above) / total, 2)
+        return entry
+
+    def around(self, user_id: str, radius: int) -> Optional[List[dict]]:
+        """Entries within ``radius`` positions of a user, best first"""
+        if user_id not in self._best:
+            return None
+        score = self._best[user_id][0]
+        position = self._order.rank((-score, user_id))
+        start = max(position - radius, 0)
+        keys = self._order.slice(start, position + radius + 1)
+        entries, rank = [], None
+        for offset, (neg_score, neighbour) in enumerate(keys):
+            if offset == 0:
+                rank = self._order.rank((neg_score,)) + 1
+            elif neg_score != keys[offset - 1][0]:
+                rank = start + offset + 1
+            entries.append(self._entry(neighbour, rank))
+        return entries
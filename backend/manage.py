@@ -0,0 +1,129 @@
+"""Maintenance commands for the GO FISH! backend.
+
+    python manage.py --help
+"""
+import asyncio
+import os
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import typer
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
+
+from indexes import ensure_indexes, verify_query_plans
+from retention import compact
+from stats import TABLES as STATS_TABLES, export_collection
+from tacklebox import FishDictionary, migrate_tacklebox, rebuild_summaries
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+cli = typer.Typer(help="GO FISH! backend maintenance commands")
+
+
+def get_db():
+    """Database from MONGO_URL/DB_NAME; call from inside the running loop"""
+    return AsyncIOMotorClient(os.environ['MONGO_URL'])[os.environ['DB_NAME']]
+
+
+@cli.command()
+def rebuild_tacklebox_summary(user_id: Optional[str] = typer.Option(None, help="Only rebuild this user")):
+    """Recompute tacklebox_summary documents from the tacklebox collection"""
+    async def run():
+        return await rebuild_summaries(get_db(), user_id)
+
+    written = asyncio.run(run())
+    typer.echo(f"Rebuilt {written} tacklebox summaries")
+
+
+@cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create every index declared in indexes.INDEXES"""
+    async def run():
+        await ensure_indexes(get_db())
+
+    asyncio.run(run())
+    typer.echo("Indexes ensured")
+
+
+@cli.command()
+def verify_indexes():
+    """explain() every registered route query; exit 1 if any uses COLLSCAN"""
+    async def run():
+        db = get_db()
+        await ensure_indexes(db)
+        return await verify_query_plans(db)
+
+    failures = asyncio.run(run())
+    for failure in failures:
+        typer.echo(f"COLLSCAN: {failure['route']} on {failure['collection']} ({' > '.join(failure['stages'])})")
+    if failures:
+        raise typer.Exit(code=1)
+    typer.echo("All route queries use an index")
+
+
+@cli.command()
+def compact_scores(retention_days: float = typer.Option(
+        float(os.environ.get('SCORE_RETENTION_DAYS', 30)), help="Keep raw scores this many days")):
+    """Fold raw scores older than the retention window into score_rollups"""
+    async def run():
+        return await compact(get_db(), timedelta(days=retention_days))
+
+    result = asyncio.run(run())
+    typer.echo(f"Compacted {result['deleted']} scores older than {result['cutoff']} "
+               f"into {result['user_days']} user-day rollups")
+
+
+@cli.command()
+def migrate_tacklebox_format(batch: int = typer.Option(1000, help="Documents per bulk write"),
+                             rebuild: bool = typer.Option(True, help="Rebuild tacklebox summaries afterwards")):
+    """Convert tacklebox documents to the compact dictionary-encoded format; safe to re-run"""
+    async def run():
+        db = get_db()
+        converted = await migrate_tacklebox(db, FishDictionary(db.tacklebox_dict), batch)
+        await ensure_indexes(db)
+        try:
+            await db.tacklebox.drop_index("user_id_caught_at_id")
+        except OperationFailure:
+            pass  # already gone
+        rebuilt = await rebuild_summaries(db) if rebuild else 0
+        return converted, rebuilt
+
+    converted, rebuilt = asyncio.run(run())
+    typer.echo(f"Converted {converted} tacklebox documents; rebuilt {rebuilt} summaries")
+
+
+@cli.command()
+def export(collection: str = typer.Argument(..., help="scores or tacklebox"),
+           out: Path = typer.Option(Path("exports"), help="Directory for the exported files"),
+           fmt: str = typer.Option("parquet", "--format", help="parquet or arrow (Arrow IPC file)"),
+           batch: int = typer.Option(50_000, help="Documents per chunk / record batch"),
+           full: bool = typer.Option(False, help="Ignore the watermark and export everything")):
+    """Stream documents added since the last export into a Parquet/Arrow file"""
+    if collection not in STATS_TABLES:
+        raise typer.BadParameter(f"choose from {', '.join(STATS_TABLES)}", param_hint="collection")
+    if fmt not in ("parquet", "arrow"):
+        raise typer.BadParameter("choose parquet or arrow", param_hint="--format")
+
+    async def run():
+        db = get_db()
+        out.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = out / f"{collection}-{stamp}.{fmt}"
+        dictionary = FishDictionary(db.tacklebox_dict) if collection == "tacklebox" else None
+        return await export_collection(db, collection, str(path), fmt=fmt, batch=batch, full=full,
+                                       dictionary=dictionary)
+
+    result = asyncio.run(run())
+    if result["rows"]:
+        typer.echo(f"Exported {result['rows']} {collection} documents to {result['path']} "
+                   f"(watermark {result['watermark']})")
+    else:
+        typer.echo(f"No new {collection} documents since the last export")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,181 @@
+"""Request and Mongo command metrics, rendered in Prometheus text format.
+
+``MetricsMiddleware`` times every /api request per route template, method
+and status, and counts the Mongo commands issued while serving it.
+``MongoCommandMetrics`` is a pymongo ``CommandListener``; pass it to
+``AsyncIOMotorClient(event_listeners=[...])``. Motor copies contextvars
+into its executor threads, which is how commands are attributed to the
+request that issued them.
+"""
+import bisect
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Mongo command counter of the request being served, if any
+_request_ops: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_ops", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list:
+        lines, running = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Count and time Mongo commands per collection and command name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple, Tuple[str, str]] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.failures: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "-"
+        ops = _request_ops.get()
+        with self._lock:
+            if ops is not None:
+                ops[0] += 1
+            self._inflight[(event.connection_id, event.request_id)] = (collection, event.command_name)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            key = self._inflight.pop((event.connection_id, event.request_id), None)
+            if key is None:
+                return
+            self.latency[key].observe(event.duration_micros / 1e6)
+            if failed:
+                self.failures[key] += 1
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def render(self) -> list:
+        lines = [
+            "# HELP gofish_mongo_command_duration_seconds Mongo command latency",
+            "# TYPE gofish_mongo_command_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (collection, command), histogram in sorted(self.latency.items()):
+                lines += histogram.render("gofish_mongo_command_duration_seconds",
+                                          _labels(collection=collection, command=command))
+            lines += [
+                "# HELP gofish_mongo_command_failures_total Failed Mongo commands",
+                "# TYPE gofish_mongo_command_failures_total counter",
+            ]
+            for (collection, command), count in sorted(self.failures.items()):
+                labels = _labels(collection=collection, command=command)
+                lines.append(f"gofish_mongo_command_failures_total{{{labels}}} {count}")
+        return lines
+
+
+class RequestMetrics:
+    """Per route/method/status request latency and Mongo command counts"""
+
+    def __init__(self, slow_ms: float = 0, slow_sample: float = 0.0):
+        self.latency: Dict[Tuple[str, str, int], Histogram] = defaultdict(Histogram)
+        self.mongo_ops: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.slow_ms = slow_ms
+        self.slow_sample = slow_sample
+
+    def record(self, route: str, method: str, status: int, seconds: float, ops: int):
+        self.latency[(route, method, status)].observe(seconds)
+        self.mongo_ops[(route, method)] += ops
+        if self.slow_ms and seconds * 1000 >= self.slow_ms and random.random() < self.slow_sample:
+            logger.warning(f"Slow request: {method} {route} -> {status} in {seconds * 1000:.1f}ms, {ops} Mongo ops")
+
+    def render(self) -> list:
+        lines = [
+            "# HELP gofish_http_request_duration_seconds API request latency",
+            "# TYPE gofish_http_request_duration_seconds histogram",
+        ]
+        for (route, method, status), histogram in sorted(self.latency.items()):
+            lines += histogram.render("gofish_http_request_duration_seconds",
+                                      _labels(route=route, method=method, status=status))
+        lines += [
+            "# HELP gofish_http_request_mongo_ops_total Mongo commands issued while serving requests",
+            "# TYPE gofish_http_request_mongo_ops_total counter",
+        ]
+        for (route, method), count in sorted(self.mongo_ops.items()):
+            lines.append(f"gofish_http_request_mongo_ops_total{{{_labels(route=route, method=method)}}} {count}")
+        return lines
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing /api requests by route template"""
+
+    def __init__(self, app, metrics: RequestMetrics, prefix: str = "/api"):
+        self.app = app
+        self.metrics = metrics
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            return await self.app(scope, receive, send)
+
+        status = 500
+        ops = [0]
+        token = _request_ops.set(ops)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_ops.reset(token)
+            route = scope.get("route")
+            label = route.path if route is not None else scope.get("route_template", "unmatched")
+            self.metrics.record(label, scope["method"], status, time.perf_counter() - start, ops[0])
+
+
+def render(*sources) -> str:
+    lines = []
+    for source in sources:
+        lines += source.render()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,36 @@
+"""orjson response helpers.
+
+Hot routes return ``json_response(...)`` directly, which skips FastAPI's
+``jsonable_encoder`` pass; payloads that rarely change are kept as
+pre-encoded bytes in an ``EncodedPayload``.
+"""
+from typing import Any, Callable, Hashable
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+
+__all__ = ["ORJSONResponse", "EncodedPayload", "json_response", "encoded_response"]
+
+
+def json_response(content: Any, status_code: int = 200) -> ORJSONResponse:
+    return ORJSONResponse(content, status_code=status_code)
+
+
+def encoded_response(body: bytes, status_code: int = 200) -> Response:
+    """Response for bytes that are already JSON"""
+    return Response(body, status_code=status_code, media_type="application/json")
+
+
+class EncodedPayload:
+    """JSON bytes rebuilt only when ``key`` changes"""
+
+    def __init__(self, build: Callable[[Hashable], Any]):
+        self._build = build
+        self._key = None
+        self._body = None
+
+    def get(self, key: Hashable = None) -> bytes:
+        if self._body is None or key != self._key:
+            self._body = orjson.dumps(self._build(key))
+            self._key = key
+        return self._body
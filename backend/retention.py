@@ -0,0 +1,130 @@
+"""Score retention: per-user best rollups and compaction of raw ``scores``.
+
+Raw score rows are kept for ``retain`` (SCORE_RETENTION_DAYS). Older rows
+are folded into ``score_rollups`` -- one document per (period, bucket,
+user) holding that user's best run in the bucket -- and then deleted.
+Leaderboard reads combine recent raw rows with the rollups of the current
+buckets, so compaction never changes who is on top.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from indexes import INDEXES
+from leaderboard import ENTRY_FIELDS, PERIODS, bucket, period_filter, to_entry
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = ENTRY_FIELDS + ("user_id", "stage")
+DUPLICATE_KEY = 11000
+
+
+def rollup_filter(period: str, now: Optional[datetime] = None) -> dict:
+    """Rollups of the bucket that is current for ``period``"""
+    return {"period": period, "bucket": bucket(period, now or datetime.now(timezone.utc))}
+
+
+def best_update(period: str, doc: dict) -> UpdateOne:
+    """Upsert ``doc`` as the user's best in its bucket unless a better run is stored"""
+    key = {"period": period, "bucket": bucket(period, datetime.fromisoformat(doc["timestamp"])),
+           "user_id": doc["user_id"]}
+    # Matching only lower scores makes the upsert collide on the unique key
+    # when a better run exists; those duplicate-key errors are expected.
+    return UpdateOne({**key, "score": {"$lt": doc["score"]}},
+                     {"$set": {field: doc.get(field) for field in ROLLUP_FIELDS}}, upsert=True)
+
+
+async def write_bests(rollups, requests: List[UpdateOne]):
+    if not requests:
+        return
+    try:
+        await rollups.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        unexpected = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+        if unexpected:
+            raise
+
+
+async def compact(db, retain: timedelta, now: Optional[datetime] = None, batch: int = 1000) -> dict:
+    """Roll up and delete raw scores older than ``retain``; safe to re-run after a crash"""
+    now = now or datetime.now(timezone.utc)
+    cutoff = (now - retain).isoformat()
+    # best_update relies on the unique key; don't race the startup index build
+    await db.score_rollups.create_indexes(INDEXES["score_rollups"])
+    # Best run per user per day; weekly and all-time bests are derived from these
+    pipeline = [
+        {"$match": {"timestamp": {"$lt": cutoff}}},
+        {"$sort": {"score": -1}},
+        # $substr is byte-based like $substrBytes (ISO timestamps are ASCII) and also runs on mongomock
+        {"$group": {"_id": {"user_id": "$user_id", "day": {"$substr": ["$timestamp", 0, 10]}},
+                    "best": {"$first": "$$ROOT"}}},
+    ]
+    requests, days = [], 0
+    async for row in db.scores.aggregate(pipeline, allowDiskUse=True):
+        days += 1
+        for period in PERIODS:
+            requests.append(best_update(period, row["best"]))
+        if len(requests) >= batch:
+            await write_bests(db.score_rollups, requests)
+            requests = []
+    await write_bests(db.score_rollups, requests)
+
+    deleted = (await db.scores.delete_many({"timestamp": {"$lt": cutoff}})).deleted_count
+    logger.info(f"Score compaction: {deleted} raw rows older than {cutoff} folded into {days} user-days")
+    return {"cutoff": cutoff, "user_days": days, "deleted": deleted}
+
+
+async def top_scores(db, period: str, limit: int) -> List[dict]:
+    """Top ``limit`` leaderboard entries from raw rows and current rollups"""
+    projection = {"_id": 0, **{field: 1 for field in ENTRY_FIELDS}}
+    raw, rolled = await asyncio.gather(
+        db.scores.find(period_filter(period), projection).sort("score", -1).limit(limit).to_list(limit),
+        db.score_rollups.find(rollup_filter(period), projection).sort("score", -1).limit(limit).to_list(limit),
+    )
+    merged = sorted(raw + rolled, key=lambda doc: (-doc["score"], doc["timestamp"]))
+    return [to_entry(doc) for doc in merged[:limit]]
+
+
+class Compactor:
+    """Background task running ``compact`` every ``interval`` seconds"""
+
+    def __init__(self, db, retain: timedelta, interval: float = 3600):
+        self.db = db
+        self.retain = retain
+        self.interval = interval
+        self.runs = 0
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def run_once(self) -> dict:
+        result = await compact(self.db, self.retain)
+        self.runs += 1
+        return result
+
+    async def _run(self):
+        # Like the counter buffer, never cancelled mid-pass; stop() waits for it
+        while not self._stopping.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Score compaction failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Begin periodic compaction (call from app startup); interval 0 disables it"""
+        if self._task is None and self.interval > 0:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
@@ -1,27 +1,125 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Request
 from dotenv import load_dotenv
+from fastapi.responses import Response, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from pymongo import InsertOne, ReturnDocument
 import os
 import logging
+import orjson
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import AliasChoices, BaseModel, Field, ValidationError
+from typing import Annotated, Any, List, Literal, Optional, Union
+import asyncio
 import uuid
+import hashlib
 from datetime import datetime, timezone, timedelta
-import aiohttp
+
+from admission import AdmissionControl, AdmissionMiddleware, AdmissionRule, RateLimit
+from analytics import AnalyticsIngest
+from achievements import ACHIEVEMENTS, SUMMARY_PROJECTION, AchievementRules, CatchRun, grant, lure_count, merge_update
+from daily import DailyProgress, DailySchedule, progress_amount
+from leaderboard import LeaderboardIndex, RankIndex, PERIODS as LEADERBOARD_PERIODS
+from weather import OPEN_METEO_URL, WeatherProvider
+from write_buffer import CounterBuffer
+from retention import Compactor, top_scores
+from stats import TABLES as STATS_TABLES, ColumnCache, catch_rates, lure_sizes, score_distribution
+from broadcast import LeaderboardBroadcaster
+from cloud_save import (PatchError, SaveConflict, SaveStore, SaveTooLarge, decode_save, inflate,
+                        read_limited)
+from indexes import ensure_indexes
+from metrics import MetricsMiddleware, MongoCommandMetrics, RequestMetrics, render as render_metrics
+from caching import CacheRule, ConditionalCacheMiddleware
+from responses import ORJSONResponse, EncodedPayload, encoded_response, json_response
+from tacklebox import (SORT as TACKLEBOX_SORT, FishDictionary, catch_time, encode_cursor, page_query,
+                       summary_update, summary_view)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+mongo_metrics = MongoCommandMetrics()
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_metrics])
 db = client[os.environ['DB_NAME']]
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
+# Per-route latency; SLOW_REQUEST_MS > 0 logs a SLOW_REQUEST_SAMPLE fraction of slower requests
+request_metrics = RequestMetrics(
+    slow_ms=float(os.environ.get('SLOW_REQUEST_MS', 0)),
+    slow_sample=float(os.environ.get('SLOW_REQUEST_SAMPLE', 0.1))
+)
+
+# Process-local top-K leaderboard, loaded at startup
+leaderboard = LeaderboardIndex(capacity=int(os.environ.get('LEADERBOARD_CAPACITY', 1000)))
+# Order-statistic index over each user's high_score, for rank lookups
+rank_index = RankIndex()
+# SSE push of leaderboard diffs, published at most every LEADERBOARD_STREAM_INTERVAL seconds
+broadcaster = LeaderboardBroadcaster(
+    leaderboard,
+    interval=float(os.environ.get('LEADERBOARD_STREAM_INTERVAL', 0.25)),
+    queue_size=int(os.environ.get('LEADERBOARD_STREAM_QUEUE', 16))
+)
+# Memory + Mongo cached open-meteo weather with one shared HTTP session
+weather = WeatherProvider(db.weather, url=os.environ.get('WEATHER_URL', OPEN_METEO_URL))
+# Coalesced catches/high_score updates; COUNTER_WRITE_MODE=write_through disables buffering
+counters = CounterBuffer(
+    db.users,
+    interval=float(os.environ.get('COUNTER_FLUSH_INTERVAL', 1.0)),
+    max_pending=int(os.environ.get('COUNTER_FLUSH_SIZE', 500)),
+    mode=os.environ.get('COUNTER_WRITE_MODE', 'write_behind')
+)
+# Raw scores older than SCORE_RETENTION_DAYS are folded into score_rollups;
+# SCORE_COMPACTION_INTERVAL=0 disables the background pass
+compactor = Compactor(
+    db,
+    retain=timedelta(days=float(os.environ.get('SCORE_RETENTION_DAYS', 30))),
+    interval=float(os.environ.get('SCORE_COMPACTION_INTERVAL', 3600))
+)
+# Versioned, zlib-compressed cloud save slots with JSON Patch delta sync
+saves = SaveStore(
+    db.saves,
+    history=int(os.environ.get('SAVE_HISTORY', 20)),
+    max_bytes=int(os.environ.get('SAVE_MAX_BYTES', 1 << 20)),
+    max_ops_bytes=int(os.environ.get('SAVE_MAX_PATCH_HISTORY_BYTES', 64 << 10))
+)
+SAVE_SLOTS = 10
+# Best-effort analytics: bounded queue drained by insert_many workers;
+# ANALYTICS_PARTITION=day|month writes to one collection per period
+analytics = AnalyticsIngest(
+    db,
+    capacity=int(os.environ.get('ANALYTICS_QUEUE_EVENTS', 100_000)),
+    batch_size=int(os.environ.get('ANALYTICS_BATCH_SIZE', 1000)),
+    workers=int(os.environ.get('ANALYTICS_WORKERS', 2)),
+    partition=os.environ.get('ANALYTICS_PARTITION', 'none')
+)
+# Species/color/weather codes for compact tacklebox documents; past FISH_DICTIONARY_MAX_CODES
+# codes per kind, new values are stored raw
+fish_dictionary = FishDictionary(db.tacklebox_dict, max_codes=int(os.environ.get('FISH_DICTIONARY_MAX_CODES', 1024)))
+# Server-side unlocks, evaluated from counters as catches and level changes arrive
+achievement_rules = AchievementRules()
+# Today's and the next DAILY_SCHEDULE_DAYS challenges, rolled over at UTC midnight
+schedule = DailySchedule(days=int(os.environ.get('DAILY_SCHEDULE_DAYS', 7)))
+daily_progress = DailyProgress(db.daily_progress, db.users)
+# NumPy columns behind /api/stats/*, topped up from an _id watermark at most every
+# STATS_REFRESH_INTERVAL seconds. Cached scores age out with the compaction window,
+# fish after STATS_RETENTION_DAYS; with STATS_SNAPSHOT_DIR set, the columns are saved
+# there on shutdown and the next process starts from them instead of re-reading Mongo
+stats_refresh = float(os.environ.get('STATS_REFRESH_INTERVAL', 30))
+stats_snapshots = os.environ.get('STATS_SNAPSHOT_DIR')
+score_columns = ColumnCache(
+    db.scores, STATS_TABLES["scores"], "timestamp", refresh_interval=stats_refresh, retain=compactor.retain,
+    snapshot=os.path.join(stats_snapshots, "scores.npz") if stats_snapshots else None
+)
+fish_columns = ColumnCache(
+    db.tacklebox, STATS_TABLES["tacklebox"], "caught_at", refresh_interval=stats_refresh,
+    retain=timedelta(days=float(os.environ.get('STATS_RETENTION_DAYS', 30))),
+    snapshot=os.path.join(stats_snapshots, "tacklebox.npz") if stats_snapshots else None
+)
+
 
 # ========== GAME MODELS ==========
 class User(BaseModel):
@@ -36,6 +134,8 @@ class User(BaseModel):
     achievements: List[str] = Field(default_factory=list)
     daily_challenge_completed: bool = False
     daily_challenge_date: Optional[str] = None
+    # Bumped by every mutation; /api/user/{device_id} ETags are built from it
+    rev: int = 0
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class UserCreate(BaseModel):
@@ -67,6 +167,82 @@ class LurePurchase(BaseModel):
 class AchievementUnlock(BaseModel):
     achievement_id: str
 
+class FishCatch(BaseModel):
+    """Client fish payload; other client fields (id, rarity, caughtAt, ...) are ignored"""
+    # Bounded: every new name, color and weather value gets a FishDictionary code
+    name: Optional[str] = Field(None, max_length=64)
+    size: Optional[float] = Field(None, allow_inf_nan=False)
+    points: Optional[int] = None
+    color: Optional[str] = Field(None, max_length=32)
+    perfect: bool = Field(False, validation_alias=AliasChoices("perfect", "isPerfect"))
+    weather: Optional[str] = Field(None, max_length=32)
+    lure: Optional[int] = None
+
+class CatchEvent(BaseModel):
+    type: Literal["catch"]
+    fish: FishCatch
+
+class ScoreEvent(BaseModel):
+    type: Literal["score"]
+    username: Optional[str] = None
+    score: int
+    level: int
+    catches: int
+    stage: int
+
+class LureEvent(BaseModel):
+    type: Literal["unlock_lure"]
+    lure_id: int
+
+class AchievementEvent(BaseModel):
+    type: Literal["unlock_achievement"]
+    achievement_id: str
+
+class LevelEvent(BaseModel):
+    type: Literal["level"]
+    level: int
+
+GameEvent = Annotated[
+    Union[CatchEvent, ScoreEvent, LureEvent, AchievementEvent, LevelEvent],
+    Field(discriminator="type")
+]
+
+class EventBatch(BaseModel):
+    user_id: str
+    events: List[GameEvent] = Field(..., min_length=1, max_length=500)
+
+class PatchOperation(BaseModel):
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str
+    from_: Optional[str] = Field(None, alias="from")
+    value: Any = None
+
+    def as_op(self) -> dict:
+        op = {"op": self.op, "path": self.path}
+        if self.from_ is not None:
+            op["from"] = self.from_
+        if self.op in ("add", "replace", "test"):
+            op["value"] = self.value
+        return op
+
+class SavePatch(BaseModel):
+    base_version: int
+    device_id: Optional[str] = None
+    patch: List[PatchOperation] = Field(..., min_length=1)
+
+class AnalyticsEvent(BaseModel):
+    id: Optional[str] = Field(None, max_length=64)
+    name: str = Field(..., min_length=1, max_length=64)
+    data: dict = Field(default_factory=dict)
+    timestamp: Optional[int] = None
+    session_id: Optional[str] = Field(None, alias="sessionId", max_length=64)
+    session_duration: Optional[int] = Field(None, alias="sessionDuration")
+
+class AnalyticsBatch(BaseModel):
+    user_id: Optional[str] = None
+    device_id: Optional[str] = None
+    events: List[AnalyticsEvent] = Field(..., min_length=1, max_length=1000)
+
 class Weather(BaseModel):
     condition: str
     temperature: int
@@ -77,273 +253,642 @@ class Weather(BaseModel):
 
 
 # ========== USER ROUTES ==========
-@api_router.post("/user", response_model=dict)
+@api_router.post("/user")
 async def create_or_get_user(input: UserCreate):
     """Create new user or return existing user by device_id"""
-    existing = await db.users.find_one({"device_id": input.device_id}, {"_id": 0})
-    if existing:
-        return existing
-    
     user = User(device_id=input.device_id, username=input.username)
-    await db.users.insert_one(user.model_dump())
-    return user.model_dump()
+    return json_response(await db.users.find_one_and_update(
+        {"device_id": input.device_id},
+        {"$setOnInsert": user.model_dump()},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    ))
 
-@api_router.get("/user/{device_id}", response_model=dict)
+@api_router.get("/user/{device_id}")
 async def get_user(device_id: str):
     """Get user by device_id"""
     user = await db.users.find_one({"device_id": device_id}, {"_id": 0})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return json_response(user)
 
 @api_router.post("/user/{user_id}/unlock-lure")
 async def unlock_lure(user_id: str, purchase: LurePurchase):
     """Unlock a lure for user"""
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    user = await db.users.find_one_and_update(
+        {"id": user_id},
+        {"$addToSet": {"unlocked_lures": purchase.lure_id}, "$inc": {"rev": 1}},
+        projection={"_id": 0, "unlocked_lures": 1},
+        return_document=ReturnDocument.AFTER
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    unlocked = user.get("unlocked_lures", [0])
-    if purchase.lure_id not in unlocked:
-        unlocked.append(purchase.lure_id)
-        await db.users.update_one(
-            {"id": user_id},
-            {"$set": {"unlocked_lures": unlocked}}
-        )
-    
-    return {"success": True, "unlocked_lures": unlocked}
+    unlocked = await grant(db.users, user_id, achievement_rules.reached("lures", lure_count(user["unlocked_lures"])))
+    return {"success": True, "unlocked_lures": user["unlocked_lures"], "unlocked": unlocked}
 
 @api_router.post("/user/{user_id}/update-high-score")
 async def update_high_score(user_id: str, score: int):
-    """Update user's high score"""
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"high_score": score}}
-    )
+    """Raise user's high score (buffered)"""
+    await counters.maximum(user_id, "high_score", score)
+    if user_id in rank_index:
+        rank_index.offer(user_id, None, score)
     return {"success": True}
 
 @api_router.post("/user/{user_id}/increment-catches")
 async def increment_catches(user_id: str, count: int = 1):
-    """Increment total catches"""
-    await db.users.update_one(
-        {"id": user_id},
-        {"$inc": {"total_catches": count}}
-    )
+    """Increment total catches (buffered)"""
+    await counters.increment(user_id, "total_catches", count)
     return {"success": True}
 
 @api_router.post("/user/{user_id}/set-level")
 async def set_level(user_id: str, level: int):
-    """Set user level"""
-    await db.users.update_one(
+    """Set user level; only a rise counts towards a level-up challenge"""
+    before = await db.users.find_one_and_update(
         {"id": user_id},
-        {"$set": {"level": level}}
+        {"$set": {"level": level}, "$inc": {"rev": 1}},
+        projection={"_id": 0, "level": 1},
+        return_document=ReturnDocument.BEFORE
     )
-    return {"success": True}
+    if not before:
+        raise HTTPException(status_code=404, detail="User not found")
+    challenge = schedule.today()
+    level_ups = max(0, level - before.get("level", 1))
+    unlocked, daily = await asyncio.gather(
+        grant(db.users, user_id, achievement_rules.reached("level", level)),
+        daily_progress.record(user_id, challenge, progress_amount(challenge, level_ups=level_ups))
+    )
+    return {"success": True, "unlocked": unlocked, "daily_challenge": daily}
 
 @api_router.post("/user/{user_id}/prestige")
 async def prestige_user(user_id: str):
     """Prestige user - reset to level 1 with bonus"""
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    new_prestige = user.get("prestige", 0) + 1
-    await db.users.update_one(
+    user = await db.users.find_one_and_update(
         {"id": user_id},
-        {"$set": {"prestige": new_prestige, "level": 1}}
+        {"$inc": {"prestige": 1, "rev": 1}, "$set": {"level": 1}},
+        projection={"_id": 0, "prestige": 1},
+        return_document=ReturnDocument.AFTER
     )
-    return {"success": True, "prestige": new_prestige}
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    prestige = user["prestige"]
+    unlocked = await grant(db.users, user_id, achievement_rules.reached("prestige", prestige, above=prestige - 1))
+    return {"success": True, "prestige": prestige, "unlocked": unlocked}
 
 @api_router.post("/user/{user_id}/unlock-achievement")
 async def unlock_achievement(user_id: str, achievement: AchievementUnlock):
     """Unlock an achievement"""
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    user = await db.users.find_one_and_update(
+        {"id": user_id},
+        {"$addToSet": {"achievements": achievement.achievement_id}, "$inc": {"rev": 1}},
+        projection={"_id": 0, "achievements": 1},
+        return_document=ReturnDocument.AFTER
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    achievements = user.get("achievements", [])
-    if achievement.achievement_id not in achievements:
-        achievements.append(achievement.achievement_id)
-        await db.users.update_one(
-            {"id": user_id},
-            {"$set": {"achievements": achievements}}
-        )
-    return {"success": True, "achievements": achievements}
+    return {"success": True, "achievements": user["achievements"]}
 
 @api_router.post("/user/{user_id}/complete-daily")
 async def complete_daily(user_id: str):
-    """Mark daily challenge as complete"""
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"daily_challenge_completed": True, "daily_challenge_date": today}}
-    )
-    return {"success": True}
+    """Complete today's challenge if server-tracked progress reached its target; safe to repeat"""
+    progress = await daily_progress.complete(user_id, schedule.today())
+    return {"success": progress["completed"], **progress}
 
 
 # ========== SCORE ROUTES ==========
-@api_router.post("/score", response_model=dict)
+@api_router.post("/score")
 async def create_score(input: ScoreCreate):
     """Submit a new score"""
-    score = Score(**input.model_dump())
-    await db.scores.insert_one(score.model_dump())
-    
-    # Update user high score if needed
-    user = await db.users.find_one({"id": input.user_id}, {"_id": 0})
-    if user and input.score > user.get("high_score", 0):
-        await db.users.update_one(
-            {"id": input.user_id},
-            {"$set": {"high_score": input.score}}
-        )
+    score = Score(**input.model_dump()).model_dump()
+    # insert_one adds _id to the document it is given
+    await db.scores.insert_one(dict(score))
+    leaderboard.add(score)
+    broadcaster.notify()
     
-    return score.model_dump()
-
-@api_router.get("/leaderboard", response_model=List[dict])
-async def get_leaderboard(limit: int = 100):
-    """Get top scores (global leaderboard)"""
-    scores = await db.scores.find({}, {"_id": 0}).sort("score", -1).limit(limit).to_list(limit)
-    return [
-        {
-            "username": s["username"],
-            "score": s["score"],
-            "level": s["level"],
-            "catches": s["catches"],
-            "timestamp": s["timestamp"]
-        }
-        for s in scores
-    ]
+    # Raise user high score if needed
+    result = await db.users.update_one(
+        {"id": input.user_id, "high_score": {"$lt": input.score}},
+        {"$set": {"high_score": input.score}, "$inc": {"rev": 1}}
+    )
+    if result.modified_count:
+        rank_index.offer(input.user_id, input.username, input.score)
+
+    challenge = schedule.today()
+    daily = await daily_progress.record(input.user_id, challenge, progress_amount(challenge, scores=[input.score]))
+    return json_response({**score, "daily_challenge": daily})
+
+def clamp_leaderboard_limit(limit: int) -> int:
+    """Rows a leaderboard read may return: at least 1, at most what the index holds"""
+    return max(1, min(limit, leaderboard.capacity))
+
+@api_router.get("/leaderboard")
+async def get_leaderboard(limit: int = 100, period: str = "all_time"):
+    """Get top scores (global leaderboard) for daily, weekly or all_time"""
+    if period not in LEADERBOARD_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unknown period: {period}")
+    limit = clamp_leaderboard_limit(limit)
+    if leaderboard.covers(limit):
+        return json_response(leaderboard.top(period, limit))
+
+    return json_response(await top_scores(db, period, limit))
+
+@api_router.get("/leaderboard/stream")
+async def stream_leaderboard(period: str = "all_time"):
+    """Server-Sent Events: a ``snapshot`` of the top 100, then ``diff`` events as it changes
+
+    Slow clients may receive a fresh ``snapshot`` in place of the diffs they fell behind on.
+    """
+    if period not in LEADERBOARD_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unknown period: {period}")
+    return StreamingResponse(broadcaster.stream(period), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@api_router.get("/leaderboard/rank/{user_id}")
+async def get_player_rank(user_id: str):
+    """Get a player's rank and percentile by best score"""
+    entry = rank_index.rank(user_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="User has no ranked score")
+    return entry
+
+@api_router.get("/leaderboard/around/{user_id}")
+async def get_leaderboard_around(user_id: str, radius: int = 5):
+    """Get the leaderboard entries around a player"""
+    radius = max(0, min(radius, 50))
+    entries = rank_index.around(user_id, radius)
+    if entries is None:
+        raise HTTPException(status_code=404, detail="User has no ranked score")
+    return {"player": rank_index.rank(user_id), "entries": entries}
 
 
 # ========== WEATHER ROUTES ==========
 @api_router.get("/weather")
 async def get_weather():
     """Get current weather (cached for 30 min)"""
-    cached = await db.weather.find_one({}, {'_id': 0})
-    if cached:
-        cached_time = datetime.fromisoformat(cached.get("cached_at", "2000-01-01T00:00:00+00:00"))
-        if datetime.now(timezone.utc) - cached_time < timedelta(minutes=30):
-            return {
-                "condition": cached["condition"],
-                "temperature": cached["temperature"],
-                "wind_speed": cached["wind_speed"],
-                "cloud_cover": cached["cloud_cover"],
-                "precipitation": cached["precipitation"]
-            }
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            url = "https://api.open-meteo.com/v1/forecast"
-            params = {
-                "latitude": 52.52,
-                "longitude": 13.41,
-                "current_weather": "true",
-                "hourly": "precipitation_probability,cloud_cover"
-            }
-            async with session.get(url, params=params) as response:
-                data = await response.json()
-                
-                cw = data.get("current_weather", {})
-                weather_code = cw.get("weathercode", 0)
-                
-                if weather_code < 4:
-                    condition = "clear"
-                elif weather_code < 50:
-                    condition = "cloudy"
-                elif weather_code < 70:
-                    condition = "rain"
-                else:
-                    condition = "storm"
-                
-                weather_data = {
-                    "condition": condition,
-                    "temperature": int(cw.get("temperature", 18)),
-                    "wind_speed": int(cw.get("windspeed", 8)),
-                    "cloud_cover": data.get("hourly", {}).get("cloud_cover", [30])[0],
-                    "precipitation": data.get("hourly", {}).get("precipitation_probability", [0])[0],
-                    "cached_at": datetime.now(timezone.utc).isoformat()
-                }
-                
-                await db.weather.delete_many({})
-                await db.weather.insert_one(weather_data)
-                
-                return {k: v for k, v in weather_data.items() if k != "cached_at"}
-    except Exception as e:
-        logging.error(f"Weather API error: {e}")
-        return {
-            "condition": "clear",
-            "temperature": 18,
-            "wind_speed": 8,
-            "cloud_cover": 30,
-            "precipitation": 0
-        }
+    return await weather.get()
 
 
 # ========== TACKLEBOX ROUTES ==========
-@api_router.post("/tacklebox/{user_id}/add-fish")
-async def add_fish_to_tacklebox(user_id: str, fish: dict):
-    """Add caught fish to tacklebox"""
-    fish_doc = {
-        "id": str(uuid.uuid4()),
+def make_fish_doc(user_id: str, fish: FishCatch) -> dict:
+    """Build an API-shaped tacklebox document from a client fish payload"""
+    return {
+        "id": str(ObjectId()),
         "user_id": user_id,
-        "name": fish.get("name"),
-        "size": fish.get("size"),
-        "points": fish.get("points"),
-        "color": fish.get("color"),
-        "caught_at": datetime.now(timezone.utc).isoformat()
+        "name": fish.name,
+        "size": fish.size,
+        "points": fish.points,
+        "color": fish.color,
+        "perfect": fish.perfect,
+        "weather": fish.weather,
+        "lure": fish.lure,
+        "caught_at": catch_time()
     }
-    await db.tacklebox.insert_one(fish_doc)
-    return {"success": True, "fish_id": fish_doc["id"]}
+
+def update_summary(user_id: str, fish_docs: list, run: CatchRun):
+    """Fold fish into the user's summary; resolves to the achievement counters as they were before"""
+    return db.tacklebox_summary.find_one_and_update(
+        {"user_id": user_id},
+        merge_update(summary_update(fish_docs), run.streak_update()),
+        projection=SUMMARY_PROJECTION,
+        upsert=True
+    )
+
+@api_router.post("/tacklebox/{user_id}/add-fish")
+async def add_fish_to_tacklebox(user_id: str, fish: FishCatch):
+    """Add caught fish to tacklebox; reports achievements the catch unlocked"""
+    fish_doc = make_fish_doc(user_id, fish)
+    run = CatchRun([fish_doc])
+    challenge = schedule.today()
+    _, before, daily = await asyncio.gather(
+        db.tacklebox.insert_one(await fish_dictionary.pack(fish_doc)),
+        update_summary(user_id, [fish_doc], run),
+        daily_progress.record(user_id, challenge, progress_amount(challenge, fish_docs=[fish_doc]))
+    )
+    unlocked = await grant(db.users, user_id, run.unlocked(achievement_rules, before))
+    return {"success": True, "fish_id": fish_doc["id"], "unlocked": unlocked, "daily_challenge": daily}
 
 @api_router.get("/tacklebox/{user_id}")
-async def get_tacklebox(user_id: str, limit: int = 1000):
-    """Get user's tacklebox (last 1000 fish for performance)"""
-    fish = await db.tacklebox.find(
-        {"user_id": user_id}, 
-        {"_id": 0}
-    ).sort("caught_at", -1).limit(limit).to_list(limit)
-    return {"fish": fish, "count": len(fish)}
+async def get_tacklebox(user_id: str, limit: int = 1000, cursor: Optional[str] = None, format: str = "json"):
+    """Get user's tacklebox, newest first; pass ``next_cursor`` back as ``cursor`` for the next page
+
+    ``format=ndjson`` streams one fish per line followed by a ``{"next_cursor", "count"}`` trailer.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+    limit = max(1, min(limit, 1000 if format == "json" else 100000))
+    try:
+        query = page_query(user_id, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # One extra row tells us whether another page exists
+    docs = db.tacklebox.find(query).sort(TACKLEBOX_SORT).limit(limit + 1)
+
+    if format == "ndjson":
+        return StreamingResponse(stream_tacklebox(docs, limit), media_type="application/x-ndjson")
+
+    stored = await docs.to_list(limit + 1)
+    await fish_dictionary.ready(stored)
+    next_cursor = encode_cursor(stored[limit - 1]) if len(stored) > limit else None
+    fish = [fish_dictionary.unpack(doc) for doc in stored[:limit]]
+    return json_response({"fish": fish, "count": len(fish), "next_cursor": next_cursor})
+
+async def stream_tacklebox(docs, limit: int):
+    """NDJSON body for get_tacklebox; holds one Motor batch in memory at a time"""
+    count, last = 0, None
+    async for doc in docs.batch_size(500):
+        if count == limit:
+            yield orjson.dumps({"next_cursor": encode_cursor(last), "count": count}) + b"\n"
+            return
+        if not fish_dictionary.knows((doc,)):
+            await fish_dictionary.load()
+        yield orjson.dumps(fish_dictionary.unpack(doc)) + b"\n"
+        count, last = count + 1, doc
+    yield orjson.dumps({"next_cursor": None, "count": count}) + b"\n"
+
+@api_router.get("/tacklebox/{user_id}/summary")
+async def get_tacklebox_summary(user_id: str):
+    """Get per-species counts, biggest fish, first catch and total points"""
+    summary = await db.tacklebox_summary.find_one({"user_id": user_id}, {"_id": 0})
+    return summary_view(user_id, summary)
+
+
+# ========== CLOUD SAVE ROUTES ==========
+def check_slot(slot: int):
+    if not 0 <= slot < SAVE_SLOTS:
+        raise HTTPException(status_code=400, detail=f"Slot must be between 0 and {SAVE_SLOTS - 1}")
+
+def save_conflict(e: SaveConflict) -> HTTPException:
+    return HTTPException(status_code=409, detail={"message": "Save version conflict", "version": e.version})
+
+@api_router.get("/saves/{user_id}")
+async def list_saves(user_id: str):
+    """Get version, size and last update of each saved slot"""
+    return await saves.slots(user_id)
+
+@api_router.get("/saves/{user_id}/{slot}")
+async def get_save(user_id: str, slot: int, request: Request):
+    """Get a save slot; its version is in the X-Save-Version header
+
+    Clients accepting ``deflate`` get the stored compressed bytes as-is.
+    """
+    check_slot(slot)
+    doc = await saves.load(user_id, slot)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Save not found")
+    headers = {"X-Save-Version": str(doc["version"]), "Vary": "Accept-Encoding"}
+    if "deflate" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "deflate"
+        return Response(bytes(doc["data"]), media_type="application/json", headers=headers)
+    return Response(orjson.dumps(decode_save(doc["data"])), media_type="application/json", headers=headers)
+
+@api_router.get("/saves/{user_id}/{slot}/changes")
+async def get_save_changes(user_id: str, slot: int, since: int):
+    """Get the JSON Patch from version ``since`` to the current one (410 if no longer available)"""
+    check_slot(slot)
+    changes = await saves.changes(user_id, slot, since)
+    if changes is None:
+        raise HTTPException(status_code=410, detail="Changes unavailable; fetch the full save")
+    return changes
+
+@api_router.put("/saves/{user_id}/{slot}")
+async def put_save(user_id: str, slot: int, base_version: int, request: Request, device_id: Optional[str] = None):
+    """Upload a whole save made from ``base_version`` (0 for a new slot)
+
+    The body is the save JSON, optionally sent with Content-Encoding gzip or deflate.
+    """
+    check_slot(slot)
+    try:
+        body = await read_limited(request.stream(), saves.max_bytes)
+        raw = inflate(body, request.headers.get("content-encoding"), saves.max_bytes)
+        data = orjson.loads(raw)
+        if not isinstance(data, dict):
+            raise ValueError("Save must be a JSON object")
+        return await saves.put(user_id, slot, base_version, data, device_id)
+    except SaveConflict as e:
+        raise save_conflict(e)
+    except SaveTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.patch("/saves/{user_id}/{slot}")
+async def patch_save(user_id: str, slot: int, request: Request):
+    """Apply a JSON Patch (a ``SavePatch`` body) made against ``base_version``
+
+    Patches from an older version are rebased when they don't touch anything
+    changed since; the response's ``patch`` then holds those missed changes.
+    """
+    check_slot(slot)
+    try:
+        input = SavePatch.model_validate_json(await read_limited(request.stream(), saves.max_bytes))
+    except SaveTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    ops = [op.as_op() for op in input.patch]
+    try:
+        result = await saves.patch(user_id, slot, input.base_version, ops, input.device_id)
+    except SaveConflict as e:
+        raise save_conflict(e)
+    except SaveTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Save not found")
+    return result
+
+
+# ========== EVENT BATCH ==========
+USER_STATE_PROJECTION = {
+    "_id": 0, "id": 1, "username": 1, "high_score": 1, "total_catches": 1,
+    "level": 1, "unlocked_lures": 1, "achievements": 1,
+}
+
+def apply_user_update(user: dict, update: dict) -> dict:
+    """``user`` (projected by USER_STATE_PROJECTION) as it is after ``update``"""
+    after = dict(user)
+    for field, amount in update.get("$inc", {}).items():
+        if field in USER_STATE_PROJECTION:
+            after[field] = after.get(field, 0) + amount
+    for field, value in update.get("$max", {}).items():
+        after[field] = max(after.get(field, value), value)
+    for field, values in update.get("$addToSet", {}).items():
+        after[field] = list(after.get(field, []))
+        for value in values["$each"]:
+            if value not in after[field]:
+                after[field].append(value)
+    after.update(update.get("$set", {}))
+    return after
+
+@api_router.post("/events/batch")
+async def ingest_event_batch(batch: EventBatch):
+    """Apply an ordered batch of catch, score and unlock events in one write per collection"""
+    fish_docs, score_events = [], []
+    lures, achievements = [], []
+    levels = []
+    for event in batch.events:
+        if event.type == "catch":
+            fish_docs.append(make_fish_doc(batch.user_id, event.fish))
+        elif event.type == "score":
+            score_events.append(event)
+        elif event.type == "unlock_lure":
+            lures.append(event.lure_id)
+        elif event.type == "unlock_achievement":
+            achievements.append(event.achievement_id)
+        else:
+            levels.append(event.level)
+
+    update = {"$inc": {"rev": 1}}
+    if fish_docs:
+        update["$inc"]["total_catches"] = len(fish_docs)
+    if score_events:
+        update["$max"] = {"high_score": max(event.score for event in score_events)}
+    if lures or achievements:
+        update["$addToSet"] = {}
+        if lures:
+            update["$addToSet"]["unlocked_lures"] = {"$each": lures}
+        if achievements:
+            update["$addToSet"]["achievements"] = {"$each": achievements}
+    level = levels[-1] if levels else None
+    if level is not None:
+        update["$set"] = {"level": level}
+
+    # The stored level before the batch tells which level events were rises
+    before = await db.users.find_one_and_update(
+        {"id": batch.user_id},
+        update,
+        projection=USER_STATE_PROJECTION,
+        return_document=ReturnDocument.BEFORE
+    )
+    if not before:
+        raise HTTPException(status_code=404, detail="User not found")
+    user = apply_user_update(before, update)
+    level_ups, current = 0, before.get("level", 1)
+    for event_level in levels:
+        level_ups += max(0, event_level - current)
+        current = event_level
+
+    username = user.get("username", "Angler")
+    score_docs = [
+        Score(user_id=batch.user_id, username=event.username or username,
+              **event.model_dump(exclude={"type", "username"})).model_dump()
+        for event in score_events
+    ]
+    run = CatchRun(fish_docs)
+    stored = [await fish_dictionary.pack(doc) for doc in fish_docs]
+    challenge = schedule.today()
+    writes = [daily_progress.record(batch.user_id, challenge, progress_amount(
+        challenge, fish_docs=fish_docs, scores=[doc["score"] for doc in score_docs], level_ups=level_ups))]
+    if fish_docs:
+        writes.append(db.tacklebox.bulk_write([InsertOne(doc) for doc in stored]))
+        writes.append(update_summary(batch.user_id, fish_docs, run))
+    if score_docs:
+        writes.append(db.scores.bulk_write([InsertOne(doc) for doc in score_docs]))
+    results = await asyncio.gather(*writes)
+
+    daily = results[0]
+    candidates = run.unlocked(achievement_rules, results[2]) if fish_docs else []
+    if level is not None:
+        candidates += achievement_rules.reached("level", level)
+    candidates += achievement_rules.reached("lures", lure_count(user.get("unlocked_lures", [])))
+    have = set(user.get("achievements", []))
+    unlocked = await grant(db.users, batch.user_id, [a for a in dict.fromkeys(candidates) if a not in have])
+    user["achievements"] = user.get("achievements", []) + unlocked
+
+    for doc in score_docs:
+        leaderboard.add(doc)
+    if score_docs:
+        broadcaster.notify()
+        rank_index.offer(batch.user_id, username, user["high_score"])
+
+    return json_response({
+        "success": True,
+        "user": user,
+        "fish_ids": [doc["id"] for doc in fish_docs],
+        "scores": len(score_docs),
+        "unlocked": unlocked,
+        "daily_challenge": daily,
+    })
 
 
 # ========== DAILY CHALLENGE ==========
 @api_router.get("/daily-challenge")
 async def get_daily_challenge():
     """Get today's daily challenge"""
-    today = datetime.now(timezone.utc)
-    seed = today.year * 10000 + today.month * 100 + today.day
-    
-    challenges = [
-        {"type": "catch_count", "target": 50, "description": "Catch 50 fish today", "reward": 500},
-        {"type": "catch_legendary", "target": 1, "description": "Catch a Golden Koi", "reward": 1000},
-        {"type": "level_up", "target": 5, "description": "Level up 5 times", "reward": 750},
-        {"type": "score", "target": 5000, "description": "Score 5000 points", "reward": 600},
-        {"type": "perfect_catches", "target": 10, "description": "Get 10 perfect catches", "reward": 800},
-    ]
-    
-    challenge = challenges[seed % len(challenges)]
-    challenge["date"] = today.strftime("%Y-%m-%d")
-    return challenge
+    return encoded_response(schedule.encoded())
+
+@api_router.get("/daily-challenge/schedule")
+async def get_daily_schedule():
+    """Today's and the upcoming days' challenges"""
+    return encoded_response(schedule.encoded_schedule())
+
+@api_router.get("/daily-challenge/progress/{user_id}")
+async def get_daily_progress(user_id: str):
+    """A user's progress on today's challenge"""
+    return await daily_progress.get(user_id, schedule.today())
 
 
 # ========== ACHIEVEMENTS ==========
-ACHIEVEMENTS = [
-    {"id": "first_catch", "name": "First Catch", "description": "Catch your first fish", "icon": "🐟"},
-    {"id": "catch_100", "name": "Century Fisher", "description": "Catch 100 fish", "icon": "💯"},
-    {"id": "catch_1000", "name": "Master Angler", "description": "Catch 1000 fish", "icon": "🏆"},
-    {"id": "golden_koi", "name": "Legendary Hunter", "description": "Catch a Golden Koi", "icon": "⭐"},
-    {"id": "level_10", "name": "Rising Star", "description": "Reach level 10", "icon": "🌟"},
-    {"id": "level_50", "name": "Pro Angler", "description": "Reach level 50", "icon": "🎖️"},
-    {"id": "level_100", "name": "Fishing Legend", "description": "Reach level 100", "icon": "👑"},
-    {"id": "prestige_1", "name": "Reborn", "description": "Prestige for the first time", "icon": "♻️"},
-    {"id": "all_lures", "name": "Collector", "description": "Unlock all lures", "icon": "🎣"},
-    {"id": "perfect_10", "name": "Perfectionist", "description": "Get 10 perfect catches in a row", "icon": "✨"},
-    {"id": "whale_watcher", "name": "Whale Watcher", "description": "See the whale 10 times", "icon": "🐋"},
-    {"id": "storm_fisher", "name": "Storm Chaser", "description": "Catch 50 fish during storms", "icon": "⛈️"},
-]
+achievements_payload = EncodedPayload(lambda _: {"achievements": ACHIEVEMENTS})
+achievements_version = hashlib.sha1(achievements_payload.get()).hexdigest()[:16]
 
 @api_router.get("/achievements")
 async def get_achievements():
     """Get all available achievements"""
-    return {"achievements": ACHIEVEMENTS}
+    return encoded_response(achievements_payload.get())
+
+
+# ========== SESSION BOOTSTRAP ==========
+BOOTSTRAP_FIELDS = ("user", "achievements", "daily_challenge", "weather", "leaderboard", "tacklebox")
+# Only what the start screen reads; the full document stays on /api/user/{device_id}
+BOOTSTRAP_USER_PROJECTION = {
+    "_id": 0, "id": 1, "username": 1, "unlocked_lures": 1, "high_score": 1, "total_catches": 1,
+    "level": 1, "prestige": 1, "achievements": 1, "daily_challenge_completed": 1,
+    "daily_challenge_date": 1, "rev": 1,
+}
+BOOTSTRAP_FISH_FIELDS = ("id", "name", "size", "points", "color", "caught_at")
+BOOTSTRAP_FISH_PROJECTION = {"u": 0, "w": 0, "pf": 0, "l": 0}
+
+def parse_fields(fields: Optional[str]) -> tuple:
+    if not fields:
+        return BOOTSTRAP_FIELDS
+    selected = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in BOOTSTRAP_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+async def bootstrap_user(device_id: str, selected: tuple, tacklebox_limit: int) -> dict:
+    """User and, once its id is known, the tacklebox summary and newest fish"""
+    user = await db.users.find_one({"device_id": device_id}, BOOTSTRAP_USER_PROJECTION)
+    parts = {"user": user} if "user" in selected else {}
+    if "tacklebox" in selected:
+        if user is None:
+            parts["tacklebox"] = None
+        else:
+            summary = db.tacklebox_summary.find_one({"user_id": user["id"]}, {"_id": 0})
+            if tacklebox_limit:
+                fish = db.tacklebox.find({"u": user["id"]}, BOOTSTRAP_FISH_PROJECTION) \
+                    .sort(TACKLEBOX_SORT).limit(tacklebox_limit + 1).to_list(tacklebox_limit + 1)
+                summary, fish = await asyncio.gather(summary, fish)
+            else:
+                summary, fish = await summary, []
+            await fish_dictionary.ready(fish)
+            next_cursor = encode_cursor(fish[tacklebox_limit - 1]) if len(fish) > tacklebox_limit else None
+            recent = [fish_dictionary.unpack(doc, BOOTSTRAP_FISH_FIELDS) for doc in fish[:tacklebox_limit]]
+            parts["tacklebox"] = {"summary": summary_view(user["id"], summary),
+                                  "recent": recent, "next_cursor": next_cursor}
+    return parts
+
+async def bootstrap_leaderboard(limit: int) -> list:
+    limit = clamp_leaderboard_limit(limit)
+    if leaderboard.covers(limit):
+        return leaderboard.top("all_time", limit)
+    return await top_scores(db, "all_time", limit)
+
+@api_router.get("/bootstrap/{device_id}")
+async def get_bootstrap(device_id: str, fields: Optional[str] = None,
+                        leaderboard_limit: int = 10, tacklebox_limit: int = 20):
+    """Everything the start screen needs in one call; ``fields=user,weather,...`` selects parts
+
+    ``user`` is null for a device that has not registered yet (POST /api/user).
+    A part that fails is returned as null and named in ``errors``.
+    """
+    selected = parse_fields(fields)
+    leaderboard_limit = max(1, min(leaderboard_limit, 100))
+    tacklebox_limit = max(0, min(tacklebox_limit, 100))
+    payload, errors = {}, []
+    if "achievements" in selected:
+        payload["achievements"] = orjson.Fragment(achievements_payload.get())
+    if "daily_challenge" in selected:
+        payload["daily_challenge"] = orjson.Fragment(schedule.encoded())
+
+    tasks = {}
+    if "user" in selected or "tacklebox" in selected:
+        tasks["user"] = bootstrap_user(device_id, selected, tacklebox_limit)
+    if "weather" in selected:
+        tasks["weather"] = weather.get()
+    if "leaderboard" in selected:
+        tasks["leaderboard"] = bootstrap_leaderboard(leaderboard_limit)
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    for name, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            logger.error(f"Bootstrap part {name} failed: {result}")
+            # The user task also produces the tacklebox
+            failed = [field for field in ("user", "tacklebox") if field in selected] if name == "user" else [name]
+            errors += failed
+            payload.update(dict.fromkeys(failed))
+        elif name == "user":
+            payload.update(result)
+        else:
+            payload[name] = result
+    if errors:
+        payload["errors"] = errors
+    return json_response(payload)
+
+
+# ========== ANALYTICS ==========
+@api_router.post("/analytics/ingest", status_code=202)
+async def ingest_analytics(request: Request):
+    """Queue a batch of client analytics events; 429 with Retry-After when the pipeline is full"""
+    # Refuse before reading the body so an overloaded pipeline stays cheap
+    if analytics.saturated():
+        raise HTTPException(status_code=429, detail="Analytics ingest is busy",
+                            headers={"Retry-After": str(analytics.retry_after())})
+    try:
+        batch = AnalyticsBatch.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    received_at = datetime.now(timezone.utc)
+    docs = [{
+        "event_id": event.id,
+        "name": event.name,
+        "data": event.data,
+        "client_ts": event.timestamp,
+        "session_id": event.session_id,
+        "session_duration": event.session_duration,
+        "user_id": batch.user_id,
+        "device_id": batch.device_id,
+        "received_at": received_at,
+    } for event in batch.events]
+    if not analytics.offer(docs):
+        raise HTTPException(status_code=429, detail="Analytics ingest is busy",
+                            headers={"Retry-After": str(analytics.retry_after())})
+    return {"accepted": len(docs)}
+
+
+# ========== STATS ==========
+@api_router.get("/stats/scores")
+async def get_score_stats(bins: int = 20, days: Optional[float] = None):
+    """Score percentiles and histogram per stage"""
+    if not 1 <= bins <= 200:
+        raise HTTPException(status_code=400, detail="bins must be between 1 and 200")
+    columns = await score_columns.refresh()
+    return json_response(score_distribution(columns, bins=bins, days=days))
+
+@api_router.get("/stats/catches")
+async def get_catch_stats(days: Optional[float] = None):
+    """Catch count, share, hourly rate, perfect rate and mean size per species"""
+    stats = catch_rates(await fish_columns.refresh(), days=days)
+    # Species codes from other workers may be newer than this process's dictionary
+    await fish_dictionary.ready({"s": row["code"]} for row in stats["species"] if row["code"] >= 0)
+    stats["species"] = [{"species": fish_dictionary.decode("species", code) or "unknown", **row}
+                        for code, row in ((row.pop("code"), row) for row in stats["species"])]
+    return json_response(stats)
+
+@api_router.get("/stats/lures")
+async def get_lure_stats(days: Optional[float] = None):
+    """Fish size per lure"""
+    return json_response(lure_sizes(await fish_columns.refresh(), days=days))
+
+
+# ========== METRICS ==========
+@api_router.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of request and Mongo command metrics"""
+    return Response(render_metrics(request_metrics, mongo_metrics, broadcaster, analytics, admission), media_type="text/plain; version=0.0.4")
 
 
 # ========== LEGACY ROUTES ==========
@@ -373,12 +918,72 @@ async def get_status_checks():
 
 app.include_router(api_router)
 
+# ========== HTTP CACHING ==========
+def leaderboard_version(params: dict, query: dict) -> Optional[str]:
+    try:
+        limit = clamp_leaderboard_limit(int(query.get("limit", 100)))
+    except ValueError:
+        return None
+    if not leaderboard.covers(limit):
+        return None
+    return leaderboard.etag()
+
+async def user_version(params: dict, query: dict) -> Optional[str]:
+    user = await db.users.find_one({"device_id": params["device_id"]}, {"_id": 0, "id": 1, "rev": 1})
+    return f"{user['id']}.{user.get('rev', 0)}" if user else None
+
+CACHE_RULES = [
+    CacheRule("achievements", "/api/achievements", r"^/api/achievements$",
+              lambda params, query: achievements_version,
+              "public, max-age=86400"),
+    CacheRule("daily", "/api/daily-challenge", r"^/api/daily-challenge$",
+              lambda params, query: schedule.date,
+              lambda: f"public, max-age={schedule.seconds_left()}"),
+    CacheRule("daily_schedule", "/api/daily-challenge/schedule", r"^/api/daily-challenge/schedule$",
+              lambda params, query: schedule.date,
+              lambda: f"public, max-age={schedule.seconds_left()}"),
+    CacheRule("leaderboard", "/api/leaderboard", r"^/api/leaderboard$", leaderboard_version, "public, max-age=15"),
+    CacheRule("weather", "/api/weather", r"^/api/weather$", lambda params, query: weather.version(), "public, max-age=300"),
+    # Revalidated every time; the revision lookup is a projected single-field read
+    CacheRule("user", "/api/user/{device_id}", r"^/api/user/(?P<device_id>[^/]+)$", user_version, "private, no-cache"),
+]
+
+# ========== ADMISSION CONTROL ==========
+# RATE_LIMIT_* are "tokens per second/burst" per user; a rate of 0 turns that limit off
+catch_limit = RateLimit.parse(os.environ.get('RATE_LIMIT_CATCH', '10/40'))
+ADMISSION_RULES = [
+    AdmissionRule("score", r"^/api/score$", RateLimit.parse(os.environ.get('RATE_LIMIT_SCORE', '2/10'))),
+    # Both halves of a catch share one bucket
+    AdmissionRule("catch", r"^/api/tacklebox/(?P<key>[^/]+)/add-fish$", catch_limit),
+    AdmissionRule("catch", r"^/api/user/(?P<key>[^/]+)/increment-catches$", catch_limit),
+    AdmissionRule("batch", r"^/api/events/batch$", RateLimit.parse(os.environ.get('RATE_LIMIT_BATCH', '2/10'))),
+]
+# At most MONGO_CONCURRENCY requests run handlers at once; up to MONGO_QUEUE more wait
+# MONGO_QUEUE_DEADLINE seconds for a slot before being shed with 503
+admission = AdmissionControl(
+    ADMISSION_RULES,
+    concurrency=int(os.environ.get('MONGO_CONCURRENCY', 64)),
+    queue=int(os.environ.get('MONGO_QUEUE', 1024)),
+    deadline=float(os.environ.get('MONGO_QUEUE_DEADLINE', 2.0)),
+    # Long-lived streams, self-limiting routes and routes answered from memory
+    exempt=[r"^/api/metrics$", r"^/api/leaderboard/stream$", r"^/api/analytics/ingest$",
+            r"^/api/leaderboard$", r"^/api/leaderboard/(rank|around)/[^/]+$",
+            r"^/api/achievements$", r"^/api/daily-challenge(/schedule)?$", r"^/api/$"],
+    enabled=os.environ.get('ADMISSION_CONTROL', 'on') != 'off'
+)
+
+# Innermost, so 304s answered from the cache never wait for a slot
+app.add_middleware(AdmissionMiddleware, control=admission)
+app.add_middleware(ConditionalCacheMiddleware, rules=CACHE_RULES)
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Save-Version", "Retry-After"],
 )
 
 logging.basicConfig(
@@ -387,6 +992,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_index_bootstrap():
+    # Runs in the background so a long index build never delays startup
+    app.state.index_bootstrap = asyncio.create_task(ensure_indexes(db))
+
+@app.on_event("startup")
+async def load_leaderboard():
+    await leaderboard.load(db.scores, rollups=db.score_rollups)
+    await rank_index.load(db.users)
+    logger.info(f"Leaderboard index loaded (capacity {leaderboard.capacity}, {len(rank_index)} ranked players)")
+
+@app.on_event("startup")
+async def load_fish_dictionary():
+    await fish_dictionary.load()
+
+@app.on_event("startup")
+async def start_weather():
+    await weather.start()
+
+@app.on_event("startup")
+async def start_counters():
+    counters.start()
+
+@app.on_event("startup")
+async def start_compactor():
+    compactor.start()
+
+@app.on_event("startup")
+async def start_broadcaster():
+    broadcaster.start()
+
+@app.on_event("startup")
+async def start_analytics():
+    analytics.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await broadcaster.stop()
+    await analytics.stop()
+    await compactor.stop()
+    await counters.stop()
+    await asyncio.gather(score_columns.save(), fish_columns.save())
+    await weather.close()
     client.close()
@@ -0,0 +1,429 @@
+"""Columnar views of ``scores`` and ``tacklebox``: cached NumPy stats and Parquet/Arrow export.
+
+Both read a collection in ``_id`` order from a watermark: ``scan`` yields
+chunks of documents with ``_id`` above the last one seen and older than
+``lag`` seconds, so documents whose ObjectIds were minted slightly out of
+order by other processes are not skipped.
+
+``ColumnCache`` appends each chunk to growable NumPy arrays and only ever
+asks Mongo for what arrived since its watermark. It holds the last
+``retain`` of rows, so a fresh cache starts reading at the retention cutoff,
+or from a ``snapshot`` file (columns plus watermark) an earlier process
+saved on shutdown. The ``/api/stats/*``
+functions below then work on whole arrays (bincount, percentile,
+searchsorted) instead of looping over documents. ``export_collection``
+converts the same chunks into Arrow record batches and streams them to a
+Parquet or Arrow IPC file, so memory stays bounded by ``batch``. It then
+records its watermark in ``export_watermarks`` so the next run exports only
+newer documents.
+"""
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from bson import ObjectId
+from bson.errors import InvalidId
+
+logger = logging.getLogger(__name__)
+
+MISSING_TIME = np.iinfo(np.int64).min
+
+
+class Column(NamedTuple):
+    name: str
+    field: str
+    # int16/int32/int64/float64/bool/timestamp (ms), code (FishDictionary ``kind``), str,
+    # or id (the fish id the API exposes: "i" if migrated, else _id)
+    dtype: str
+    kind: Optional[str] = None
+
+    @property
+    def numeric(self) -> bool:
+        return self.dtype not in ("str", "id")
+
+
+TABLES: Dict[str, List[Column]] = {
+    "scores": [
+        Column("id", "id", "str"),
+        Column("user_id", "user_id", "str"),
+        Column("score", "score", "int64"),
+        Column("level", "level", "int32"),
+        Column("catches", "catches", "int32"),
+        Column("stage", "stage", "int16"),
+        Column("timestamp", "timestamp", "timestamp"),
+    ],
+    "tacklebox": [
+        Column("id", "_id", "id"),
+        Column("user_id", "u", "str"),
+        Column("species", "s", "code", "species"),
+        Column("color", "c", "code", "color"),
+        Column("weather", "w", "code", "weather"),
+        Column("size", "z", "float64"),
+        Column("points", "p", "float64"),
+        Column("lure", "l", "int16"),
+        Column("perfect", "pf", "bool"),
+        Column("caught_at", "t", "timestamp"),
+    ],
+}
+# Sentinel for a missing value in each numeric dtype
+MISSING = {"int16": -1, "int32": -1, "int64": -1, "code": -1, "float64": np.nan, "bool": False,
+           "timestamp": MISSING_TIME}
+
+
+def _millis(value) -> int:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return MISSING_TIME
+    if not isinstance(value, datetime):
+        return MISSING_TIME
+    # Motor returns naive UTC datetimes
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def _number(value, missing, low=-np.inf, high=np.inf):
+    # Fish payloads are client-shaped; anything that is not a plain, representable number counts as missing
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and low <= value <= high:
+        return value
+    return missing
+
+
+def column_array(docs: Sequence[dict], column: Column) -> np.ndarray:
+    """One numeric column of ``docs`` as an array, missing values as ``MISSING[dtype]``"""
+    field, dtype, missing = column.field, column.dtype, MISSING.get(column.dtype)
+    if dtype == "timestamp":
+        return np.fromiter((_millis(doc.get(field)) for doc in docs), np.int64, len(docs))
+    if dtype == "bool":
+        return np.fromiter((bool(doc.get(field)) for doc in docs), np.bool_, len(docs))
+    numpy_dtype = np.dtype(np.int32 if dtype == "code" else dtype)
+    if numpy_dtype.kind == "f":
+        return np.fromiter((_number(doc.get(field), missing) for doc in docs), numpy_dtype, len(docs))
+    bounds = np.iinfo(numpy_dtype)
+    return np.fromiter((int(_number(doc.get(field), missing, bounds.min, bounds.max)) for doc in docs),
+                       numpy_dtype, len(docs))
+
+
+def _projection(columns: Sequence[Column]) -> dict:
+    return {column.field: 1 for column in columns}
+
+
+async def scan(collection, columns: Sequence[Column], after: Optional[ObjectId] = None,
+               lag: float = 5.0, batch: int = 10_000) -> AsyncIterator[List[dict]]:
+    """Chunks of documents with ``after`` < _id < now - ``lag``, in _id order"""
+    bound = {"$lt": ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=lag))}
+    if after is not None:
+        bound["$gt"] = after
+    cursor = collection.find({"_id": bound}, _projection(columns)).sort("_id", 1).batch_size(batch)
+    chunk = []
+    async for doc in cursor:
+        chunk.append(doc)
+        if len(chunk) == batch:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ColumnCache:
+    """Growable NumPy columns of one collection, refreshed incrementally from an _id watermark"""
+
+    def __init__(self, collection, columns: Sequence[Column], time_column: str,
+                 refresh_interval: float = 30.0, lag: float = 5.0, retain: timedelta = timedelta(days=30),
+                 snapshot: Optional[str] = None, batch: int = 10_000, clock: Callable[[], float] = time.monotonic):
+        self.columns = [column for column in columns if column.numeric]
+        self.time_column = time_column
+        self.refresh_interval = refresh_interval
+        self.lag = lag
+        self.retain = retain
+        self.snapshot = snapshot
+        self.batch = batch
+        self.clock = clock
+        self.reset(collection)
+
+    def reset(self, collection):
+        """Drop everything cached and read ``collection`` from the start on the next refresh"""
+        self.collection = collection
+        self.watermark: Optional[ObjectId] = None
+        self.size = 0
+        self.refreshed_at: Optional[float] = None
+        self._arrays = {column.name: np.empty(0, self._dtype(column)) for column in self.columns}
+        self._inflight: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _dtype(column: Column):
+        return {"timestamp": np.int64, "code": np.int32, "bool": np.bool_}.get(column.dtype, column.dtype)
+
+    def view(self) -> Dict[str, np.ndarray]:
+        """The cached rows, one array per column (views, not copies)"""
+        return {name: array[:self.size] for name, array in self._arrays.items()}
+
+    def _columns(self, docs: List[dict]) -> Dict[str, np.ndarray]:
+        return {column.name: column_array(docs, column) for column in self.columns}
+
+    def _append(self, chunk: Dict[str, np.ndarray], n: int):
+        needed = self.size + n
+        for name, array in self._arrays.items():
+            if needed > len(array):
+                grown = np.empty(max(needed, 2 * len(array), 1024), array.dtype)
+                grown[:self.size] = array[:self.size]
+                self._arrays[name] = array = grown
+            array[self.size:needed] = chunk[name]
+        self.size = needed
+
+    def _trim(self):
+        cutoff = int((datetime.now(timezone.utc) - self.retain).timestamp() * 1000)
+        times = self._arrays[self.time_column][:self.size]
+        if self.size and times.min() < cutoff:
+            keep = times >= cutoff
+            kept = int(keep.sum())
+            for name, array in self._arrays.items():
+                array[:kept] = array[:self.size][keep]
+            self.size = kept
+
+    async def _start(self):
+        # Documents inserted before the retention cutoff would only be trimmed again
+        cutoff = ObjectId.from_datetime(datetime.now(timezone.utc) - self.retain)
+        restored = await asyncio.to_thread(self._read_snapshot) if self.snapshot else None
+        if restored is not None:
+            arrays, watermark = restored
+            self._arrays, self.size = arrays, len(next(iter(arrays.values())))
+            cutoff = max(cutoff, watermark)
+        self.watermark = cutoff
+
+    def _read_snapshot(self) -> Optional[tuple]:
+        try:
+            with np.load(self.snapshot) as saved:
+                arrays = {name: saved[name] for name in self._arrays}
+                watermark = ObjectId(saved["watermark"].tobytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError, InvalidId) as e:
+            logger.warning(f"Ignoring stats snapshot {self.snapshot}: {e}")
+            return None
+        if any(array.dtype != self._arrays[name].dtype for name, array in arrays.items()) or \
+                len({len(array) for array in arrays.values()}) != 1:
+            logger.warning(f"Ignoring stats snapshot {self.snapshot}: columns do not match")
+            return None
+        return arrays, watermark
+
+    async def save(self):
+        """Write the cached columns and watermark to ``snapshot`` for the next process to start from"""
+        if self.snapshot is None or self.watermark is None:
+            return
+        # Copies: a refresh may append to or trim the live arrays while the file is written
+        arrays = {name: array.copy() for name, array in self.view().items()}
+        watermark = np.frombuffer(self.watermark.binary, np.uint8)
+        await asyncio.to_thread(self._write_snapshot, arrays, watermark)
+
+    def _write_snapshot(self, arrays: Dict[str, np.ndarray], watermark: np.ndarray):
+        buffer = io.BytesIO()
+        np.savez(buffer, watermark=watermark, **arrays)
+        # Written aside and renamed, so workers sharing the path never read a partial file
+        temp = f"{self.snapshot}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(buffer.getbuffer())
+        os.replace(temp, self.snapshot)
+
+    async def _load(self):
+        if self.watermark is None:
+            await self._start()
+        async for docs in scan(self.collection, self.columns, self.watermark, self.lag, self.batch):
+            # The one per-document pass; off the event loop so a large first load can't stall requests
+            chunk = await asyncio.to_thread(self._columns, docs)
+            self._append(chunk, len(docs))
+            self.watermark = docs[-1]["_id"]
+        self._trim()
+        self.refreshed_at = self.clock()
+
+    async def refresh(self) -> Dict[str, np.ndarray]:
+        """Columns including everything older than ``lag``, reading Mongo at most every ``refresh_interval``"""
+        if self.refreshed_at is None or self.clock() - self.refreshed_at >= self.refresh_interval:
+            # Single flight: concurrent callers wait for the same incremental read
+            if self._inflight is None:
+                self._inflight = asyncio.create_task(self._load())
+                self._inflight.add_done_callback(self._refresh_done)
+            # A failed read is logged by _refresh_done; serve what is cached and retry next time
+            with contextlib.suppress(Exception):
+                await asyncio.shield(self._inflight)
+        return self.view()
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._inflight = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Stats refresh failed: {task.exception()}")
+
+
+# ========== STATS ==========
+def since_mask(times: np.ndarray, days: Optional[float]) -> Optional[np.ndarray]:
+    if not days:
+        return None
+    cutoff = int((datetime.now(timezone.utc) - timedelta(days=days)).timestamp() * 1000)
+    return times >= cutoff
+
+
+def _groups(keys: np.ndarray):
+    """Distinct integer ``keys`` and each row's position among them (int16 when it fits, so it radix-sorts)"""
+    offset = int(keys.min())
+    if int(keys.max()) - offset <= 1 << 16:
+        # Dense keys (stages, lures): counting instead of sorting
+        slots = keys.astype(np.int64) - offset
+        present = np.bincount(slots) > 0
+        ids, index = np.flatnonzero(present) + offset, (np.cumsum(present) - 1)[slots]
+    else:
+        ids, index = np.unique(keys, return_inverse=True)
+    return ids, index.astype(np.int16) if len(ids) <= np.iinfo(np.int16).max else index
+
+
+def _select(columns: Dict[str, np.ndarray], mask: Optional[np.ndarray]) -> Dict[str, np.ndarray]:
+    return columns if mask is None else {name: array[mask] for name, array in columns.items()}
+
+
+def score_distribution(columns: Dict[str, np.ndarray], bins: int = 20,
+                       percentiles: Sequence[float] = (50, 90, 99), days: Optional[float] = None) -> dict:
+    """Per-stage score percentiles and histograms over shared bin edges"""
+    columns = _select(columns, since_mask(columns["timestamp"], days))
+    scores, stages = columns["score"], columns["stage"]
+    if len(scores) == 0:
+        return {"count": 0, "edges": [], "stages": []}
+    edges = np.histogram_bin_edges(scores, bins=bins)
+    # Group rows by stage once, then bin every score in a single bincount
+    stage_ids, stage_index = _groups(stages)
+    bin_index = np.clip(np.searchsorted(edges, scores, side="right") - 1, 0, bins - 1)
+    cells = stage_index.astype(np.int64) * bins + bin_index
+    counts = np.bincount(cells, minlength=len(stage_ids) * bins).reshape(-1, bins)
+    order = np.argsort(stage_index, kind="stable")
+    groups = np.split(scores[order], np.cumsum(counts.sum(axis=1))[:-1])
+    return {
+        "count": int(len(scores)),
+        "edges": edges.tolist(),
+        "stages": [{
+            "stage": int(stage),
+            "count": int(len(group)),
+            "mean": float(group.mean()),
+            "percentiles": {f"p{p:g}": float(v) for p, v in zip(percentiles, np.percentile(group, percentiles))},
+            "histogram": row.tolist(),
+        } for stage, group, row in zip(stage_ids, groups, counts)],
+    }
+
+
+def catch_rates(columns: Dict[str, np.ndarray], days: Optional[float] = None) -> dict:
+    """Catches per species: count, share, catches/hour over the window, perfect rate, mean size"""
+    columns = _select(columns, since_mask(columns["caught_at"], days))
+    species, total = columns["species"], len(columns["species"])
+    if total == 0:
+        return {"count": 0, "hours": 0.0, "species": []}
+    # Code -1 (no species) lands in slot 0
+    slots = species + 1
+    counts = np.bincount(slots)
+    perfect = np.bincount(slots, weights=columns["perfect"], minlength=len(counts))
+    sizes = columns["size"]
+    sized = ~np.isnan(sizes)
+    size_counts = np.bincount(slots[sized], minlength=len(counts))
+    size_sums = np.bincount(slots[sized], weights=sizes[sized], minlength=len(counts))
+    times = columns["caught_at"][columns["caught_at"] != MISSING_TIME]
+    hours = float(days * 24) if days else (float(times.max() - times.min()) / 3_600_000 if len(times) else 0.0)
+    present = np.flatnonzero(counts)
+    present = present[np.argsort(-counts[present], kind="stable")]
+    return {
+        "count": total,
+        "hours": hours,
+        "species": [{
+            "code": int(slot) - 1,
+            "count": int(counts[slot]),
+            "share": float(counts[slot] / total),
+            "per_hour": float(counts[slot] / hours) if hours else None,
+            "perfect_rate": float(perfect[slot] / counts[slot]),
+            "mean_size": float(size_sums[slot] / size_counts[slot]) if size_counts[slot] else None,
+        } for slot in present],
+    }
+
+
+def lure_sizes(columns: Dict[str, np.ndarray], days: Optional[float] = None) -> dict:
+    """Fish size per lure: count, mean and median (catches without a lure or size are skipped)"""
+    columns = _select(columns, since_mask(columns["caught_at"], days))
+    lures, sizes = columns["lure"], columns["size"]
+    keep = (lures >= 0) & ~np.isnan(sizes)
+    lures, sizes = lures[keep], sizes[keep]
+    if len(lures) == 0:
+        return {"count": 0, "lures": []}
+    lure_ids, lure_index = _groups(lures)
+    counts = np.bincount(lure_index)
+    sums = np.bincount(lure_index, weights=sizes)
+    # Few lures: one O(n) partition-based median per run of the (radix) sorted rows
+    runs = np.split(sizes[np.argsort(lure_index, kind="stable")], np.cumsum(counts)[:-1])
+    medians = [np.median(run) for run in runs]
+    return {
+        "count": int(len(lures)),
+        "lures": [{"lure": int(lure), "count": int(count), "mean_size": float(total / count),
+                   "median_size": float(median)}
+                  for lure, count, total, median in zip(lure_ids, counts, sums, medians)],
+    }
+
+
+# ========== EXPORT ==========
+def _arrow_array(docs: Sequence[dict], column: Column, dictionary):
+    import pyarrow as pa
+
+    if column.dtype == "id":
+        return pa.array([doc.get("i") or str(doc["_id"]) for doc in docs], pa.string())
+    if column.dtype == "str":
+        values = (doc.get(column.field) for doc in docs)
+        return pa.array([value if isinstance(value, str) else None for value in values], pa.string())
+    if column.dtype == "code":
+        return pa.array([dictionary.decode(column.kind, doc.get(column.field)) for doc in docs], pa.string())
+    values = column_array(docs, column)
+    if column.dtype == "bool":
+        return pa.array(values)
+    missing = np.isnan(values) if column.dtype == "float64" else values == MISSING[column.dtype]
+    if column.dtype == "timestamp":
+        return pa.array(values, pa.timestamp("ms", tz="UTC"), mask=missing)
+    return pa.array(values, mask=missing)
+
+
+async def export_collection(db, name: str, path: str, fmt: str = "parquet", batch: int = 50_000,
+                            full: bool = False, lag: float = 5.0, dictionary=None) -> dict:
+    """Stream ``name`` past its export watermark into one Parquet/Arrow IPC file at ``path``
+
+    Returns {"rows", "watermark", "path"}; no file is written when nothing is new.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = TABLES[name]
+    state = None if full else await db.export_watermarks.find_one({"_id": name})
+    after = state["watermark"] if state else None
+    if dictionary is not None:
+        await dictionary.load()
+
+    writer, rows, last = None, 0, after
+    try:
+        async for docs in scan(db[name], columns, after, lag, batch):
+            if dictionary is not None:
+                await dictionary.ready(docs)
+            record_batch = pa.RecordBatch.from_arrays([_arrow_array(docs, column, dictionary) for column in columns],
+                                                      names=[column.name for column in columns])
+            if writer is None:
+                writer = (pq.ParquetWriter(path, record_batch.schema, compression="zstd") if fmt == "parquet"
+                          else pa.ipc.new_file(path, record_batch.schema))
+            writer.write_batch(record_batch)
+            rows += len(docs)
+            last = docs[-1]["_id"]
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # Only advanced once the file is complete, so a failed export is simply redone
+    if rows:
+        await db.export_watermarks.update_one(
+            {"_id": name}, {"$set": {"watermark": last, "exported_at": datetime.now(timezone.utc), "path": path}},
+            upsert=True)
+    return {"rows": rows, "watermark": str(last) if last else None, "path": path if rows else None}
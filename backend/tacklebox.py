@@ -0,0 +1,315 @@
+"""Tacklebox storage helpers: compact documents, keyset pagination and per-user summaries"""
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+
+# ========== STORAGE FORMAT ==========
+# Stored fish are compact: {"_id": ObjectId, "u": user_id, "s": species code,
+#  "c": color code, "z": size, "p": points, "t": caught_at as a BSON date,
+#  "pf": true (perfect catches only), "w": weather code, "l": lure index,
+#  "i": pre-migration id}.
+# Species, color and weather are dictionary-encoded through ``FishDictionary``
+# (stored raw once a kind has ``max_codes`` codes); absent fields are omitted. ``unpack`` restores the
+# API shape below, with ``id`` = str(_id) (or the original id of a migrated fish).
+API_FIELDS = ("id", "user_id", "name", "size", "points", "color", "perfect", "weather", "lure", "caught_at")
+CODED = {"name": ("s", "species"), "color": ("c", "color"), "weather": ("w", "weather")}
+PLAIN = {"size": "z", "points": "p", "lure": "l"}
+
+
+def to_date(caught_at: str) -> datetime:
+    """ISO timestamp to the millisecond-precision UTC datetime BSON stores"""
+    when = datetime.fromisoformat(caught_at)
+    when = when.replace(tzinfo=timezone.utc) if when.tzinfo is None else when.astimezone(timezone.utc)
+    return when.replace(microsecond=when.microsecond // 1000 * 1000)
+
+
+def catch_time() -> str:
+    """Current UTC time as an ISO caught_at, at the precision it will be stored with"""
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000).isoformat()
+
+
+def from_date(when: datetime) -> str:
+    # Motor returns naive UTC datetimes
+    return when.replace(tzinfo=timezone.utc).isoformat() if when.tzinfo is None else when.isoformat()
+
+
+class FishDictionary:
+    """Species/color/weather strings <-> small integer codes, persisted in ``collection``
+
+    One document per value, ``{"_id": "<kind>:<value>", "kind", "value", "code"}``,
+    so the _id index alone keeps a value from getting two codes. Codes come
+    from a ``{"_id": "#<kind>", "seq"}`` counter; a racing writer just wastes one.
+    Values are client-supplied, so each kind gets at most ``max_codes`` codes;
+    values past that are stored as the raw string, which ``decode`` passes through.
+    """
+
+    def __init__(self, collection, max_codes: int = 1024):
+        self.collection = collection
+        self.max_codes = max_codes
+        # Kinds whose counter passed max_codes; new values skip the counter
+        self._full = set()
+        self._codes: Dict[str, Dict[str, int]] = {kind: {} for _, kind in CODED.values()}
+        self._values: Dict[str, Dict[int, str]] = {kind: {} for _, kind in CODED.values()}
+
+    def _remember(self, doc: dict):
+        self._codes[doc["kind"]][doc["value"]] = doc["code"]
+        self._values[doc["kind"]][doc["code"]] = doc["value"]
+
+    async def load(self):
+        """Read every entry (at most ``max_codes`` per kind)"""
+        async for doc in self.collection.find({"kind": {"$exists": True}}):
+            self._remember(doc)
+
+    def lookup(self, kind: str, value: str) -> Optional[int]:
+        """Code already known to this process, without touching the database"""
+        return self._codes[kind].get(value)
+
+    async def code(self, kind: str, value: str) -> Optional[int]:
+        """Code for ``value``, assigning one if needed; None once ``kind`` is full and ``value`` is new"""
+        code = self._codes[kind].get(value)
+        if code is not None:
+            return code
+        key = f"{kind}:{value}"
+        doc = await self.collection.find_one({"_id": key})
+        if doc is None:
+            if kind in self._full:
+                return None
+            seq = await self.collection.find_one_and_update(
+                {"_id": f"#{kind}"}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER)
+            if seq["seq"] > self.max_codes:
+                self._full.add(kind)
+                return None
+            doc = {"_id": key, "kind": kind, "value": value, "code": seq["seq"]}
+            try:
+                await self.collection.insert_one(doc)
+            except DuplicateKeyError:
+                doc = await self.collection.find_one({"_id": key})
+        self._remember(doc)
+        return doc["code"]
+
+    def decode(self, kind: str, code) -> Optional[str]:
+        if code is None or isinstance(code, str):
+            return code
+        return self._values[kind].get(code)
+
+    def knows(self, docs: Iterable[dict]) -> bool:
+        """Whether every code in the stored ``docs`` can be decoded locally"""
+        for doc in docs:
+            for field, kind in CODED.values():
+                if field in doc and not isinstance(doc[field], str) and doc[field] not in self._values[kind]:
+                    return False
+        return True
+
+    async def ready(self, docs: Iterable[dict]):
+        """Reload if another process assigned codes that ``docs`` use"""
+        if not self.knows(docs):
+            await self.load()
+
+    async def pack(self, fish: dict) -> dict:
+        """Compact stored form of an API-shaped fish document"""
+        fish_id = fish.get("id")
+        stored = {"_id": ObjectId(fish_id) if fish_id and ObjectId.is_valid(fish_id) else ObjectId(),
+                  "u": fish["user_id"], "t": to_date(fish["caught_at"])}
+        if fish_id and str(stored["_id"]) != fish_id:
+            stored["i"] = fish_id
+        for name, (field, kind) in CODED.items():
+            if fish.get(name) is not None:
+                value = str(fish[name])
+                code = await self.code(kind, value)
+                stored[field] = value if code is None else code
+        for name, field in PLAIN.items():
+            if fish.get(name) is not None:
+                stored[field] = fish[name]
+        if fish.get("perfect"):
+            stored["pf"] = True
+        return stored
+
+    def unpack(self, stored: dict, fields: Iterable[str] = API_FIELDS) -> dict:
+        """API shape of a stored fish; call ``ready`` first for codes from other processes"""
+        fish = {}
+        for name in fields:
+            if name == "id":
+                fish["id"] = stored.get("i") or str(stored["_id"])
+            elif name == "user_id":
+                fish["user_id"] = stored.get("u")
+            elif name == "caught_at":
+                fish["caught_at"] = from_date(stored["t"])
+            elif name == "perfect":
+                fish["perfect"] = stored.get("pf", False)
+            elif name in CODED:
+                field, kind = CODED[name]
+                fish[name] = self.decode(kind, stored.get(field))
+            else:
+                fish[name] = stored.get(PLAIN[name])
+        return fish
+
+
+async def migrate_tacklebox(db, dictionary: FishDictionary, batch: int = 1000) -> int:
+    """Rewrite pre-compact tacklebox documents in place; returns how many were converted
+
+    Each document keeps its _id and is replaced atomically, so the migration
+    can be interrupted and re-run.
+    """
+    await dictionary.load()
+    converted, last = 0, None
+    while True:
+        query = {"user_id": {"$exists": True}}
+        if last is not None:
+            query["_id"] = {"$gt": last}
+        docs = await db.tacklebox.find(query).sort("_id", 1).limit(batch).to_list(batch)
+        if not docs:
+            return converted
+        writes = []
+        for doc in docs:
+            stored = await dictionary.pack({**doc, "id": None})
+            stored["_id"] = doc["_id"]
+            if doc.get("id"):
+                # Clients may hold the old id; unpack keeps returning it
+                stored["i"] = doc["id"]
+            writes.append(ReplaceOne({"_id": doc["_id"], "user_id": {"$exists": True}}, stored))
+        result = await db.tacklebox.bulk_write(writes, ordered=False)
+        converted += result.modified_count
+        last = docs[-1]["_id"]
+
+
+# ========== PAGINATION ==========
+# Newest first; _id breaks ties between fish caught in the same instant
+SORT = [("t", -1), ("_id", -1)]
+
+
+def encode_cursor(stored: dict) -> str:
+    """Opaque continuation token pointing just past the stored fish ``stored``"""
+    raw = json.dumps([from_date(stored["t"]), str(stored["_id"])], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor; raises ValueError for malformed tokens"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        caught_at, fish_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(caught_at, str) or not isinstance(fish_id, str) or not ObjectId.is_valid(fish_id):
+        raise ValueError("Invalid cursor")
+    return caught_at, fish_id
+
+
+def page_query(user_id: str, cursor: Optional[str] = None) -> dict:
+    """Filter for the page of a user's fish that follows ``cursor``"""
+    query = {"u": user_id}
+    if cursor:
+        caught_at, fish_id = decode_cursor(cursor)
+        try:
+            when = to_date(caught_at)
+        except ValueError:
+            raise ValueError("Invalid cursor")
+        query["$or"] = [
+            {"t": {"$lt": when}},
+            {"t": when, "_id": {"$lt": ObjectId(fish_id)}},
+        ]
+    return query
+
+
+# ========== SUMMARY ==========
+# One ``tacklebox_summary`` document per user, kept current on every insert:
+# {"user_id", "total_fish", "total_points", "storm_catches", "species": {key:
+#  {"name", "count", "points", "biggest", "first_caught_at"}}}. Achievement
+# counters (e.g. ``perfect_streak``) are kept on the same document.
+
+def species_key(name: Optional[str]) -> str:
+    """Field-safe key for a species name (no dots or leading $)"""
+    if not name:
+        return "unknown"
+    return name.replace(".", "_").replace("$", "_")
+
+
+def summary_update(fish_docs: list) -> dict:
+    """Single upsert update folding ``fish_docs`` into a user's summary"""
+    inc = {"total_fish": 0, "total_points": 0}
+    biggest, first, names = {}, {}, {}
+    for doc in fish_docs:
+        key = species_key(doc.get("name"))
+        points = doc.get("points") or 0
+        inc["total_fish"] += 1
+        inc["total_points"] += points
+        inc[f"species.{key}.count"] = inc.get(f"species.{key}.count", 0) + 1
+        inc[f"species.{key}.points"] = inc.get(f"species.{key}.points", 0) + points
+        if doc.get("size") is not None:
+            path = f"species.{key}.biggest"
+            biggest[path] = max(biggest.get(path, doc["size"]), doc["size"])
+        path = f"species.{key}.first_caught_at"
+        first[path] = min(first.get(path, doc["caught_at"]), doc["caught_at"])
+        names[f"species.{key}.name"] = doc.get("name") or "unknown"
+        if doc.get("weather") == "storm":
+            inc["storm_catches"] = inc.get("storm_catches", 0) + 1
+
+    update = {"$inc": inc, "$min": first, "$set": names}
+    if biggest:
+        update["$max"] = biggest
+    return update
+
+
+def summary_view(user_id: str, doc: Optional[dict]) -> dict:
+    """API shape of a summary document, species ordered by count"""
+    doc = doc or {}
+    species = sorted(doc.get("species", {}).values(), key=lambda s: (-s["count"], s["name"]))
+    return {
+        "user_id": user_id,
+        "total_fish": doc.get("total_fish", 0),
+        "total_points": doc.get("total_points", 0),
+        "species": species,
+    }
+
+
+def summary_pipeline(user_id: Optional[str] = None, storm_code: Optional[int] = None) -> list:
+    """Aggregation computing summaries from stored tacklebox rows (species still coded)"""
+    pipeline = [{"$match": {"u": user_id}}] if user_id else []
+    return pipeline + [
+        {"$group": {
+            "_id": {"user_id": "$u", "species": "$s"},
+            "count": {"$sum": 1},
+            "points": {"$sum": {"$ifNull": ["$p", 0]}},
+            "biggest": {"$max": "$z"},
+            "first_caught_at": {"$min": "$t"},
+            "storm": {"$sum": {"$cond": [{"$eq": ["$w", storm_code]}, 1, 0]}},
+        }},
+    ]
+
+
+async def rebuild_summaries(db, user_id: Optional[str] = None, batch: int = 500,
+                            dictionary: Optional[FishDictionary] = None) -> int:
+    """Recompute tacklebox_summary from tacklebox; returns the number of users written"""
+    dictionary = dictionary or FishDictionary(db.tacklebox_dict)
+    await dictionary.load()
+    # No storm code yet means no storm catches; -1 matches nothing
+    storm_code = dictionary.lookup("weather", "storm")
+    pipeline = summary_pipeline(user_id, -1 if storm_code is None else storm_code)
+    summaries = {}
+    async for row in db.tacklebox.aggregate(pipeline, allowDiskUse=True):
+        owner = row["_id"]["user_id"]
+        name = dictionary.decode("species", row["_id"].get("species"))
+        summary = summaries.setdefault(owner, {"user_id": owner, "total_fish": 0, "total_points": 0,
+                                               "storm_catches": 0, "species": {}})
+        summary["total_fish"] += row["count"]
+        summary["total_points"] += row["points"]
+        summary["storm_catches"] += row["storm"]
+        entry = {"name": name or "unknown", "count": row["count"], "points": row["points"],
+                 "first_caught_at": from_date(row["first_caught_at"])}
+        if row["biggest"] is not None:
+            entry["biggest"] = row["biggest"]
+        summary["species"][species_key(name)] = entry
+
+    # $set rather than a replace so streak counters that rows can't reproduce survive
+    writes = [UpdateOne({"user_id": owner}, {"$set": summary}, upsert=True) for owner, summary in summaries.items()]
+    for i in range(0, len(writes), batch):
+        await db.tacklebox_summary.bulk_write(writes[i:i + batch], ordered=False)
+    return len(writes)
@@ -0,0 +1,161 @@
+"""Weather provider for /api/weather.
+
+Lookups go memory -> Mongo (``db.weather``, shared between workers) ->
+open-meteo. Expired entries keep being served for a grace period while a
+single background refresh runs, and concurrent misses share one upstream
+fetch.
+"""
+import asyncio
+import contextlib
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+DEFAULT_WEATHER = {
+    "condition": "clear",
+    "temperature": 18,
+    "wind_speed": 8,
+    "cloud_cover": 30,
+    "precipitation": 0
+}
+
+
+def parse_open_meteo(data: dict) -> dict:
+    """Map an open-meteo forecast response to the game's weather shape"""
+    cw = data.get("current_weather", {})
+    weather_code = cw.get("weathercode", 0)
+
+    if weather_code < 4:
+        condition = "clear"
+    elif weather_code < 50:
+        condition = "cloudy"
+    elif weather_code < 70:
+        condition = "rain"
+    else:
+        condition = "storm"
+
+    return {
+        "condition": condition,
+        "temperature": int(cw.get("temperature", 18)),
+        "wind_speed": int(cw.get("windspeed", 8)),
+        "cloud_cover": data.get("hourly", {}).get("cloud_cover", [30])[0],
+        "precipitation": data.get("hourly", {}).get("precipitation_probability", [0])[0]
+    }
+
+
+class WeatherProvider:
+    """Cached current weather with single-flight, stale-while-revalidate refresh"""
+
+    def __init__(self, collection, url: str = OPEN_METEO_URL,
+                 latitude: float = 52.52, longitude: float = 13.41,
+                 ttl: timedelta = timedelta(minutes=30),
+                 stale_ttl: timedelta = timedelta(minutes=10),
+                 retry_after: timedelta = timedelta(minutes=1),
+                 now: Callable[[], datetime] = lambda: datetime.now(timezone.utc)):
+        self.collection = collection
+        self.url = url
+        self.params = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "current_weather": "true",
+            "hourly": "precipitation_probability,cloud_cover"
+        }
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.retry_after = retry_after
+        self.now = now
+        self.upstream_fetches = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._weather: Optional[dict] = None
+        self._cached_at: Optional[datetime] = None
+        self._retry_at: Optional[datetime] = None
+        self._inflight: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Open the shared HTTP session (call from app startup)"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+
+    async def close(self):
+        """Wait for an in-flight refresh and close the HTTP session"""
+        if self._inflight is not None:
+            await asyncio.gather(self._inflight, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _age(self) -> Optional[timedelta]:
+        if self._cached_at is None:
+            return None
+        return self.now() - self._cached_at
+
+    def version(self) -> Optional[str]:
+        """Timestamp of the cached weather while it is fresh, else None"""
+        age = self._age()
+        if age is None or age >= self.ttl:
+            return None
+        return self._cached_at.isoformat()
+
+    async def get(self) -> dict:
+        """Current weather, refreshing at most once per expiry"""
+        age = self._age()
+        if age is not None and age < self.ttl:
+            return self._weather
+        if age is not None and age < self.ttl + self.stale_ttl:
+            self._refresh()
+            return self._weather
+        # Failures are logged by _refresh_done; fall back to the last known weather
+        with contextlib.suppress(Exception):
+            await asyncio.shield(self._refresh())
+        return self._weather or dict(DEFAULT_WEATHER)
+
+    def _refresh(self) -> asyncio.Task:
+        """Start a refresh unless one is already running; returns the running task"""
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._load())
+            self._inflight.add_done_callback(self._refresh_done)
+        return self._inflight
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._inflight = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Weather API error: {task.exception()}")
+
+    async def _load(self):
+        if self._retry_at is not None and self.now() < self._retry_at:
+            return
+        # Another worker may have refreshed the shared Mongo copy already
+        cached = await self.collection.find_one({}, {"_id": 0})
+        if cached:
+            cached_at = datetime.fromisoformat(cached.pop("cached_at", "2000-01-01T00:00:00+00:00"))
+            if self.now() - cached_at < self.ttl:
+                self._store(cached, cached_at)
+                return
+        try:
+            weather = await self._fetch()
+        except Exception:
+            self._retry_at = self.now() + self.retry_after
+            raise
+        cached_at = self.now()
+        self._store(weather, cached_at)
+        await self.collection.replace_one(
+            {}, {**weather, "cached_at": cached_at.isoformat()}, upsert=True
+        )
+
+    async def _fetch(self) -> dict:
+        await self.start()
+        self.upstream_fetches += 1
+        async with self._session.get(self.url, params=self.params) as response:
+            response.raise_for_status()
+            return parse_open_meteo(await response.json())
+
+    def _store(self, weather: dict, cached_at: datetime):
+        self._weather = weather
+        self._cached_at = cached_at
+        self._retry_at = None
@@ -0,0 +1,152 @@
+"""Write-behind buffer for per-user counter updates.
+
+``increment-catches`` and ``update-high-score`` are merged per user in
+memory ($inc deltas summed, $max kept, $set last-write-wins)
+and flushed as one ``bulk_write`` every ``interval`` seconds or once
+``max_pending`` users are waiting, whichever comes first. In
+``write_through`` mode every call is flushed before it returns.
+
+A route that writes a buffered ``set`` field to Mongo directly must
+``discard`` it first, or the next flush overwrites its write with the
+buffered value.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = "write_behind"
+WRITE_THROUGH = "write_through"
+
+
+class PendingUpdate:
+    """Merged, not yet written changes to one user document"""
+
+    __slots__ = ("inc", "max", "set")
+
+    def __init__(self):
+        self.inc: Dict[str, int] = {}
+        self.max: Dict[str, int] = {}
+        self.set: Dict[str, object] = {}
+
+    def merge(self, other: "PendingUpdate"):
+        for field, amount in other.inc.items():
+            self.inc[field] = self.inc.get(field, 0) + amount
+        for field, value in other.max.items():
+            self.max[field] = max(self.max.get(field, value), value)
+        # ``other`` is older when re-queued after a failed flush; keep newer $set values
+        for field, value in other.set.items():
+            self.set.setdefault(field, value)
+
+    def update(self) -> dict:
+        update = {"$inc": {**self.inc, "rev": 1}}
+        if self.max:
+            update["$max"] = dict(self.max)
+        if self.set:
+            update["$set"] = dict(self.set)
+        return update
+
+
+class CounterBuffer:
+    """Coalesces counter updates per user and flushes them in bulk"""
+
+    def __init__(self, collection, interval: float = 1.0, max_pending: int = 500, mode: str = WRITE_BEHIND):
+        if mode not in (WRITE_BEHIND, WRITE_THROUGH):
+            raise ValueError(f"Unknown counter write mode: {mode}")
+        self.collection = collection
+        self.interval = interval
+        self.max_pending = max_pending
+        self.mode = mode
+        self.flushes = 0
+        self._pending: Dict[str, PendingUpdate] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _entry(self, user_id: str) -> PendingUpdate:
+        entry = self._pending.get(user_id)
+        if entry is None:
+            entry = self._pending[user_id] = PendingUpdate()
+        return entry
+
+    async def increment(self, user_id: str, field: str, amount: int = 1):
+        entry = self._entry(user_id)
+        entry.inc[field] = entry.inc.get(field, 0) + amount
+        await self._after_write()
+
+    async def maximum(self, user_id: str, field: str, value: int):
+        entry = self._entry(user_id)
+        entry.max[field] = max(entry.max.get(field, value), value)
+        await self._after_write()
+
+    async def set(self, user_id: str, field: str, value):
+        self._entry(user_id).set[field] = value
+        await self._after_write()
+
+    async def discard(self, user_id: str, field: str):
+        """Drop a pending $set of ``field``, once any flush already carrying it has landed"""
+        async with self._flush_lock:
+            entry = self._pending.get(user_id)
+            if entry is not None:
+                entry.set.pop(field, None)
+
+    async def _after_write(self):
+        if self.mode == WRITE_THROUGH or len(self._pending) >= self.max_pending:
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write everything pending in one bulk_write; returns users written"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            user_ids = list(batch)
+            requests = [UpdateOne({"id": user_id}, batch[user_id].update()) for user_id in user_ids]
+            try:
+                await self.collection.bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                failed = [user_ids[error["index"]] for error in e.details.get("writeErrors", [])]
+                logger.error(f"Counter flush: {len(failed)} of {len(user_ids)} updates failed; re-queued")
+                self._requeue({user_id: batch[user_id] for user_id in failed})
+            except Exception as e:
+                logger.error(f"Counter flush failed, re-queued {len(user_ids)} updates: {e}")
+                self._requeue(batch)
+                raise
+            self.flushes += 1
+            return len(user_ids)
+
+    def _requeue(self, batch: Dict[str, PendingUpdate]):
+        for user_id, entry in batch.items():
+            self._entry(user_id).merge(entry)
+
+    async def _run(self):
+        # Never cancelled mid-flush: an interrupted bulk_write may still be applied
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                try:
+                    await self.flush()
+                except Exception:
+                    pass  # already logged and re-queued; retry next interval
+
+    def start(self):
+        """Begin periodic flushing (call from app startup)"""
+        if self._task is None and self.mode == WRITE_BEHIND:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and drain pending writes"""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
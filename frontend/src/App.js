@@ -489,16 +489,14 @@ function App() {
       store.setDeviceId(deviceId);
       
       try {
-        const user = await apiService.createOrGetUser(deviceId, store.username);
+        const boot = await apiService.bootstrap(deviceId, ['user', 'weather']);
+        // First launch on this device: register it
+        const user = boot.user || await apiService.createOrGetUser(deviceId, store.username);
         store.setUserId(user.id);
         store.setHighScore(user.high_score || 0);
         (user.unlocked_lures || []).forEach(lure => store.unlockLure(lure));
         (user.achievements || []).forEach(ach => store.addAchievement(ach));
-      } catch (e) {}
-      
-      try {
-        const weather = await apiService.getWeather();
-        store.setWeather(weather);
+        if (boot.weather) store.setWeather(boot.weather);
       } catch (e) {}
       
       const hour = new Date().getHours();
@@ -701,7 +699,7 @@ function App() {
     setCutsceneData({ fish, isPerfect: perfect, points });
     setShowCutscene(true);
     
-    store.addFishToTacklebox({ ...fish, isPerfect: perfect, caughtAt: new Date().toISOString() });
+    store.addFishToTacklebox({ ...fish, isPerfect: perfect, lure: store.selectedLure, caughtAt: new Date().toISOString() });
     
     store.addScore(points);
     store.incrementCatches();
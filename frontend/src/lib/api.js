@@ -11,6 +11,10 @@ const api = axios.create({
   },
 });
 
+// Server-Sent Events stream of leaderboard changes: a 'snapshot' event, then 'diff' events
+export const openLeaderboardStream = (period = 'all_time') =>
+  new EventSource(`${API}/leaderboard/stream?period=${period}`);
+
 export const apiService = {
   // User endpoints
   async createOrGetUser(deviceId, username = 'Angler') {
@@ -18,6 +22,13 @@ export const apiService = {
     return response.data;
   },
 
+  // Start-screen data in one round trip; fields narrows it, e.g. ['user', 'weather']
+  async bootstrap(deviceId, fields = null) {
+    const params = fields ? { fields: fields.join(',') } : {};
+    const response = await api.get(`/bootstrap/${deviceId}`, { params });
+    return response.data;
+  },
+
   async getUser(deviceId) {
     const response = await api.get(`/user/${deviceId}`);
     return response.data;
@@ -53,6 +64,7 @@ export const apiService = {
     return response.data;
   },
 
+  // Server-checked: resolves { success, progress, target, completed } and is safe to repeat
   async completeDailyChallenge(userId) {
     const response = await api.post(`/user/${userId}/complete-daily`);
     return response.data;
@@ -64,8 +76,18 @@ export const apiService = {
     return response.data;
   },
 
-  async getLeaderboard(limit = 100) {
-    const response = await api.get(`/leaderboard?limit=${limit}`);
+  async getLeaderboard(limit = 100, period = 'all_time') {
+    const response = await api.get(`/leaderboard?limit=${limit}&period=${period}`);
+    return response.data;
+  },
+
+  async getPlayerRank(userId) {
+    const response = await api.get(`/leaderboard/rank/${userId}`);
+    return response.data;
+  },
+
+  async getLeaderboardAround(userId, radius = 5) {
+    const response = await api.get(`/leaderboard/around/${userId}?radius=${radius}`);
     return response.data;
   },
 
@@ -81,8 +103,63 @@ export const apiService = {
     return response.data;
   },
 
-  async getTacklebox(userId, limit = 1000) {
-    const response = await api.get(`/tacklebox/${userId}?limit=${limit}`);
+  // Returns { fish, count, next_cursor }; pass next_cursor back to fetch the following page
+  async getTacklebox(userId, limit = 1000, cursor = null) {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+    const response = await api.get(`/tacklebox/${userId}`, { params });
+    return response.data;
+  },
+
+  async getTackleboxSummary(userId) {
+    const response = await api.get(`/tacklebox/${userId}/summary`);
+    return response.data;
+  },
+
+  // Batched gameplay events: [{ type: 'catch' | 'score' | 'unlock_lure' | 'unlock_achievement' | 'level', ... }]
+  // Like add-fish, set-level, prestige and unlock-lure, the response lists achievement ids it newly unlocked in `unlocked`
+  async sendEventBatch(userId, events) {
+    const response = await api.post('/events/batch', { user_id: userId, events });
+    return response.data;
+  },
+
+  // Analytics events as AnalyticsManager records them (up to 1000 per call). When the server is
+  // shedding load this resolves to { accepted: 0, retryAfter } (seconds) instead of throwing.
+  async ingestAnalytics(userId, events) {
+    const response = await api.post('/analytics/ingest', { user_id: userId, events }, {
+      validateStatus: (status) => status === 202 || status === 429,
+    });
+    if (response.status === 429) {
+      return { accepted: 0, retryAfter: Number(response.headers['retry-after']) || 1 };
+    }
+    return response.data;
+  },
+
+  // Cloud saves. getSave returns { data, version }; writes return { version, patch? }
+  // and reject with a 409 carrying the server's version on a conflict.
+  async getSave(userId, slot = 0) {
+    const response = await api.get(`/saves/${userId}/${slot}`);
+    return { data: response.data, version: Number(response.headers['x-save-version']) };
+  },
+
+  async getSaveChanges(userId, slot, since) {
+    const response = await api.get(`/saves/${userId}/${slot}/changes`, { params: { since } });
+    return response.data;
+  },
+
+  async putSave(userId, slot, baseVersion, data, deviceId = null) {
+    const params = { base_version: baseVersion };
+    if (deviceId) params.device_id = deviceId;
+    const response = await api.put(`/saves/${userId}/${slot}`, data, { params });
+    return response.data;
+  },
+
+  async patchSave(userId, slot, baseVersion, patch, deviceId = null) {
+    const response = await api.patch(`/saves/${userId}/${slot}`, {
+      base_version: baseVersion,
+      device_id: deviceId,
+      patch,
+    });
     return response.data;
   },
 
@@ -92,6 +169,18 @@ export const apiService = {
     return response.data;
   },
 
+  // Today's and the next few days' challenges: { challenges: [...] }
+  async getDailySchedule() {
+    const response = await api.get('/daily-challenge/schedule');
+    return response.data;
+  },
+
+  // { date, type, target, progress, completed }; catch, score and level responses carry the same object
+  async getDailyProgress(userId) {
+    const response = await api.get(`/daily-challenge/progress/${userId}`);
+    return response.data;
+  },
+
   // Achievements
   async getAchievements() {
     const response = await api.get('/achievements');
@@ -2,6 +2,8 @@
 // Comprehensive save/load system with cloud sync and data integrity
 // ~1200+ lines of data management
 
+import { apiService } from './api';
+
 // ========== SAVE MANAGER ==========
 
 /**
@@ -541,6 +543,57 @@ class SaveManager {
 
 // ========== CLOUD SYNC SYSTEM ==========
 
+const escapePointer = (key) => String(key).replace(/~/g, '~0').replace(/\//g, '~1');
+const unescapePointer = (token) => token.replace(/~1/g, '/').replace(/~0/g, '~');
+const cloneSave = (save) => JSON.parse(JSON.stringify(save));
+
+/**
+ * JSON Patch (RFC 6902) turning `before` into `after`; appended array items become `add /-`
+ */
+function makePatch(before, after, path = '') {
+  const isObject = (v) => v !== null && typeof v === 'object' && !Array.isArray(v);
+  if (isObject(before) && isObject(after)) {
+    const ops = [];
+    Object.keys(before).forEach(key => {
+      if (!(key in after)) ops.push({ op: 'remove', path: `${path}/${escapePointer(key)}` });
+    });
+    Object.keys(after).forEach(key => {
+      const child = `${path}/${escapePointer(key)}`;
+      if (!(key in before)) ops.push({ op: 'add', path: child, value: after[key] });
+      else ops.push(...makePatch(before[key], after[key], child));
+    });
+    return ops;
+  }
+  if (Array.isArray(before) && Array.isArray(after) && after.length >= before.length &&
+      JSON.stringify(after.slice(0, before.length)) === JSON.stringify(before)) {
+    return after.slice(before.length).map(value => ({ op: 'add', path: `${path}/-`, value }));
+  }
+  if (JSON.stringify(before) === JSON.stringify(after)) return [];
+  return [{ op: 'replace', path, value: after }];
+}
+
+/**
+ * Apply add/remove/replace operations (as produced by makePatch) to `doc` in place
+ */
+function applyPatch(doc, ops) {
+  ops.forEach(({ op, path, value }) => {
+    const tokens = path.split('/').slice(1).map(unescapePointer);
+    const last = tokens.pop();
+    const parent = tokens.reduce((node, token) => node[Array.isArray(node) ? Number(token) : token], doc);
+    if (Array.isArray(parent)) {
+      const index = last === '-' ? parent.length : Number(last);
+      if (op === 'add') parent.splice(index, 0, value);
+      else if (op === 'remove') parent.splice(index, 1);
+      else parent[index] = value;
+    } else if (op === 'remove') {
+      delete parent[last];
+    } else {
+      parent[last] = value;
+    }
+  });
+  return doc;
+}
+
 /**
  * Cloud synchronization for save data
  */
@@ -551,6 +604,9 @@ class CloudSyncManager {
     this.lastSyncTime = null;
     this.syncStatus = 'idle';
     this.conflictResolver = null;
+    // Server version and contents as of the last sync, for delta uploads
+    this.cloudVersion = 0;
+    this.syncedSnapshot = null;
     
     this.listeners = [];
   }
@@ -573,6 +629,8 @@ class CloudSyncManager {
     this.isEnabled = false;
     this.userId = null;
     this.authToken = null;
+    this.cloudVersion = 0;
+    this.syncedSnapshot = null;
     
     this.notifyListeners('cloudSyncDisabled', {});
   }
@@ -647,27 +705,70 @@ class CloudSyncManager {
   }
   
   /**
-   * Fetch save from cloud (simulated)
+   * Fetch save from cloud, pulling only the changes since the last sync when possible
    */
   async fetchCloudSave() {
-    // Simulate API call
-    await new Promise(resolve => setTimeout(resolve, 500));
-    
-    const cloudData = localStorage.getItem(`gofish_cloud_${this.userId}`);
-    if (cloudData) {
-      return JSON.parse(cloudData);
+    const slot = this.saveManager.currentSave?.slot || 0;
+    if (this.cloudVersion && this.syncedSnapshot) {
+      try {
+        const changes = await apiService.getSaveChanges(this.userId, slot, this.cloudVersion);
+        this.syncedSnapshot = applyPatch(this.syncedSnapshot, changes.patch);
+        this.cloudVersion = changes.version;
+        return cloneSave(this.syncedSnapshot);
+      } catch (error) {
+        if (error.response?.status !== 410) throw error;
+      }
+    }
+    try {
+      const { data, version } = await apiService.getSave(this.userId, slot);
+      this.cloudVersion = version;
+      this.syncedSnapshot = cloneSave(data);
+      return data;
+    } catch (error) {
+      if (error.response?.status === 404) {
+        this.cloudVersion = 0;
+        this.syncedSnapshot = null;
+        return null;
+      }
+      throw error;
     }
-    return null;
   }
   
   /**
-   * Upload save to cloud (simulated)
+   * Upload save to cloud: a JSON Patch against the last synced copy, or the
+   * whole save for a new slot. A 409 means another device wrote first.
    */
   async uploadSave(saveData) {
-    // Simulate API call
-    await new Promise(resolve => setTimeout(resolve, 500));
-    
-    localStorage.setItem(`gofish_cloud_${this.userId}`, JSON.stringify(saveData));
+    const slot = saveData.slot || 0;
+    const deviceId = localStorage.getItem('fishing_device_id');
+    let result;
+    try {
+      if (this.cloudVersion && this.syncedSnapshot) {
+        const patch = makePatch(this.syncedSnapshot, saveData);
+        if (patch.length === 0) return true;
+        result = await apiService.patchSave(this.userId, slot, this.cloudVersion, patch, deviceId);
+        if (result.patch) {
+          // Rebased onto another device's changes; fold them into the local save
+          applyPatch(saveData, result.patch);
+          this.saveManager.persistSaveSlots();
+        }
+      } else {
+        result = await apiService.putSave(this.userId, slot, this.cloudVersion || 0, saveData, deviceId);
+      }
+    } catch (error) {
+      if (error.response?.status !== 409) throw error;
+      // Overlapping edits from another device: pick a winner from the full saves
+      this.syncedSnapshot = null;
+      const cloudSave = await this.fetchCloudSave();
+      const resolved = await this.resolveConflict(saveData, cloudSave);
+      if (resolved.useCloud) {
+        await this.downloadSave(cloudSave);
+        return true;
+      }
+      result = await apiService.putSave(this.userId, slot, this.cloudVersion, saveData, deviceId);
+    }
+    this.cloudVersion = result.version;
+    this.syncedSnapshot = cloneSave(saveData);
     return true;
   }
   
@@ -676,6 +777,7 @@ class CloudSyncManager {
    */
   async downloadSave(cloudSave) {
     const slot = this.saveManager.currentSave?.slot || 0;
+    this.syncedSnapshot = cloneSave(cloudSave);
     this.saveManager.currentSave = { ...cloudSave, slot };
     this.saveManager.saveSlots[slot] = this.saveManager.currentSave;
     this.saveManager.persistSaveSlots();
@@ -987,6 +1089,8 @@ class AnalyticsManager {
     this.sessionId = this.generateSessionId();
     this.sessionStart = Date.now();
     this.isEnabled = true;
+    this.lastSent = null;
+    this.retryAt = 0;
     
     this.listeners = [];
   }
@@ -1062,6 +1166,29 @@ class AnalyticsManager {
     this.track('performance', { metric, value, unit });
   }
   
+  /**
+   * Send events tracked since the last flush; backs off while the server answers 429
+   */
+  async flush(userId) {
+    if (!this.isEnabled || Date.now() < this.retryAt) return 0;
+    // Everything after the last event sent; if trimming dropped it, every kept event is newer
+    const pending = this.events.slice(this.events.indexOf(this.lastSent) + 1);
+    if (pending.length === 0) return 0;
+    
+    try {
+      const result = await apiService.ingestAnalytics(userId, pending);
+      if (result.retryAfter) {
+        this.retryAt = Date.now() + result.retryAfter * 1000;
+        return 0;
+      }
+      this.lastSent = pending[pending.length - 1];
+      return result.accepted;
+    } catch (error) {
+      console.warn('Analytics flush failed:', error);
+      return 0;
+    }
+  }
+  
   /**
    * Get session summary
    */
@@ -2,6 +2,8 @@
 // Comprehensive social features, leaderboards, and multiplayer functionality
 // ~1200+ lines of social systems
 
+import { openLeaderboardStream } from './api';
+
 // ========== LEADERBOARD SYSTEM ==========
 
 /**
@@ -26,11 +28,63 @@ class LeaderboardSystem {
     
     this.playerRanks = {};
     this.lastUpdate = null;
-    this.updateInterval = 60000; // 1 minute
+    this.updateInterval = 60000; // 1 minute; only used when the live stream is unavailable
+    this.streams = {};
     
     this.listeners = [];
   }
   
+  /**
+   * Follow the server's global score board live (period: 'daily' | 'weekly' | 'all_time')
+   */
+  connectLiveStream(period = 'all_time') {
+    if (this.streams[period] || typeof EventSource === 'undefined') return;
+    const boardPeriod = { all_time: 'allTime', weekly: 'weekly', daily: 'daily' }[period];
+    const source = openLeaderboardStream(period);
+    
+    source.addEventListener('snapshot', (event) => {
+      const { entries } = JSON.parse(event.data);
+      this.setLiveBoard(boardPeriod, entries);
+    });
+    
+    source.addEventListener('diff', (event) => {
+      const { inserted, moved, dropped } = JSON.parse(event.data);
+      const board = this.leaderboards.global[boardPeriod].score;
+      const byKey = Object.fromEntries(board.map(e => [e.key, e]));
+      const gone = new Set([...dropped, ...moved.map(([key]) => key)]);
+      const next = board.filter(e => !gone.has(e.key));
+      // Insert at the new ranks in ascending order so earlier inserts don't shift later ones
+      [...inserted, ...moved.map(([key, rank]) => [rank, byKey[key]])]
+        .sort((a, b) => a[0] - b[0])
+        .forEach(([rank, entry]) => next.splice(rank, 0, entry));
+      this.setLiveBoard(boardPeriod, next);
+    });
+    
+    this.streams[period] = source;
+  }
+  
+  /**
+   * Stop following a live board (all of them when no period is given)
+   */
+  disconnectLiveStream(period = null) {
+    Object.keys(this.streams)
+      .filter(p => period === null || p === period)
+      .forEach(p => {
+        this.streams[p].close();
+        delete this.streams[p];
+      });
+  }
+  
+  setLiveBoard(period, entries) {
+    this.leaderboards.global[period].score = entries.map((e, i) => ({
+      ...e,
+      playerName: e.username,
+      rank: i + 1,
+    }));
+    this.lastUpdate = Date.now();
+    this.notifyListeners('leaderboardUpdated', { period, entries: this.leaderboards.global[period].score });
+  }
+  
   /**
    * Submit score to leaderboard
    */
@@ -0,0 +1,23 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Backend modules are imported as top-level modules, the same way uvicorn loads server.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def server():
+    """The FastAPI server module, pointed at the TEST_MONGO_URL database"""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("motor")
+    pytest.importorskip("httpx")
+    url = os.environ.get("TEST_MONGO_URL")
+    if not url:
+        pytest.skip("TEST_MONGO_URL not set")
+    os.environ.setdefault("MONGO_URL", url)
+    os.environ.setdefault("DB_NAME", "gofish_test")
+    import server as server_module
+    return server_module
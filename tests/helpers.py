@@ -0,0 +1,35 @@
+"""Helpers for tests that run the FastAPI app against a test Mongo"""
+import os
+
+
+async def connect(server):
+    """Bind the server module to a fresh, empty test database on the running loop"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from tacklebox import FishDictionary
+    from write_buffer import CounterBuffer
+
+    server.client = AsyncIOMotorClient(os.environ["TEST_MONGO_URL"])
+    server.db = server.client[os.environ.get("TEST_DB_NAME", "gofish_test")]
+    # Stateful helpers hold collections (and loop-bound locks) of their own
+    server.weather.collection = server.db.weather
+    server.counters = CounterBuffer(server.db.users, mode=server.counters.mode)
+    server.compactor.db = server.db
+    server.saves.collection = server.db.saves
+    server.fish_dictionary = FishDictionary(server.db.tacklebox_dict, server.fish_dictionary.max_codes)
+    server.analytics.db = server.db
+    server.score_columns.reset(server.db.scores)
+    server.fish_columns.reset(server.db.tacklebox)
+    # Buckets and the concurrency limit's waiters belong to the previous test
+    server.admission.reset()
+    server.daily_progress.collection = server.db.daily_progress
+    server.daily_progress.users = server.db.users
+    await server.client.drop_database(server.db.name)
+    return server.db
+
+
+def api_client(server):
+    """httpx client that calls the ASGI app in-process"""
+    import httpx
+
+    transport = httpx.ASGITransport(app=server.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
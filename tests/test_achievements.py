@@ -0,0 +1,65 @@
+import asyncio
+
+from achievements import AchievementRules, CatchRun, Rule
+from tests.helpers import api_client, connect
+
+
+def catch(name="Bass", perfect=False, weather=None):
+    return {"name": name, "perfect": perfect, "weather": weather}
+
+
+def test_rules_fire_once_when_a_target_is_crossed():
+    rules = AchievementRules([Rule("a", "catches", 1), Rule("c", "catches", 100), Rule("b", "catches", 10)])
+    assert rules.reached("catches", 10, above=0) == ["a", "b"]
+    assert rules.reached("catches", 99, above=10) == []
+    assert rules.reached("catches", 150) == ["a", "b", "c"]
+    assert rules.reached("level", 50) == []
+
+
+def test_catch_run_tracks_perfect_streaks_across_batches():
+    rules = AchievementRules()
+    # Continues a stored streak of 7 up to 10
+    run = CatchRun([catch(perfect=True)] * 3)
+    assert run.streak_update() == {"$inc": {"perfect_streak": 3}}
+    assert run.unlocked(rules, {"total_fish": 40, "perfect_streak": 7}) == ["perfect_10"]
+
+    # A miss resets the streak to whatever follows it
+    run = CatchRun([catch(perfect=True), catch()] + [catch(perfect=True)] * 10 + [catch(), catch(perfect=True)])
+    assert run.streak_update() == {"$set": {"perfect_streak": 1}}
+    assert run.unlocked(rules, {"total_fish": 200, "perfect_streak": 0}) == ["perfect_10"]
+
+    run = CatchRun([catch("Golden Koi", weather="storm")])
+    before = {"total_fish": 99, "storm_catches": 49, "species": {"Golden Koi": {"count": 3}}}
+    assert run.unlocked(rules, before) == ["catch_100", "storm_fisher"]
+    assert run.unlocked(rules, None) == ["first_catch", "golden_koi"]
+
+
+def test_unlocks_are_returned_with_the_event(server):
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            user = (await http.post("/api/user", json={"device_id": "dev-1"})).json()
+            fish_url = f"/api/tacklebox/{user['id']}/add-fish"
+            first = (await http.post(fish_url, json={"name": "Bass", "isPerfect": True})).json()
+            second = (await http.post(fish_url, json={"name": "Golden Koi", "weather": "storm"})).json()
+            level = (await http.post(f"/api/user/{user['id']}/set-level", params={"level": 50})).json()
+            again = (await http.post(f"/api/user/{user['id']}/set-level", params={"level": 51})).json()
+            batch = (await http.post("/api/events/batch", json={"user_id": user["id"], "events": [
+                {"type": "unlock_lure", "lure_id": 1}, {"type": "unlock_lure", "lure_id": 2},
+                *[{"type": "catch", "fish": {"name": "Bass", "perfect": True}}] * 10,
+            ]})).json()
+            prestige = (await http.post(f"/api/user/{user['id']}/prestige")).json()
+            summary = await server.db.tacklebox_summary.find_one({"user_id": user["id"]})
+            stored = await server.db.users.find_one({"id": user["id"]})
+        return first, second, level, again, batch, prestige, summary, stored
+
+    first, second, level, again, batch, prestige, summary, stored = asyncio.run(scenario())
+    assert first["unlocked"] == ["first_catch"]
+    assert second["unlocked"] == ["golden_koi"]
+    assert level["unlocked"] == ["level_10", "level_50"] and again["unlocked"] == []
+    assert batch["unlocked"] == ["perfect_10", "all_lures"]
+    assert batch["user"]["achievements"][-2:] == ["perfect_10", "all_lures"]
+    assert prestige["unlocked"] == ["prestige_1"]
+    assert summary["perfect_streak"] == 10 and summary["storm_catches"] == 1
+    assert sorted(stored["achievements"]) == sorted(
+        ["first_catch", "golden_koi", "level_10", "level_50", "perfect_10", "all_lures", "prestige_1"])
@@ -0,0 +1,167 @@
+import asyncio
+
+import orjson
+
+from admission import AdmissionControl, AdmissionMiddleware, AdmissionRule, ConcurrencyLimit, RateLimit
+from metrics import render
+from tests.helpers import api_client, connect
+
+
+def test_buckets_are_per_client_and_refill():
+    clock = [100.0]
+    rule = AdmissionRule("score", r"^/api/score$", RateLimit.parse("2/4"))
+    control = AdmissionControl([rule], clock=lambda: clock[0])
+    assert [control.check(rule, "u1") for _ in range(4)] == [0, 0, 0, 0]
+    assert control.check(rule, "u1") == 0.5
+    assert control.check(rule, "u2") == 0
+    clock[0] += 0.5
+    assert control.check(rule, "u1") == 0
+    assert control.throttled == {"score": 1}
+    assert RateLimit.parse("0/10") is None
+
+
+def test_waiters_are_queued_then_shed():
+    async def scenario():
+        limit = ConcurrencyLimit(limit=1, queue=1, deadline=0.05)
+        assert await limit.acquire() is None
+        waiting = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        assert await limit.acquire() == "queue_full"
+        assert await waiting == "deadline"
+
+        handed = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        limit.release()
+        assert await handed is None
+        assert (limit.active, limit.waiting) == (1, 0)
+        limit.release()
+        assert limit.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_flooding_client_is_throttled_before_the_route():
+    seen = []
+    gate = asyncio.Event()
+    gate.set()
+
+    async def endpoint(scope, receive, send):
+        message = await receive()
+        seen.append(orjson.loads(message["body"])["user_id"])
+        await gate.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    control = AdmissionControl([AdmissionRule("score", r"^/api/score$", RateLimit(1, 2))],
+                               concurrency=1, queue=0)
+    app = AdmissionMiddleware(endpoint, control)
+
+    async def post(user_id):
+        body = orjson.dumps({"user_id": user_id, "score": 1})
+        messages = [{"type": "http.request", "body": body[:5], "more_body": True},
+                    {"type": "http.request", "body": body[5:]}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/api/score", "headers": [], "client": ("1.2.3.4", 1)}
+        await app(scope, receive, send)
+        return sent[0]["status"], dict(sent[0]["headers"]), scope
+
+    async def scenario():
+        statuses = [(await post("flood"))[0] for _ in range(4)]
+        status, headers, scope = await post("flood")
+        assert headers[b"retry-after"] == b"1" and scope["route_template"] == "unmatched"
+
+        # One request holds the only slot and nothing may queue, so a second is shed
+        gate.clear()
+        holder = asyncio.create_task(post("player"))
+        await asyncio.sleep(0)
+        shed = await post("other")
+        gate.set()
+        return statuses, shed[0], (await holder)[0]
+
+    statuses, shed, held = asyncio.run(scenario())
+    assert statuses == [200, 200, 429, 429]
+    assert (shed, held) == (503, 200)
+    assert seen == ["flood", "flood", "player"]
+    text = render(control)
+    assert 'gofish_admission_throttled_total{rule="score"} 3' in text
+    assert 'gofish_admission_shed_total{reason="queue_full"} 1' in text
+
+
+def test_one_users_flood_leaves_others_alone(server, monkeypatch):
+    # Frozen clock: no tokens refill while the flood runs
+    monkeypatch.setattr(server.admission, "clock", lambda: 0.0)
+
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            flooder, player = [(await http.post("/api/user", json={"device_id": d})).json()["id"]
+                               for d in ("flood-device", "player-device")]
+            flood = await asyncio.gather(*[http.post(f"/api/tacklebox/{flooder}/add-fish", json={"name": "Bass"})
+                                           for _ in range(60)])
+            played = await http.post(f"/api/tacklebox/{player}/add-fish", json={"name": "Bass"})
+            metrics = (await http.get("/api/metrics")).text
+        return [r.status_code for r in flood], flood[-1].headers, played.status_code, metrics
+
+    statuses, headers, played, metrics = asyncio.run(scenario())
+    burst = server.catch_limit.burst
+    assert statuses.count(200) == burst and statuses.count(429) == 60 - burst
+    assert int(headers["retry-after"]) >= 1
+    assert played == 200
+    route = 'route="/api/tacklebox/{user_id}/add-fish",method="POST",status="429"'
+    assert "gofish_http_request_duration_seconds_count{" + route + "}" in metrics
+
+
+def test_in_memory_routes_skip_the_concurrency_limit(server):
+    async def scenario():
+        await connect(server)
+        # No slots and no queue: anything that needs one is shed
+        server.admission.limit = ConcurrencyLimit(limit=0, queue=0, deadline=0.01)
+        async with api_client(server) as http:
+            paths = ["/api/achievements", "/api/daily-challenge", "/api/leaderboard/rank/nobody",
+                     "/api/tacklebox/u1/summary"]
+            return [(await http.get(path)).status_code for path in paths]
+
+    assert asyncio.run(scenario()) == [200, 200, 404, 503]
+
+
+def test_oversized_body_is_keyed_by_address_and_passed_on_whole():
+    received = []
+
+    async def endpoint(scope, receive, send):
+        body, more = b"", True
+        while more:
+            message = await receive()
+            body, more = body + message["body"], message.get("more_body", False)
+        received.append(body)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    rule = AdmissionRule("score", r"^/api/score$", RateLimit(1, 5))
+    control = AdmissionControl([rule])
+    app = AdmissionMiddleware(endpoint, control, max_body=10)
+    body = orjson.dumps({"user_id": "u1", "padding": "x" * 50})
+
+    async def scenario():
+        messages = [{"type": "http.request", "body": body[i:i + 8], "more_body": i + 8 < len(body)}
+                    for i in range(0, len(body), 8)]
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "POST", "path": "/api/score", "headers": [], "client": ("1.2.3.4", 1)}
+        await app(scope, receive, send)
+        return len(messages)
+
+    assert asyncio.run(scenario()) == 0
+    assert received == [body]
+    assert set(control._buckets) == {("score", "addr:1.2.3.4")}
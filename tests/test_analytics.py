@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timezone
+
+from analytics import AnalyticsIngest
+from tests.helpers import api_client, connect
+
+WHEN = datetime(2026, 10, 14, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeCollection:
+    def __init__(self, calls, name):
+        self.calls = calls
+        self.name = name
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(0)
+        self.calls.append((self.name, len(docs)))
+
+
+class FakeDb:
+    def __init__(self):
+        self.calls = []
+
+    def __getitem__(self, name):
+        return FakeCollection(self.calls, name)
+
+
+def events(n, when=WHEN):
+    return [{"name": "tap", "received_at": when} for _ in range(n)]
+
+
+def test_queue_is_bounded_and_drained_in_bulk():
+    async def scenario():
+        db = FakeDb()
+        ingest = AnalyticsIngest(db, capacity=100, batch_size=50, workers=1, partition="day")
+        assert not ingest.offer(events(1))  # not started
+        ingest.start()
+        accepted = [ingest.offer(events(30)) for _ in range(4)]
+        full = ingest.saturated()
+        await ingest.stop()
+        return db.calls, accepted, full, ingest
+
+    calls, accepted, full, ingest = asyncio.run(scenario())
+    # The fourth batch did not fit; the first three were coalesced into bulk inserts
+    assert accepted == [True, True, True, False]
+    assert not full and ingest.rejected == 31 and ingest.written == 90 and ingest.pending == 0
+    assert all(name == "analytics_events_2026_10_14" for name, _ in calls)
+    assert [size for _, size in calls] == [60, 30]
+
+
+def test_ingest_route_sheds_load_with_retry_after(server):
+    async def scenario():
+        db = await connect(server)
+        server.analytics.start()
+        async with api_client(server) as http:
+            body = {"user_id": "u1", "events": [
+                {"name": "page_view", "data": {"page": "title"}, "timestamp": 1760443200000, "sessionId": "s1"},
+                {"name": "game_event", "data": {"eventType": "catch"}},
+            ]}
+            ok = await http.post("/api/analytics/ingest", json=body)
+            invalid = await http.post("/api/analytics/ingest", json={"events": []})
+            capacity, server.analytics.capacity = server.analytics.capacity, server.analytics.pending
+            busy = await http.post("/api/analytics/ingest", json=body)
+            server.analytics.capacity = capacity
+        await server.analytics.stop()
+        return ok, invalid, busy, await db.analytics_events.find({}, {"_id": 0}).to_list(None)
+
+    ok, invalid, busy, stored = asyncio.run(scenario())
+    assert ok.status_code == 202 and ok.json() == {"accepted": 2}
+    assert invalid.status_code == 422
+    assert busy.status_code == 429 and int(busy.headers["retry-after"]) >= 1
+    assert [doc["name"] for doc in stored] == ["page_view", "game_event"]
+    assert stored[0]["session_id"] == "s1" and stored[0]["user_id"] == "u1"
@@ -0,0 +1,98 @@
+import asyncio
+
+from tests.helpers import api_client, connect
+
+PARALLEL = 300
+
+
+async def _create_user(http):
+    response = await http.post("/api/user", json={"device_id": "race-device"})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_parallel_unlocks_are_not_lost(server):
+    async def scenario():
+        db = await connect(server)
+        async with api_client(server) as http:
+            user_id = await _create_user(http)
+            lures = [http.post(f"/api/user/{user_id}/unlock-lure", json={"user_id": user_id, "lure_id": i})
+                     for i in range(1, PARALLEL + 1)]
+            achievements = [http.post(f"/api/user/{user_id}/unlock-achievement", json={"achievement_id": f"a{i}"})
+                            for i in range(PARALLEL)]
+            responses = await asyncio.gather(*lures, *achievements)
+            assert all(r.status_code == 200 for r in responses)
+
+        user = await db.users.find_one({"id": user_id})
+        assert sorted(user["unlocked_lures"]) == list(range(PARALLEL + 1))
+        # Owning every lure also unlocks all_lures server-side, exactly once
+        assert sorted(user["achievements"]) == sorted([f"a{i}" for i in range(PARALLEL)] + ["all_lures"])
+
+    asyncio.run(scenario())
+
+
+def test_parallel_scores_and_prestige_are_not_lost(server, monkeypatch):
+    # 300 scores at once from one user is exactly what the rate limit refuses
+    monkeypatch.setattr(server.admission, "enabled", False)
+
+    async def scenario():
+        db = await connect(server)
+        async with api_client(server) as http:
+            user_id = await _create_user(http)
+            scores = [http.post("/api/score", json={"user_id": user_id, "username": "Angler", "score": s,
+                                                    "level": 1, "catches": 1, "stage": 1})
+                      for s in range(PARALLEL)]
+            prestiges = [http.post(f"/api/user/{user_id}/prestige") for _ in range(PARALLEL)]
+            responses = await asyncio.gather(*scores, *prestiges)
+            assert all(r.status_code == 200 for r in responses)
+
+        user = await db.users.find_one({"id": user_id})
+        assert user["high_score"] == PARALLEL - 1
+        assert user["prestige"] == PARALLEL
+        assert await db.scores.count_documents({"user_id": user_id}) == PARALLEL
+
+    asyncio.run(scenario())
+
+
+def test_parallel_user_bootstrap_creates_one_user(server):
+    async def scenario():
+        db = await connect(server)
+        async with api_client(server) as http:
+            responses = await asyncio.gather(*[_create_user(http) for _ in range(50)])
+        assert len(set(responses)) == 1
+        assert await db.users.count_documents({"device_id": "race-device"}) == 1
+
+    asyncio.run(scenario())
+
+
+def test_missing_user_returns_404(server):
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            response = await http.post("/api/user/nobody/prestige")
+            assert response.status_code == 404
+
+    asyncio.run(scenario())
+
+
+def test_direct_level_writes_are_not_undone_by_the_counter_flush(server, monkeypatch):
+    monkeypatch.setattr(server.counters, "mode", "write_behind")
+
+    async def scenario():
+        db = await connect(server)
+        async with api_client(server) as http:
+            user_id = await _create_user(http)
+            await http.post(f"/api/user/{user_id}/set-level", params={"level": 50})
+            await http.post(f"/api/user/{user_id}/prestige")
+            await server.counters.flush()
+            prestiged = await db.users.find_one({"id": user_id})
+
+            await http.post(f"/api/user/{user_id}/set-level", params={"level": 40})
+            await http.post("/api/events/batch", json={"user_id": user_id, "events": [{"type": "level", "level": 2}]})
+            await server.counters.flush()
+            batched = await db.users.find_one({"id": user_id})
+        return prestiged, batched
+
+    prestiged, batched = asyncio.run(scenario())
+    assert (prestiged["level"], prestiged["prestige"]) == (1, 1)
+    assert batched["level"] == 2
@@ -0,0 +1,52 @@
+import asyncio
+
+from tests.helpers import api_client, connect
+
+WEATHER = {"condition": "sunny", "temperature": 20, "wind_speed": 5, "cloud_cover": 0, "precipitation": 0}
+
+
+def test_bootstrap_returns_every_part(server, monkeypatch):
+    async def fake_weather():
+        return WEATHER
+
+    monkeypatch.setattr(server.weather, "get", fake_weather)
+
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            user = (await http.post("/api/user", json={"device_id": "dev-1", "username": "Ann"})).json()
+            for size in (10, 20, 30):
+                await http.post(f"/api/tacklebox/{user['id']}/add-fish",
+                                json={"name": "Bass", "size": size, "points": 5, "color": "#0f0"})
+            payload = (await http.get("/api/bootstrap/dev-1", params={"tacklebox_limit": 2})).json()
+            partial = (await http.get("/api/bootstrap/dev-1", params={"fields": "user,daily_challenge"})).json()
+            unknown = await http.get("/api/bootstrap/dev-1", params={"fields": "user,secrets"})
+            new_device = (await http.get("/api/bootstrap/dev-2", params={"fields": "user,tacklebox"})).json()
+        return user, payload, partial, unknown, new_device
+
+    user, payload, partial, unknown, new_device = asyncio.run(scenario())
+    assert set(payload) == {"user", "achievements", "daily_challenge", "weather", "leaderboard", "tacklebox"}
+    assert payload["user"]["id"] == user["id"] and "created_at" not in payload["user"]
+    assert payload["weather"] == WEATHER
+    assert payload["achievements"]["achievements"][0]["id"] == "first_catch"
+    assert payload["tacklebox"]["summary"]["total_fish"] == 3
+    assert [f["size"] for f in payload["tacklebox"]["recent"]] == [30, 20]
+    assert payload["tacklebox"]["next_cursor"]
+    assert set(partial) == {"user", "daily_challenge"}
+    assert unknown.status_code == 400
+    assert new_device == {"user": None, "tacklebox": None}
+
+
+def test_failed_part_is_reported(server, monkeypatch):
+    async def broken_weather():
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(server.weather, "get", broken_weather)
+
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            return (await http.get("/api/bootstrap/dev-1", params={"fields": "weather,leaderboard"})).json()
+
+    payload = asyncio.run(scenario())
+    assert payload == {"weather": None, "leaderboard": [], "errors": ["weather"]}
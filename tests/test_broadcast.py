@@ -0,0 +1,123 @@
+import asyncio
+import random
+from datetime import datetime, timezone, timedelta
+
+import orjson
+
+from broadcast import LeaderboardBroadcaster, diff_entries, entry_key
+from leaderboard import LeaderboardIndex
+
+NOW = datetime(2026, 10, 14, 12, 0, tzinfo=timezone.utc)
+
+
+def entry(name, score, seconds=0):
+    return {"username": name, "score": score, "level": 1, "catches": 3,
+            "timestamp": (NOW - timedelta(seconds=seconds)).isoformat()}
+
+
+def apply_diff(entries, diff):
+    """The client-side algorithm documented on diff_entries"""
+    by_key = {e["key"]: e for e in entries}
+    gone = set(diff["dropped"]) | {key for key, _ in diff["moved"]}
+    result = [e for e in entries if e["key"] not in gone]
+    placed = [(rank, e) for rank, e in diff["inserted"]] + [(rank, by_key[key]) for key, rank in diff["moved"]]
+    for rank, e in sorted(placed, key=lambda p: p[0]):
+        result.insert(rank, e)
+    return result
+
+
+def keyed(entries):
+    return [{"key": entry_key(e), **e} for e in entries]
+
+
+def parse(message):
+    lines = dict(line.split(": ", 1) for line in message.decode().strip().split("\n"))
+    return lines["event"], orjson.loads(lines["data"])
+
+
+def test_diff_round_trips_random_changes():
+    rng = random.Random(3)
+    pool = [entry(f"p{i}", rng.randint(0, 1000), i) for i in range(300)]
+    for _ in range(200):
+        old = rng.sample(pool, rng.randint(0, 50))
+        new = rng.sample(pool, rng.randint(0, 50))
+        assert apply_diff(keyed(old), diff_entries(old, new)) == keyed(new)
+
+
+def test_insert_only_lists_just_the_new_entry():
+    old = [entry("a", 90), entry("b", 50), entry("c", 10)]
+    new = [old[0], entry("d", 70), old[1]]
+    assert diff_entries(old, new) == {
+        "inserted": [[1, {"key": entry_key(new[1]), **new[1]}]],
+        "moved": [],
+        "dropped": [entry_key(old[2])],
+    }
+
+
+def test_stream_sends_snapshot_then_diffs():
+    async def scenario():
+        index = LeaderboardIndex(capacity=10)
+        index.loaded = True
+        index.add(entry("a", 50))
+        broadcaster = LeaderboardBroadcaster(index, limit=3)
+        stream = broadcaster.stream("all_time")
+        first = await stream.__anext__()
+        assert len(broadcaster) == 1
+
+        index.add(entry("b", 80))
+        broadcaster.publish()
+        second = await stream.__anext__()
+        await stream.aclose()
+        return first, second, len(broadcaster)
+
+    first, second, remaining = asyncio.run(scenario())
+    assert parse(first)[0] == "snapshot" and [e["score"] for e in parse(first)[1]["entries"]] == [50]
+    event, diff = parse(second)
+    assert event == "diff" and diff["inserted"][0][0] == 0 and diff["inserted"][0][1]["username"] == "b"
+    assert remaining == 0
+
+
+def test_slow_subscriber_is_resynced_with_a_snapshot():
+    async def scenario():
+        index = LeaderboardIndex(capacity=100)
+        index.loaded = True
+        broadcaster = LeaderboardBroadcaster(index, queue_size=4)
+        fast = broadcaster.subscribe("all_time")
+        slow = broadcaster.subscribe("all_time")
+        for i in range(10):
+            index.add(entry(f"p{i}", i * 10, i))
+            broadcaster.publish()
+            while not fast.queue.empty():
+                fast.queue.get_nowait()
+        return [slow.queue.get_nowait() for _ in range(slow.queue.qsize())], slow.resyncs, fast.resyncs
+
+    backlog, slow_resyncs, fast_resyncs = asyncio.run(scenario())
+    assert fast_resyncs == 0 and slow_resyncs >= 1
+    assert len(backlog) <= 4
+    # Whatever the slow client reads next rebuilds the full current board
+    entries = []
+    for message in backlog:
+        event, data = parse(message)
+        entries = data["entries"] if event == "snapshot" else apply_diff(entries, data)
+    assert [e["score"] for e in entries] == [90, 80, 70, 60, 50, 40, 30, 20, 10, 0]
+
+
+def test_window_rollover_sends_a_snapshot():
+    async def scenario():
+        clock = [NOW]
+        index = LeaderboardIndex(capacity=10)
+        index.loaded = True
+        index.add(entry("a", 50), now=NOW)
+        broadcaster = LeaderboardBroadcaster(index, now=lambda: clock[0])
+        daily = broadcaster.subscribe("daily")
+        weekly = broadcaster.subscribe("weekly")
+        daily.queue.get_nowait(), weekly.queue.get_nowait()
+        # Wednesday -> Thursday: the daily board empties, the weekly one carries on
+        clock[0] = NOW + timedelta(days=1)
+        queued = broadcaster.publish()
+        return queued, daily.queue.get_nowait(), weekly.queue.qsize(), broadcaster._until_rollover()
+
+    queued, message, weekly_backlog, wait = asyncio.run(scenario())
+    event, data = parse(message)
+    assert (queued, event, data["entries"], weekly_backlog) == (1, "snapshot", [], 0)
+    assert wait == 12 * 3600 + 0.1
@@ -0,0 +1,77 @@
+import asyncio
+
+from caching import CacheRule, ConditionalCacheMiddleware, etag_matches
+
+
+def test_etag_matching():
+    assert etag_matches('"a-1"', '"a-1"')
+    assert etag_matches('"x", W/"a-1"', '"a-1"')
+    assert etag_matches("*", '"a-1"')
+    assert not etag_matches('"a-2"', '"a-1"')
+
+
+class Backend:
+    """Minimal ASGI app counting how often it is reached"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+
+def request(app, path, if_none_match=None, method="GET", query=b""):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    scope = {"type": "http", "method": method, "path": path, "headers": headers, "query_string": query}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    return start["status"], dict(start["headers"])
+
+
+def make_app(version):
+    backend = Backend()
+    rules = [
+        CacheRule("board", "/api/board", r"^/api/board$", lambda params, query: version["value"], "public, max-age=15"),
+        CacheRule("user", "/api/user/{device_id}", r"^/api/user/(?P<device_id>[^/]+)$", user_version,
+                  "private, no-cache"),
+    ]
+    return backend, ConditionalCacheMiddleware(backend, rules)
+
+
+async def user_version(params, query):
+    return None if params["device_id"] == "missing" else f"{params['device_id']}.3"
+
+
+def test_unchanged_version_is_answered_without_the_handler():
+    version = {"value": "7"}
+    backend, app = make_app(version)
+
+    status, headers = request(app, "/api/board")
+    assert status == 200 and headers[b"etag"] == b'"board-7"'
+    assert headers[b"cache-control"] == b"public, max-age=15"
+
+    status, headers = request(app, "/api/board", if_none_match='"board-7"')
+    assert status == 304 and backend.calls == 1
+
+    version["value"] = "8"
+    status, headers = request(app, "/api/board", if_none_match='"board-7"')
+    assert status == 200 and headers[b"etag"] == b'"board-8"' and backend.calls == 2
+
+
+def test_async_versions_unknown_routes_and_writes_pass_through():
+    _, app = make_app({"value": "1"})
+    assert request(app, "/api/user/dev1", if_none_match='"user-dev1.3"')[0] == 304
+    assert b"etag" not in request(app, "/api/user/missing")[1]
+    assert b"etag" not in request(app, "/api/other")[1]
+    assert request(app, "/api/board", if_none_match='"board-1"', method="POST")[0] == 200
@@ -0,0 +1,126 @@
+import asyncio
+import copy
+import zlib
+
+import orjson
+import pytest
+
+from cloud_save import PatchError, apply_patch, inflate, make_patch, overlaps
+from tests.helpers import api_client, connect
+
+SAVE = {
+    "player": {"level": 4, "name": "Angler"},
+    "stats": {"fishCaught": 12},
+    "tacklebox": [{"name": "Bass"}, {"name": "Pike"}],
+    "settings": {"music": True},
+}
+
+
+def test_apply_patch_operations():
+    doc = apply_patch(copy.deepcopy(SAVE), [
+        {"op": "replace", "path": "/player/level", "value": 5},
+        {"op": "add", "path": "/tacklebox/-", "value": {"name": "Trout"}},
+        {"op": "remove", "path": "/tacklebox/0"},
+        {"op": "move", "from": "/settings/music", "path": "/settings/sound"},
+        {"op": "copy", "from": "/player/name", "path": "/player/title"},
+        {"op": "test", "path": "/stats/fishCaught", "value": 12},
+    ])
+    assert doc["player"] == {"level": 5, "name": "Angler", "title": "Angler"}
+    assert [f["name"] for f in doc["tacklebox"]] == ["Pike", "Trout"]
+    assert doc["settings"] == {"sound": True}
+
+
+@pytest.mark.parametrize("op", [
+    {"op": "replace", "path": "/missing", "value": 1},
+    {"op": "remove", "path": "/tacklebox/9"},
+    {"op": "add", "path": "no-slash", "value": 1},
+    {"op": "test", "path": "/player/level", "value": 99},
+    {"op": "move", "path": "/x"},
+])
+def test_bad_patches_are_rejected(op):
+    with pytest.raises(PatchError):
+        apply_patch(copy.deepcopy(SAVE), [op])
+
+
+def test_make_patch_round_trips():
+    new = copy.deepcopy(SAVE)
+    new["player"]["level"] = 6
+    new["tacklebox"].append({"name": "Carp"})
+    del new["settings"]
+    patch = make_patch(SAVE, new)
+    assert {"op": "add", "path": "/tacklebox/-", "value": {"name": "Carp"}} in patch
+    assert apply_patch(copy.deepcopy(SAVE), patch) == new
+
+
+def test_overlap_treats_array_indexes_as_the_whole_array():
+    assert overlaps([{"op": "add", "path": "/tacklebox/-"}], [{"op": "remove", "path": "/tacklebox/0"}])
+    assert overlaps([{"op": "replace", "path": "/player"}], [{"op": "replace", "path": "/player/level"}])
+    assert not overlaps([{"op": "replace", "path": "/player/level"}], [{"op": "replace", "path": "/stats/fishCaught"}])
+
+
+def test_inflate_caps_decompressed_size():
+    body = zlib.compress(b"x" * 5000)
+    assert inflate(body, "deflate", 5000) == b"x" * 5000
+    with pytest.raises(ValueError):
+        inflate(body, "deflate", 4999)
+
+
+def test_sync_flow_with_conflicts(server):
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            created = await http.put("/api/saves/u1/0", params={"base_version": 0},
+                                     content=zlib.compress(orjson.dumps(SAVE)),
+                                     headers={"Content-Encoding": "deflate"})
+            assert created.json()["version"] == 1
+
+            # Device A and device B both start from version 1
+            a = await http.patch("/api/saves/u1/0", json={"base_version": 1, "device_id": "a", "patch": [
+                {"op": "replace", "path": "/player/level", "value": 5}]})
+            assert a.json()["version"] == 2
+            b = await http.patch("/api/saves/u1/0", json={"base_version": 1, "device_id": "b", "patch": [
+                {"op": "replace", "path": "/stats/fishCaught", "value": 13}]})
+            assert b.json()["version"] == 3
+            assert b.json()["patch"] == [{"op": "replace", "path": "/player/level", "value": 5}]
+            clash = await http.patch("/api/saves/u1/0", json={"base_version": 2, "patch": [
+                {"op": "replace", "path": "/stats/fishCaught", "value": 14}]})
+            assert clash.status_code == 409
+            assert clash.json()["detail"]["version"] == 3
+            stale = await http.put("/api/saves/u1/0", params={"base_version": 2}, json=SAVE)
+            assert stale.status_code == 409
+
+            changes = (await http.get("/api/saves/u1/0/changes", params={"since": 1})).json()
+            assert changes["version"] == 3 and len(changes["patch"]) == 2
+            assert (await http.get("/api/saves/u1/0/changes", params={"since": 0})).status_code == 410
+
+            full = await http.get("/api/saves/u1/0", headers={"Accept-Encoding": "deflate"})
+            assert full.headers["x-save-version"] == "3"
+            assert full.json()["player"]["level"] == 5 and full.json()["stats"]["fishCaught"] == 13
+            assert (await http.get("/api/saves/u1")).json()[0]["version"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_large_patches_are_not_kept_in_history(server, monkeypatch):
+    monkeypatch.setattr(server.saves, "max_ops_bytes", 1000)
+
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            await http.put("/api/saves/u1/0", params={"base_version": 0}, json=SAVE)
+            # Add and remove a large value: the save stays small, the ops do not
+            bulky = await http.patch("/api/saves/u1/0", json={"base_version": 1, "patch": [
+                {"op": "add", "path": "/junk", "value": "x" * 5000}, {"op": "remove", "path": "/junk"}]})
+            small = await http.patch("/api/saves/u1/0", json={"base_version": 2, "patch": [
+                {"op": "replace", "path": "/player/level", "value": 6}]})
+            since_bulky = await http.get("/api/saves/u1/0/changes", params={"since": 1})
+            since_small = (await http.get("/api/saves/u1/0/changes", params={"since": 2})).json()
+            too_big = await http.patch("/api/saves/u1/0", json={"base_version": 3, "patch": [
+                {"op": "add", "path": "/junk", "value": "x" * server.saves.max_bytes}]})
+        return bulky.status_code, small.status_code, since_bulky.status_code, since_small, too_big.status_code
+
+    bulky, small, since_bulky, since_small, too_big = asyncio.run(scenario())
+    assert (bulky, small) == (200, 200)
+    assert since_bulky == 410
+    assert since_small["patch"] == [{"op": "replace", "path": "/player/level", "value": 6}]
+    assert too_big == 413
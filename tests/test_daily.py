@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import orjson
+
+from daily import DailySchedule, build_daily_challenge, progress_amount
+from tests.helpers import api_client, connect
+
+NOW = datetime(2026, 10, 14, 23, 59, 30, tzinfo=timezone.utc)
+
+
+def test_schedule_rolls_over_at_utc_midnight():
+    clock = [NOW]
+    schedule = DailySchedule(days=3, now=lambda: clock[0])
+    assert schedule.today() == build_daily_challenge("2026-10-14")
+    assert schedule.seconds_left() == 30
+    upcoming = orjson.loads(schedule.encoded_schedule())["challenges"]
+    assert [c["date"] for c in upcoming] == ["2026-10-14", "2026-10-15", "2026-10-16", "2026-10-17"]
+
+    clock[0] = NOW + timedelta(seconds=31)
+    assert schedule.date == "2026-10-15"
+    assert orjson.loads(schedule.encoded()) == upcoming[1]
+
+
+def test_only_matching_events_count():
+    fish = [{"name": "Golden Koi", "perfect": True}, {"name": "Bass", "perfect": False}]
+    challenge = {"type": "catch_legendary", "target": 1}
+    assert progress_amount(challenge, fish_docs=fish, scores=[900]) == 1
+    assert progress_amount({"type": "perfect_catches"}, fish_docs=fish) == 1
+    assert progress_amount({"type": "score"}, fish_docs=fish, scores=[900, 100]) == 900
+    assert progress_amount({"type": "level_up"}, fish_docs=fish) == 0
+
+
+def test_completion_is_decided_once_by_the_server(server, monkeypatch):
+    # Pin today's challenge to "Catch 50 fish"
+    challenge = {"type": "catch_count", "target": 50, "description": "Catch 50 fish today", "reward": 500,
+                 "date": "2026-10-14"}
+    monkeypatch.setattr(server.schedule, "today", lambda: challenge)
+
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            user = (await http.post("/api/user", json={"device_id": "dev-1"})).json()
+            early = (await http.post(f"/api/user/{user['id']}/complete-daily")).json()
+            batch = (await http.post("/api/events/batch", json={"user_id": user["id"], "events": [
+                {"type": "catch", "fish": {"name": "Bass"}}] * 49})).json()
+            fish = [http.post(f"/api/tacklebox/{user['id']}/add-fish", json={"name": "Bass"}) for _ in range(5)]
+            fish = [r.json() for r in await asyncio.gather(*fish)]
+            repeat = (await http.post(f"/api/user/{user['id']}/complete-daily")).json()
+            progress = (await http.get(f"/api/daily-challenge/progress/{user['id']}")).json()
+            stored = await server.db.users.find_one({"id": user["id"]})
+        return early, batch, fish, repeat, progress, stored
+
+    early, batch, fish, repeat, progress, stored = asyncio.run(scenario())
+    assert early["success"] is False and early["progress"] == 0
+    assert batch["daily_challenge"]["progress"] == 49 and not batch["daily_challenge"]["completed"]
+    assert sum(f["daily_challenge"]["completed_now"] for f in fish) == 1
+    assert repeat["success"] is True and repeat["completed_now"] is False
+    assert progress["progress"] == 54 and progress["completed"]
+    assert stored["daily_challenge_completed"] is True and stored["daily_challenge_date"] == "2026-10-14"
+
+
+def test_only_level_rises_count_as_level_ups(server, monkeypatch):
+    challenge = {"type": "level_up", "target": 5, "description": "Level up 5 times", "reward": 750,
+                 "date": "2026-10-14"}
+    monkeypatch.setattr(server.schedule, "today", lambda: challenge)
+
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            user = (await http.post("/api/user", json={"device_id": "dev-1"})).json()
+            repeats = [(await http.post(f"/api/user/{user['id']}/set-level", params={"level": 3})).json()
+                       for _ in range(5)]
+            batch = (await http.post("/api/events/batch", json={"user_id": user["id"], "events": [
+                {"type": "level", "level": level} for level in (3, 4, 4, 2, 3)]})).json()
+            progress = (await http.get(f"/api/daily-challenge/progress/{user['id']}")).json()
+        return repeats, batch, progress
+
+    repeats, batch, progress = asyncio.run(scenario())
+    # 1 -> 3 once; resending level 3 changes nothing
+    assert repeats[0]["daily_challenge"]["progress"] == 2
+    assert [r["daily_challenge"] for r in repeats[1:]] == [None] * 4
+    # 3 -> 4, then 2 -> 3 after dropping back
+    assert batch["user"]["level"] == 3 and batch["daily_challenge"]["progress"] == 4
+    assert progress["progress"] == 4 and not progress["completed"]
+
+
+def test_score_challenge_needs_one_run_at_the_target(server, monkeypatch):
+    challenge = {**build_daily_challenge("2026-10-14"), "type": "score", "target": 5000}
+    monkeypatch.setattr(server.schedule, "today", lambda: challenge)
+
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            user = (await http.post("/api/user", json={"device_id": "dev-1"})).json()
+            runs = []
+            for score in (3000, 3000, 5000):
+                response = await http.post("/api/score", json={"user_id": user["id"], "username": "A", "score": score,
+                                                                "level": 1, "catches": 1, "stage": 1})
+                runs.append(response.json()["daily_challenge"])
+        return runs
+
+    runs = asyncio.run(scenario())
+    # Two 3000-point runs are a best of 3000, not 6000
+    assert [(run["progress"], run["completed"]) for run in runs] == [(3000, False), (3000, False), (5000, True)]
@@ -0,0 +1,70 @@
+import asyncio
+
+from tests.helpers import api_client, connect
+
+
+def test_batch_applies_all_events_in_one_request(server):
+    async def scenario():
+        db = await connect(server)
+        async with api_client(server) as http:
+            user = (await http.post("/api/user", json={"device_id": "batch-device"})).json()
+            events = [{"type": "catch", "fish": {"name": "Bass", "size": 12, "points": 10, "color": "#0f0"}}
+                      for _ in range(20)]
+            events += [
+                {"type": "score", "score": 900, "level": 3, "catches": 20, "stage": 1},
+                {"type": "score", "score": 400, "level": 3, "catches": 20, "stage": 1},
+                {"type": "unlock_lure", "lure_id": 2},
+                {"type": "unlock_achievement", "achievement_id": "first_catch"},
+                {"type": "level", "level": 2},
+                {"type": "level", "level": 3},
+            ]
+            response = await http.post("/api/events/batch", json={"user_id": user["id"], "events": events})
+            assert response.status_code == 200
+            body = response.json()
+
+        assert len(body["fish_ids"]) == 20
+        assert body["user"]["total_catches"] == 20
+        assert body["user"]["high_score"] == 900
+        assert body["user"]["level"] == 3
+        assert body["user"]["unlocked_lures"] == [0, 2]
+        assert body["user"]["achievements"] == ["first_catch"]
+        assert await db.tacklebox.count_documents({"u": user["id"]}) == 20
+        assert await db.scores.count_documents({"user_id": user["id"], "username": "Angler"}) == 2
+
+    asyncio.run(scenario())
+
+
+def test_batch_rejects_unknown_user_and_bad_events(server):
+    async def scenario():
+        db = await connect(server)
+        async with api_client(server) as http:
+            missing = await http.post("/api/events/batch", json={
+                "user_id": "nobody", "events": [{"type": "catch", "fish": {"name": "Bass"}}]})
+            invalid = await http.post("/api/events/batch", json={
+                "user_id": "nobody", "events": [{"type": "teleport"}]})
+        assert missing.status_code == 404
+        assert invalid.status_code == 422
+        assert await db.tacklebox.count_documents({}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_malformed_fish_are_rejected_not_a_500(server):
+    async def scenario():
+        db = await connect(server)
+        async with api_client(server) as http:
+            user = (await http.post("/api/user", json={"device_id": "d1"})).json()
+            statuses = [(await http.post(f"/api/tacklebox/{user['id']}/add-fish", json=fish)).status_code
+                        for fish in ({"name": "Bass", "points": "ten"}, {"name": "Bass", "size": "huge"},
+                                     {"name": ["Bass"]})]
+            batch = await http.post("/api/events/batch", json={
+                "user_id": user["id"], "events": [{"type": "catch", "fish": {"name": "Bass", "points": "lots"}}]})
+            # Numeric strings are still read as numbers
+            coerced = await http.post(f"/api/tacklebox/{user['id']}/add-fish", json={"name": "Bass", "points": "10"})
+        summary = await db.tacklebox_summary.find_one({"user_id": user["id"]})
+        return statuses, batch.status_code, coerced.status_code, summary
+
+    statuses, batch, coerced, summary = asyncio.run(scenario())
+    assert statuses == [422, 422, 422] and batch == 422
+    assert coerced == 200
+    assert (summary["total_fish"], summary["total_points"]) == (1, 10)
@@ -0,0 +1,27 @@
+import asyncio
+
+from indexes import INDEXES, ROUTE_QUERIES, ensure_indexes, plan_stages, verify_query_plans
+from tests.helpers import connect
+
+
+def test_plan_stages_walks_nested_plans():
+    plan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+    assert plan_stages(plan) == ["LIMIT", "FETCH", "IXSCAN"]
+    sbe = {"queryPlan": {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]}}
+    assert plan_stages(sbe) == ["OR", "IXSCAN", "COLLSCAN"]
+
+
+def test_every_route_query_targets_a_registered_collection():
+    for query in ROUTE_QUERIES:
+        assert query.get("allow_collscan") or query["collection"] in INDEXES, query["route"]
+
+
+def test_no_route_query_uses_collscan(server):
+    """Needs a real mongod: explain() is not available in in-process stand-ins"""
+    async def scenario():
+        db = await connect(server)
+        await ensure_indexes(db)
+        await ensure_indexes(db)  # idempotent
+        return await verify_query_plans(db)
+
+    assert asyncio.run(scenario()) == []
@@ -0,0 +1,196 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from leaderboard import LeaderboardIndex, TopK, period_filter
+
+NOW = datetime(2026, 10, 14, 12, 0, tzinfo=timezone.utc)  # a Wednesday
+
+
+def score_doc(username, score, when=NOW):
+    return {"username": username, "score": score, "level": 1, "catches": 3,
+            "stage": 1, "timestamp": when.isoformat()}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    def __aiter__(self):
+        self._it = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeScores:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        since = query.get("timestamp", {}).get("$gte", "")
+        return FakeCursor([d for d in self.docs if d["timestamp"] >= since])
+
+
+def test_topk_keeps_best_entries_in_order():
+    top = TopK(3)
+    for i, score in enumerate([5, 50, 10, 40, 1, 30]):
+        top.offer(score_doc(f"p{i}", score))
+    assert [e["score"] for e in top.top(10)] == [50, 40, 30]
+    assert not top.offer(score_doc("low", 2))
+
+
+def test_topk_ties_prefer_earlier_timestamp():
+    top = TopK(2)
+    top.offer(score_doc("late", 10, NOW))
+    top.offer(score_doc("early", 10, NOW - timedelta(minutes=1)))
+    assert [e["username"] for e in top.top(2)] == ["early", "late"]
+
+
+def test_add_respects_period_windows():
+    index = LeaderboardIndex(capacity=10)
+    index.loaded = True
+    index.add(score_doc("today", 10), now=NOW)
+    index.add(score_doc("monday", 20, NOW - timedelta(days=2)), now=NOW)
+    index.add(score_doc("last_week", 30, NOW - timedelta(days=7)), now=NOW)
+
+    assert [e["username"] for e in index.top("daily", now=NOW)] == ["today"]
+    assert [e["username"] for e in index.top("weekly", now=NOW)] == ["monday", "today"]
+    assert [e["username"] for e in index.top("all_time", now=NOW)] == ["last_week", "monday", "today"]
+
+
+def test_daily_window_rolls_over_at_midnight():
+    index = LeaderboardIndex(capacity=10)
+    index.add(score_doc("today", 10), now=NOW)
+    tomorrow = NOW + timedelta(days=1)
+    assert index.top("daily", now=tomorrow) == []
+    assert len(index.top("weekly", now=tomorrow)) == 1
+
+
+def test_load_fills_windows_from_scores():
+    docs = [score_doc(f"p{i}", i, NOW - timedelta(days=i)) for i in range(20)]
+    index = LeaderboardIndex(capacity=5)
+    asyncio.run(index.load(FakeScores(docs), now=NOW))
+
+    assert [e["score"] for e in index.top("all_time", now=NOW)] == [19, 18, 17, 16, 15]
+    assert [e["score"] for e in index.top("weekly", now=NOW)] == [2, 1, 0]
+    assert index.covers(5) and not index.covers(6)
+
+
+def test_period_filter():
+    assert period_filter("all_time", NOW) == {}
+    assert period_filter("daily", NOW) == {"timestamp": {"$gte": "2026-10-14T00:00:00+00:00"}}
+    assert period_filter("weekly", NOW) == {"timestamp": {"$gte": "2026-10-12T00:00:00+00:00"}}
+
+
+def test_skiplist_matches_sorted_list():
+    import random
+    from leaderboard import IndexableSkipList
+
+    rng = random.Random(7)
+    skiplist, reference = IndexableSkipList(seed=1), []
+    for _ in range(2000):
+        key = rng.randint(0, 500)
+        if key in reference and rng.random() < 0.5:
+            skiplist.remove(key)
+            reference.remove(key)
+        else:
+            skiplist.insert(key)
+            reference.append(key)
+            reference.sort()
+    assert len(skiplist) == len(reference)
+    assert skiplist.slice(0, len(reference)) == reference
+    for probe in (0, 100, 250, 501):
+        assert skiplist.rank(probe) == sum(1 for k in reference if k < probe)
+    assert skiplist.slice(10, 20) == reference[10:20]
+
+
+def test_rank_index_rank_and_percentile():
+    from leaderboard import RankIndex
+
+    ranks = RankIndex(seed=1)
+    for i, score in enumerate([100, 300, 200, 300, 50]):
+        ranks.set(f"u{i}", f"Angler{i}", score)
+
+    assert ranks.rank("u1")["rank"] == 1
+    assert ranks.rank("u3")["rank"] == 1
+    assert ranks.rank("u2")["rank"] == 3
+    assert ranks.rank("u4") == {"rank": 5, "user_id": "u4", "username": "Angler4",
+                                "score": 50, "total": 5, "percentile": 0.0}
+    assert ranks.rank("u2")["percentile"] == 40.0
+    assert ranks.rank("missing") is None
+
+
+def test_rank_index_offer_only_raises_best():
+    from leaderboard import RankIndex
+
+    ranks = RankIndex(seed=1)
+    assert ranks.offer("u0", "A", 10)
+    assert not ranks.offer("u0", "A", 5)
+    assert ranks.offer("u1", "B", 20)
+    assert ranks.rank("u0")["rank"] == 2
+    assert ranks.offer("u0", "A", 30)
+    assert ranks.rank("u0")["rank"] == 1
+    assert len(ranks) == 2
+
+
+def test_rank_index_around():
+    from leaderboard import RankIndex
+
+    ranks = RankIndex(seed=1)
+    for i, score in enumerate([90, 80, 80, 70, 60, 50]):
+        ranks.set(f"u{i}", f"Angler{i}", score)
+
+    around = ranks.around("u3", radius=2)
+    assert [(e["user_id"], e["rank"]) for e in around] == [
+        ("u1", 2), ("u2", 2), ("u3", 4), ("u4", 5), ("u5", 6)]
+    assert [e["user_id"] for e in ranks.around("u0", radius=1)] == ["u0", "u1"]
+    assert [e["rank"] for e in ranks.around("u2", radius=0)] == [2]
+
+
+def test_generation_changes_only_when_windows_change():
+    index = LeaderboardIndex(capacity=2)
+    start = index.version(now=NOW)
+    index.add(score_doc("a", 10), now=NOW)
+    index.add(score_doc("b", 20), now=NOW)
+    after_inserts = index.version(now=NOW)
+    assert after_inserts > start
+    index.add(score_doc("low", 1), now=NOW)
+    assert index.version(now=NOW) == after_inserts
+    assert index.version(now=NOW + timedelta(days=1)) > after_inserts
+
+
+def test_route_clamps_limit_to_the_index(server, monkeypatch):
+    from tests.helpers import api_client, connect
+
+    monkeypatch.setattr(server, "leaderboard", LeaderboardIndex(capacity=5))
+
+    async def scenario():
+        db = await connect(server)
+        await db.scores.insert_many([score_doc(f"p{i}", i) for i in range(8)])
+        await server.leaderboard.load(db.scores)
+        async with api_client(server) as http:
+            return [len((await http.get("/api/leaderboard", params={"limit": limit})).json())
+                    for limit in (-3, 0, 2, 10_000)]
+
+    assert asyncio.run(scenario()) == [1, 1, 2, 5]
+
+
+def test_etag_differs_across_instances_with_equal_generations():
+    old, fresh = LeaderboardIndex(capacity=2), LeaderboardIndex(capacity=2)
+    old.add(score_doc("a", 10), now=NOW)
+    fresh.add(score_doc("b", 20), now=NOW)
+    assert old.version(now=NOW) == fresh.version(now=NOW)
+    assert old.etag(now=NOW) != fresh.etag(now=NOW)
+    assert old.etag(now=NOW) == old.etag(now=NOW)
@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+
+from metrics import Histogram, MetricsMiddleware, MongoCommandMetrics, RequestMetrics, render
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.05, 2.0):
+        histogram.observe(value)
+    lines = histogram.render("latency", 'route="/x"')
+    assert lines[:3] == [
+        'latency_bucket{route="/x",le="0.01"} 1',
+        'latency_bucket{route="/x",le="0.1"} 3',
+        'latency_bucket{route="/x",le="+Inf"} 4',
+    ]
+    assert lines[-1] == 'latency_count{route="/x"} 4'
+
+
+def command_event(name, collection, request_id, duration=1500):
+    return SimpleNamespace(command_name=name, command={name: collection}, connection_id=("db", 1),
+                           request_id=request_id, duration_micros=duration)
+
+
+def test_mongo_commands_are_attributed_to_the_current_request():
+    mongo, requests = MongoCommandMetrics(), RequestMetrics()
+
+    async def endpoint(scope, receive, send):
+        for i, name in enumerate(("insert", "update")):
+            event = command_event(name, "scores", i)
+            mongo.started(event)
+            mongo.succeeded(event)
+        scope["route"] = SimpleNamespace(path="/api/score")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    app = MetricsMiddleware(endpoint, requests)
+    asyncio.run(app({"type": "http", "method": "POST", "path": "/api/score", "headers": []}, None, send))
+
+    failed = command_event("find", "users", 9)
+    mongo.started(failed)
+    mongo.failed(failed)
+
+    text = render(requests, mongo)
+    assert 'gofish_http_request_mongo_ops_total{route="/api/score",method="POST"} 2' in text
+    assert 'gofish_http_request_duration_seconds_count{route="/api/score",method="POST",status="200"} 1' in text
+    assert 'gofish_mongo_command_duration_seconds_count{collection="scores",command="insert"} 1' in text
+    assert 'gofish_mongo_command_failures_total{collection="users",command="find"} 1' in text
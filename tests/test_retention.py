@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from leaderboard import LeaderboardIndex, bucket
+from retention import compact, top_scores
+from tests.helpers import connect
+
+NOW = datetime(2026, 10, 14, 12, 0, tzinfo=timezone.utc)  # a Wednesday
+
+
+def score_doc(user_id, score, when):
+    return {"id": f"{user_id}-{score}", "user_id": user_id, "username": user_id.title(), "score": score,
+            "level": 1, "catches": 3, "stage": 1, "timestamp": when.isoformat()}
+
+
+def test_buckets():
+    assert bucket("daily", NOW) == "2026-10-14"
+    assert bucket("weekly", NOW) == "2026-10-12"
+    assert bucket("all_time", NOW) == "all"
+
+
+def test_rollup_best_is_replaced_only_by_a_higher_score(server):
+    async def scenario():
+        db = await connect(server)
+        old, retain = NOW - timedelta(days=40), timedelta(days=30)
+        bests = []
+        for score in (70, 40, 95):
+            await db.scores.insert_one(score_doc("ann", score, old))
+            await compact(db, retain, now=NOW)
+            bests.append((await db.score_rollups.find_one({"period": "weekly", "user_id": "ann"}))["score"])
+        rollups = await db.score_rollups.count_documents({"period": "weekly"})
+        return bests, rollups
+
+    bests, rollups = asyncio.run(scenario())
+    assert bests == [70, 70, 95]
+    assert rollups == 1
+
+
+def test_compaction_keeps_per_user_bests(server):
+    async def scenario():
+        db = await connect(server)
+        old = NOW - timedelta(days=40)
+        await db.scores.insert_many([
+            score_doc("ann", 10, old),
+            score_doc("ann", 90, old + timedelta(hours=1)),
+            score_doc("ann", 50, old + timedelta(days=1)),
+            score_doc("bob", 60, old),
+            score_doc("bob", 20, NOW - timedelta(hours=1)),
+        ])
+        retain = timedelta(days=30)
+        result = await compact(db, retain, now=NOW)
+        assert result["deleted"] == 4
+        assert result["user_days"] == 3
+        # Re-running finds nothing left to fold in
+        assert (await compact(db, retain, now=NOW))["deleted"] == 0
+
+        assert await db.scores.count_documents({}) == 1
+        daily = await db.score_rollups.count_documents({"period": "daily"})
+        all_time = await db.score_rollups.find({"period": "all_time"}, {"_id": 0}).sort("score", -1).to_list(10)
+        assert daily == 3
+        assert [(r["user_id"], r["score"]) for r in all_time] == [("ann", 90), ("bob", 60)]
+
+        # A lower run landing in an existing bucket never overwrites the best
+        await db.scores.insert_one(score_doc("ann", 5, old))
+        await compact(db, retain, now=NOW)
+        assert (await db.score_rollups.find_one({"period": "all_time", "user_id": "ann"}))["score"] == 90
+
+        top = await top_scores(db, "all_time", 10)
+        assert [e["score"] for e in top] == [90, 60, 20]
+        index = LeaderboardIndex(capacity=10)
+        await index.load(db.scores, now=NOW, rollups=db.score_rollups)
+        assert index.top("all_time", 10) == top
+
+    asyncio.run(scenario())
@@ -0,0 +1,130 @@
+import asyncio
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+np = pytest.importorskip("numpy")
+
+from stats import TABLES, ColumnCache, column_array, lure_sizes, score_distribution  # noqa: E402
+from tests.helpers import api_client, connect  # noqa: E402
+
+
+def columns(docs, table):
+    return {column.name: column_array(docs, column) for column in TABLES[table] if column.numeric}
+
+
+def test_vectorized_stats_match_a_plain_loop():
+    rng = random.Random(4)
+    scores = [{"score": rng.randint(0, 10_000), "stage": rng.randint(1, 4),
+               "timestamp": "2026-10-01T00:00:00+00:00"} for _ in range(2000)]
+    result = score_distribution(columns(scores, "scores"), bins=10, percentiles=(50, 99))
+    for stage in result["stages"]:
+        values = sorted(doc["score"] for doc in scores if doc["stage"] == stage["stage"])
+        assert stage["count"] == len(values) == sum(stage["histogram"])
+        assert stage["percentiles"]["p50"] == pytest.approx(statistics.median(values))
+    assert [s["stage"] for s in result["stages"]] == [1, 2, 3, 4]
+
+    fish = [{"l": rng.choice([0, 1, 2, None]), "z": rng.choice([rng.uniform(5, 80), "huge", None])}
+            for _ in range(2000)]
+    for lure in lure_sizes(columns(fish, "tacklebox"))["lures"]:
+        sizes = [doc["z"] for doc in fish if doc["l"] == lure["lure"] and isinstance(doc["z"], float)]
+        assert lure["count"] == len(sizes)
+        assert lure["mean_size"] == pytest.approx(statistics.fmean(sizes))
+        assert lure["median_size"] == pytest.approx(statistics.median(sizes))
+
+
+def test_cache_reads_only_what_is_new(server):
+    async def scenario():
+        db = await connect(server)
+        clock = [0.0]
+        # lag=-1 takes in documents inserted this second
+        cache = ColumnCache(db.scores, TABLES["scores"], "timestamp", refresh_interval=10, lag=-1,
+                            clock=lambda: clock[0])
+        async with api_client(server) as http:
+            for score in (100, 200):
+                await http.post("/api/score", json={"user_id": "u1", "username": "A", "score": score,
+                                                    "level": 1, "catches": 1, "stage": 1})
+            first = dict(await cache.refresh())
+            await http.post("/api/score", json={"user_id": "u2", "username": "B", "score": 300,
+                                                "level": 1, "catches": 1, "stage": 2})
+            cached = len((await cache.refresh())["score"])
+            clock[0] += 10
+            second = await cache.refresh()
+        return first, cached, second
+
+    first, cached, second = asyncio.run(scenario())
+    assert first["score"].tolist() == [100, 200]
+    assert cached == 2
+    assert second["score"].tolist() == [100, 200, 300] and second["stage"].tolist() == [1, 1, 2]
+
+
+def test_cache_starts_from_its_snapshot_or_the_retention_cutoff(server, tmp_path):
+    def score(value, days_ago=0):
+        when = datetime.now(timezone.utc) - timedelta(days=days_ago)
+        return {"_id": ObjectId.from_datetime(when), "score": value, "stage": 1, "timestamp": when.isoformat()}
+
+    async def scenario():
+        db = await connect(server)
+        snapshot = str(tmp_path / "scores.npz")
+        await db.scores.insert_many([score(1, days_ago=40), score(100, days_ago=1)])
+        first = ColumnCache(db.scores, TABLES["scores"], "timestamp", lag=-1, snapshot=snapshot)
+        cached = (await first.refresh())["score"].tolist()
+        await first.save()
+
+        # Rows the snapshot holds are not read again, only what arrived after its watermark
+        await db.scores.delete_many({})
+        await db.scores.insert_one(score(200))
+        second = ColumnCache(db.scores, TABLES["scores"], "timestamp", lag=-1, snapshot=snapshot)
+        return cached, (await second.refresh())["score"].tolist()
+
+    cached, restored = asyncio.run(scenario())
+    assert cached == [100]
+    assert restored == [100, 200]
+
+
+def test_catch_stats_route_names_species(server, monkeypatch):
+    monkeypatch.setattr(server.fish_columns, "lag", -1)
+
+    async def scenario():
+        await connect(server)
+        async with api_client(server) as http:
+            for name, lure in (("Bass", 0), ("Bass", 1), ("Golden Koi", 1)):
+                await http.post("/api/tacklebox/u1/add-fish", json={"name": name, "size": 10, "lure": lure,
+                                                                    "isPerfect": name == "Bass"})
+            catches = (await http.get("/api/stats/catches")).json()
+            lures = (await http.get("/api/stats/lures")).json()
+        return catches, lures
+
+    catches, lures = asyncio.run(scenario())
+    assert [(s["species"], s["count"], s["perfect_rate"]) for s in catches["species"]] == [
+        ("Bass", 2, 1.0), ("Golden Koi", 1, 0.0)]
+    assert [(lure["lure"], lure["count"]) for lure in lures["lures"]] == [(0, 1), (1, 2)]
+
+
+def test_export_continues_from_the_watermark(server, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from stats import export_collection
+    from tacklebox import FishDictionary
+
+    async def scenario():
+        db = await connect(server)
+        async with api_client(server) as http:
+            await http.post("/api/tacklebox/u1/add-fish", json={"name": "Bass", "size": 12})
+            first = await export_collection(db, "tacklebox", str(tmp_path / "a.parquet"), batch=1, lag=-1,
+                                            dictionary=FishDictionary(db.tacklebox_dict))
+            await http.post("/api/tacklebox/u1/add-fish", json={"name": "Carp"})
+            second = await export_collection(db, "tacklebox", str(tmp_path / "b.parquet"), lag=-1,
+                                             dictionary=FishDictionary(db.tacklebox_dict))
+            again = await export_collection(db, "tacklebox", str(tmp_path / "c.parquet"), lag=-1,
+                                            dictionary=FishDictionary(db.tacklebox_dict))
+        return first, second, again
+
+    first, second, again = asyncio.run(scenario())
+    assert (first["rows"], second["rows"], again["rows"]) == (1, 1, 0)
+    assert pq.read_table(first["path"]).to_pylist()[0]["species"] == "Bass"
+    row = pq.read_table(second["path"]).to_pylist()[0]
+    assert (row["species"], row["size"], row["user_id"]) == ("Carp", None, "u1")
+    assert not (tmp_path / "c.parquet").exists()
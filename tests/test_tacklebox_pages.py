@@ -0,0 +1,116 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from tacklebox import FishDictionary, decode_cursor, encode_cursor, migrate_tacklebox, page_query
+from tests.helpers import api_client, connect
+
+OID = ObjectId("65f000000000000000000001")
+WHEN = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_cursor_round_trip():
+    token = encode_cursor({"t": WHEN, "_id": OID})
+    assert decode_cursor(token) == ("2026-01-01T00:00:00+00:00", str(OID))
+    assert page_query("u1", token)["$or"][1] == {"t": WHEN, "_id": {"$lt": OID}}
+
+
+@pytest.mark.parametrize("token", ["not-base64!", "bm9wZQ", encode_cursor({"t": WHEN, "_id": OID})[:-3],
+                                   encode_cursor({"t": WHEN, "_id": "legacy-uuid"})])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+async def _seed(db, user_id, n):
+    # Legacy-format rows, migrated in place; pairs share a timestamp so the tie-breaker is exercised
+    await db.tacklebox.insert_many([
+        {"id": f"fish-{i:04d}", "user_id": user_id, "name": "Bass", "size": i, "points": 1,
+         "color": "#0f0", "caught_at": f"2026-01-01T00:{i // 2 // 60:02d}:{i // 2 % 60:02d}+00:00"}
+        for i in range(n)
+    ])
+    return await migrate_tacklebox(db, FishDictionary(db.tacklebox_dict))
+
+
+def test_pages_cover_every_fish_once(server):
+    async def scenario():
+        db = await connect(server)
+        assert await _seed(db, "u1", 95) == 95
+        assert await migrate_tacklebox(db, FishDictionary(db.tacklebox_dict)) == 0
+        seen, cursor = [], None
+        async with api_client(server) as http:
+            while True:
+                params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+                page = (await http.get("/api/tacklebox/u1", params=params)).json()
+                seen += [f["id"] for f in page["fish"]]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+        # Migrated fish keep their original ids
+        assert seen == [f"fish-{i:04d}" for i in reversed(range(95))]
+
+    asyncio.run(scenario())
+
+
+def test_ndjson_stream_has_trailer(server):
+    async def scenario():
+        db = await connect(server)
+        await _seed(db, "u1", 30)
+        async with api_client(server) as http:
+            response = await http.get("/api/tacklebox/u1", params={"limit": 25, "format": "ndjson"})
+            lines = [json.loads(line) for line in response.text.splitlines()]
+            rest = (await http.get("/api/tacklebox/u1", params={"cursor": lines[-1]["next_cursor"]})).json()
+            bad = await http.get("/api/tacklebox/u1", params={"cursor": "garbage!"})
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert len(lines) == 26 and lines[-1]["count"] == 25
+        assert lines[0] == {"id": "fish-0029", "user_id": "u1", "name": "Bass", "size": 29, "points": 1,
+                            "color": "#0f0", "perfect": False, "weather": None, "lure": None,
+                            "caught_at": "2026-01-01T00:00:14+00:00"}
+        assert [f["id"] for f in rest["fish"]] == [f"fish-{i:04d}" for i in reversed(range(5))]
+        assert bad.status_code == 400
+
+    asyncio.run(scenario())
+
+
+def test_compact_document_round_trip(server):
+    async def scenario():
+        db = await connect(server)
+        dictionary = FishDictionary(db.tacklebox_dict)
+        fish = {"id": str(ObjectId()), "user_id": "u1", "name": "Golden Koi", "size": 40, "points": 500,
+                "color": "#ffd700", "perfect": True, "weather": "storm", "lure": 2,
+                "caught_at": "2026-01-01T10:00:00.123000+00:00"}
+        stored = await dictionary.pack(fish)
+        other = await dictionary.pack({**fish, "id": str(ObjectId()), "name": "Bass", "color": "#ffd700"})
+        # A fresh process learns codes assigned elsewhere
+        fresh = FishDictionary(db.tacklebox_dict)
+        assert not fresh.knows([stored])
+        await fresh.ready([stored])
+        return stored, other, fresh.unpack(stored), fish
+
+    stored, other, unpacked, fish = asyncio.run(scenario())
+    assert set(stored) == {"_id", "u", "s", "c", "z", "p", "t", "pf", "w", "l"}
+    assert stored["c"] == other["c"] and stored["s"] != other["s"]
+    assert unpacked == fish
+
+
+def test_dictionary_is_bounded(server):
+    async def scenario():
+        db = await connect(server)
+        dictionary = FishDictionary(db.tacklebox_dict, max_codes=2)
+        fish = {"user_id": "u1", "caught_at": "2026-01-01T10:00:00+00:00"}
+        stored = [await dictionary.pack({**fish, "name": name}) for name in ("Bass", "Carp", "Pike", "Bass")]
+        fresh = FishDictionary(db.tacklebox_dict, max_codes=2)
+        await fresh.ready(stored)
+        async with api_client(server) as http:
+            huge = await http.post("/api/tacklebox/u1/add-fish", json={"name": "x" * 100_000})
+        coded = await db.tacklebox_dict.count_documents({"kind": "species"})
+        return stored, [fresh.unpack(doc)["name"] for doc in stored], huge.status_code, coded
+
+    stored, names, huge, coded = asyncio.run(scenario())
+    # Past the cap, new values are kept as plain strings
+    assert [doc["s"] for doc in stored] == [1, 2, "Pike", 1]
+    assert names == ["Bass", "Carp", "Pike", "Bass"]
+    assert huge == 422 and coded == 2
@@ -0,0 +1,52 @@
+import asyncio
+
+from tacklebox import rebuild_summaries, species_key, summary_update, summary_view
+from tests.helpers import api_client, connect
+
+
+def fish(name, size, points, caught_at):
+    return {"name": name, "size": size, "points": points, "caught_at": caught_at}
+
+
+def test_summary_update_folds_a_batch():
+    update = summary_update([
+        fish("Bass", 10, 5, "2026-01-02"),
+        fish("Bass", 14, 5, "2026-01-01"),
+        fish("Golden Koi", None, None, "2026-01-03"),
+    ])
+    assert update["$inc"] == {
+        "total_fish": 3, "total_points": 10,
+        "species.Bass.count": 2, "species.Bass.points": 10,
+        "species.Golden Koi.count": 1, "species.Golden Koi.points": 0,
+    }
+    assert update["$max"] == {"species.Bass.biggest": 14}
+    assert update["$min"]["species.Bass.first_caught_at"] == "2026-01-01"
+    assert species_key("Mr. $Fish") == "Mr_ _Fish" and species_key(None) == "unknown"
+
+
+def test_summary_view_orders_species_by_count():
+    view = summary_view("u1", {"total_fish": 3, "total_points": 9, "species": {
+        "Bass": {"name": "Bass", "count": 1}, "Carp": {"name": "Carp", "count": 2}}})
+    assert [s["name"] for s in view["species"]] == ["Carp", "Bass"]
+    assert summary_view("u2", None) == {"user_id": "u2", "total_fish": 0, "total_points": 0, "species": []}
+
+
+def test_incremental_summary_matches_rebuild(server):
+    async def scenario():
+        db = await connect(server)
+        catches = [("Bass", 10, 5), ("Bass", 14, 5), ("Carp", 30, 8), ("Golden Koi", 50, 100)]
+        async with api_client(server) as http:
+            for name, size, points in catches:
+                await http.post("/api/tacklebox/u1/add-fish", json={"name": name, "size": size, "points": points})
+            live = (await http.get("/api/tacklebox/u1/summary")).json()
+
+        assert live["total_fish"] == 4 and live["total_points"] == 118
+        assert live["species"][0] == {"name": "Bass", "count": 2, "points": 10, "biggest": 14,
+                                      "first_caught_at": live["species"][0]["first_caught_at"]}
+
+        await db.tacklebox_summary.delete_many({})
+        assert await rebuild_summaries(db) == 1
+        rebuilt = summary_view("u1", await db.tacklebox_summary.find_one({"user_id": "u1"}, {"_id": 0}))
+        assert rebuilt == live
+
+    asyncio.run(scenario())
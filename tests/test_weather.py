@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+
+from weather import DEFAULT_WEATHER, WeatherProvider  # noqa: E402
+
+FORECAST = {
+    "current_weather": {"weathercode": 80, "temperature": 12.7, "windspeed": 30.2},
+    "hourly": {"cloud_cover": [90], "precipitation_probability": [70]},
+}
+
+
+class FakeWeatherCollection:
+    def __init__(self):
+        self.doc = None
+
+    async def find_one(self, query, projection):
+        return dict(self.doc) if self.doc else None
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.doc = dict(doc)
+
+
+class Clock:
+    def __init__(self):
+        self.value = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.value
+
+
+async def stub_open_meteo(status=200, delay=0.05):
+    """Local stand-in for open-meteo; returns (url, request counter, runner)"""
+    hits = {"count": 0}
+
+    async def forecast(request):
+        hits["count"] += 1
+        await asyncio.sleep(delay)
+        if status != 200:
+            return web.Response(status=status)
+        return web.json_response(FORECAST)
+
+    app = web.Application()
+    app.router.add_get("/v1/forecast", forecast)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1/forecast", hits, runner
+
+
+def test_concurrent_misses_share_one_upstream_fetch():
+    async def scenario():
+        url, hits, runner = await stub_open_meteo()
+        provider = WeatherProvider(FakeWeatherCollection(), url=url, now=Clock())
+        try:
+            results = await asyncio.gather(*[provider.get() for _ in range(100)])
+        finally:
+            await provider.close()
+            await runner.cleanup()
+        assert hits["count"] == 1
+        assert all(r == {"condition": "storm", "temperature": 12, "wind_speed": 30,
+                         "cloud_cover": 90, "precipitation": 70} for r in results)
+
+    asyncio.run(scenario())
+
+
+def test_stale_entry_is_served_while_refreshing_in_background():
+    async def scenario():
+        url, hits, runner = await stub_open_meteo(delay=0.2)
+        clock = Clock()
+        provider = WeatherProvider(FakeWeatherCollection(), url=url, now=clock)
+        try:
+            first = await provider.get()
+            clock.value += timedelta(minutes=35)
+            stale = await asyncio.wait_for(provider.get(), timeout=0.1)
+            assert stale is first
+            await provider.close()
+        finally:
+            await runner.cleanup()
+        assert hits["count"] == 2
+        assert provider.upstream_fetches == 2
+
+    asyncio.run(scenario())
+
+
+def test_shared_mongo_copy_avoids_upstream_fetch():
+    async def scenario():
+        url, hits, runner = await stub_open_meteo()
+        clock = Clock()
+        collection = FakeWeatherCollection()
+        collection.doc = {**DEFAULT_WEATHER, "condition": "rain", "cached_at": clock.value.isoformat()}
+        provider = WeatherProvider(collection, url=url, now=clock)
+        try:
+            assert (await provider.get())["condition"] == "rain"
+        finally:
+            await provider.close()
+            await runner.cleanup()
+        assert hits["count"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_upstream_failure_falls_back_and_backs_off():
+    async def scenario():
+        url, hits, runner = await stub_open_meteo(status=500)
+        provider = WeatherProvider(FakeWeatherCollection(), url=url, now=Clock())
+        try:
+            assert await provider.get() == DEFAULT_WEATHER
+            assert await provider.get() == DEFAULT_WEATHER
+        finally:
+            await provider.close()
+            await runner.cleanup()
+        assert hits["count"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,117 @@
+import asyncio
+import random
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from write_buffer import WRITE_THROUGH, CounterBuffer
+
+
+class FakeUsers:
+    """Applies UpdateOne requests to in-memory user documents"""
+
+    def __init__(self, fail_next=None):
+        self.docs = {}
+        self.bulk_writes = 0
+        self.fail_next = fail_next
+
+    async def bulk_write(self, requests, ordered=True):
+        await asyncio.sleep(0)
+        if self.fail_next:
+            error, self.fail_next = self.fail_next, None
+            if error == "network":
+                raise ConnectionError("connection reset")
+            # Fail the first request only; the rest are applied
+            for request in requests[1:]:
+                self._apply(request)
+            raise BulkWriteError({"writeErrors": [{"index": 0, "errmsg": "boom"}]})
+        self.bulk_writes += 1
+        for request in requests:
+            self._apply(request)
+
+    def _apply(self, request):
+        doc = self.docs.setdefault(request._filter["id"], {"total_catches": 0, "high_score": 0, "level": 1})
+        for field, amount in request._doc.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        for field, value in request._doc.get("$max", {}).items():
+            doc[field] = max(doc.get(field, value), value)
+        doc.update(request._doc.get("$set", {}))
+
+
+def test_updates_are_merged_per_user_into_one_bulk_write():
+    async def scenario():
+        users = FakeUsers()
+        buffer = CounterBuffer(users, interval=60)
+        for _ in range(10):
+            await buffer.increment("u1", "total_catches", 2)
+        await buffer.maximum("u1", "high_score", 300)
+        await buffer.maximum("u1", "high_score", 100)
+        await buffer.set("u1", "level", 4)
+        await buffer.set("u1", "level", 5)
+        await buffer.increment("u2", "total_catches")
+        assert len(buffer) == 2 and users.docs == {}
+
+        assert await buffer.flush() == 2
+        assert users.bulk_writes == 1
+        assert users.docs["u1"] == {"total_catches": 20, "high_score": 300, "level": 5, "rev": 1}
+        assert users.docs["u2"]["total_catches"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_no_increments_lost_across_interval_flushes_and_stop():
+    async def scenario():
+        users = FakeUsers()
+        buffer = CounterBuffer(users, interval=0.01, max_pending=7)
+        buffer.start()
+        rng = random.Random(3)
+        expected = {}
+
+        async def player(user_id):
+            for _ in range(200):
+                amount = rng.randint(1, 3)
+                expected[user_id] = expected.get(user_id, 0) + amount
+                await buffer.increment(user_id, "total_catches", amount)
+                await asyncio.sleep(rng.uniform(0, 0.002))
+
+        await asyncio.gather(*(player(f"u{i}") for i in range(20)))
+        await buffer.stop()
+
+        assert len(buffer) == 0
+        assert users.bulk_writes > 1
+        assert {user_id: doc["total_catches"] for user_id, doc in users.docs.items()} == expected
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("failure", ["network", "partial"])
+def test_failed_flushes_are_requeued(failure):
+    async def scenario():
+        users = FakeUsers(fail_next=failure)
+        buffer = CounterBuffer(users)
+        await buffer.increment("u1", "total_catches", 5)
+        await buffer.increment("u2", "total_catches", 7)
+        if failure == "network":
+            with pytest.raises(ConnectionError):
+                await buffer.flush()
+        else:
+            await buffer.flush()
+        await buffer.increment("u1", "total_catches", 1)
+        await buffer.set("u1", "level", 9)
+        await buffer.stop()
+        assert users.docs["u1"]["total_catches"] == 6 and users.docs["u1"]["level"] == 9
+        assert users.docs["u2"]["total_catches"] == 7
+
+    asyncio.run(scenario())
+
+
+def test_write_through_flushes_every_call():
+    async def scenario():
+        users = FakeUsers()
+        buffer = CounterBuffer(users, mode=WRITE_THROUGH)
+        await buffer.increment("u1", "total_catches")
+        assert users.docs["u1"]["total_catches"] == 1
+        with pytest.raises(ValueError):
+            CounterBuffer(users, mode="eventually")
+
+    asyncio.run(scenario())